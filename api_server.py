@@ -5,17 +5,37 @@ Optional component for cloud deployment.
 
 from flask import Flask, request, jsonify, render_template_string
 from flask_cors import CORS
-import librosa
 import numpy as np
 import os
+import tempfile
+from src.batching import MicroBatcher
+from src.config import load_config
 from src.inference_engine import RespiratoryInferenceEngine
+from src.resampling import warm_resample_filters
 
 app = Flask(__name__)
 CORS(app)
 
 # Initialize inference engine
 MODEL_PATH = os.getenv('MODEL_PATH', 'models/quantized_model.tflite')
-engine = RespiratoryInferenceEngine(MODEL_PATH, use_tflite=True)
+AUDIO_BACKEND = os.getenv('AUDIO_BACKEND', 'librosa')  # 'numpy' skips librosa entirely
+# A pool of TFLite interpreters (config.yaml: inference.interpreter_pool_size /
+# interpreter_threads) lets threaded requests run inference concurrently
+config = load_config()
+engine = RespiratoryInferenceEngine.from_config(
+    MODEL_PATH, config, use_tflite=True, backend=AUDIO_BACKEND
+)
+# Concurrent requests are coalesced into one batched inference
+# (config.yaml: inference.batching)
+batching = config.get('inference', {}).get('batching', {})
+batcher = None
+if batching.get('enabled', False):
+    batcher = MicroBatcher(
+        engine,
+        max_batch_size=batching.get('max_batch_size', 32),
+        max_wait_ms=batching.get('max_wait_ms', 5.0)
+    )
+warm_resample_filters()  # 48k/44.1k/8k -> 16k filters designed once, up front
 
 # HTML template for web interface
 HTML_TEMPLATE = """
@@ -412,18 +432,20 @@ def predict():
     if audio_file.filename == '':
         return jsonify({'error': 'Empty filename'}), 400
     
+    temp_path = None
     try:
-        # Save temporarily
-        temp_path = f'/tmp/{audio_file.filename}'
+        # Save temporarily (a unique name, as requests are served concurrently)
+        fd, temp_path = tempfile.mkstemp(suffix=os.path.splitext(audio_file.filename)[1])
+        os.close(fd)
         audio_file.save(temp_path)
         
-        # Load audio
-        audio, sr = librosa.load(temp_path, sr=16000)
+        # Load audio at its native rate; the engine resamples with cached polyphase filters
+        audio, sr = engine.backend.load(temp_path)
         
         # Run inference
         import time
         start_time = time.time()
-        result = engine.predict(audio, sr)
+        result = batcher.predict(audio, sr) if batcher else engine.predict(audio, sr)
         inference_time = (time.time() - start_time) * 1000
         
         # Add inference time
@@ -435,13 +457,15 @@ def predict():
             result['confidence']
         )
         
-        # Clean up
-        os.remove(temp_path)
-        
         return jsonify(result)
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+    
+    finally:
+        # Clean up, also when decoding or inference failed
+        if temp_path is not None and os.path.exists(temp_path):
+            os.remove(temp_path)
 
 @app.route('/labels', methods=['GET'])
 def get_labels():
@@ -451,6 +475,16 @@ def get_labels():
         'count': len(engine.label_names)
     })
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Micro-batching histograms, prediction cache counters and cascade escalation rate."""
+    return jsonify({
+        'batching_enabled': batcher is not None,
+        'batching': batcher.stats() if batcher else None,
+        'prediction_cache': engine.prediction_cache.stats() if engine.prediction_cache else None,
+        'cascade': engine.cascade_stats() if engine.screening_model else None
+    })
+
 @app.route('/model-info', methods=['GET'])
 def model_info():
     """Get model information."""
@@ -472,7 +506,13 @@ if __name__ == '__main__':
     print("=" * 60)
     print(f"Server running on http://localhost:{port}")
     print(f"Model: {MODEL_PATH}")
+    print(f"Audio backend: {AUDIO_BACKEND}")
+    print(f"Interpreters: {engine.interpreter_pool.size}")
+    if engine.screening_model:
+        print(f"Cascade: screening model escalates below {engine.escalation_threshold:.0%} confidence")
+    if batcher:
+        print(f"Micro-batching: max {batcher.max_batch_size} clips / {batcher.max_wait_ms} ms")
     print(f"Debug mode: {debug}")
     print("=" * 60)
     
-    app.run(host='0.0.0.0', port=port, debug=debug)
+    app.run(host='0.0.0.0', port=port, debug=debug, threaded=True)
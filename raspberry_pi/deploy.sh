@@ -18,9 +18,10 @@ sudo apt-get install -y libatlas-base-dev libhdf5-dev
 
 # Install Python packages
 echo "Installing Python packages..."
+# Exactly what realtime_inference.py imports: src.feature_extractor with the
+# numpy backend needs only numpy/scipy (no librosa, soundfile or TensorFlow)
 pip3 install numpy scipy
-pip3 install tensorflow-lite-runtime
-pip3 install librosa soundfile
+pip3 install tflite-runtime
 pip3 install pyaudio
 
 # Install Edge Impulse CLI
@@ -34,8 +35,13 @@ echo "Copying model files..."
 mkdir -p ~/edgesense/models
 cp ../models/quantized_model.tflite ~/edgesense/models/
 
-# Copy inference script
-cp realtime_inference.py ~/edgesense/
+# Copy inference script and the src/ package it imports
+# (skipped when already running from ~/edgesense/raspberry_pi)
+if [ "$(cd .. && pwd)" != "$(cd ~/edgesense && pwd)" ]; then
+    mkdir -p ~/edgesense/raspberry_pi
+    cp realtime_inference.py ~/edgesense/raspberry_pi/
+    cp -r ../src ~/edgesense/
+fi
 
 echo ""
 echo "======================================"
@@ -44,7 +50,7 @@ echo "======================================"
 echo ""
 echo "To run real-time inference:"
 echo "  cd ~/edgesense"
-echo "  python3 realtime_inference.py"
+echo "  python3 raspberry_pi/realtime_inference.py"
 echo ""
 echo "To use Edge Impulse runner:"
 echo "  edge-impulse-linux-runner"
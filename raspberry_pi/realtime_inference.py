@@ -2,20 +2,28 @@
 Real-time respiratory disease detection on Raspberry Pi.
 """
 
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
 import numpy as np
 import pyaudio
-import tensorflow as tf
-import librosa
-from collections import deque
+import queue
 import time
+try:
+    from tflite_runtime.interpreter import Interpreter  # what deploy.sh installs
+except ImportError:
+    import tensorflow as tf
+    Interpreter = tf.lite.Interpreter
+from src.feature_extractor import RespiratoryFeatureExtractor, StreamingFeatureExtractor
 
 
 class RealTimeDetector:
     """Real-time audio detection on Raspberry Pi."""
     
-    def __init__(self, model_path='models/quantized_model.tflite'):
+    def __init__(self, model_path='models/quantized_model.tflite', backend='numpy'):
         # Load TFLite model
-        self.interpreter = tf.lite.Interpreter(model_path=model_path)
+        self.interpreter = Interpreter(model_path=model_path)
         self.interpreter.allocate_tensors()
         
         self.input_details = self.interpreter.get_input_details()
@@ -25,9 +33,19 @@ class RealTimeDetector:
         self.sample_rate = 16000
         self.chunk_duration = 3.0  # seconds
         self.chunk_size = int(self.sample_rate * self.chunk_duration)
-        
-        # Audio buffer
-        self.audio_buffer = deque(maxlen=self.chunk_size)
+        self.hop_duration = 0.5  # seconds between predictions
+        self.hop_size = int(self.sample_rate * self.hop_duration)
+        
+        # Captured audio waiting to be fed to the extractor, one hop at a time
+        self.audio_queue = queue.Queue()
+        self.pending = np.zeros(0, dtype=np.float32)
+        
+        # Rolling window features (only new frames are transformed each hop).
+        # The numpy backend avoids importing librosa/numba on the Pi.
+        self.streamer = StreamingFeatureExtractor(
+            RespiratoryFeatureExtractor(sample_rate=self.sample_rate, backend=backend),
+            window_samples=self.chunk_size
+        )
         
         # Labels
         self.labels = [
@@ -44,46 +62,9 @@ class RealTimeDetector:
         self.audio = pyaudio.PyAudio()
         self.stream = None
     
-    def extract_features(self, audio):
-        """Extract MFCC features."""
-        # Normalize
-        if np.max(np.abs(audio)) > 0:
-            audio = audio / np.max(np.abs(audio))
-        
-        # Extract MFCC
-        mfcc = librosa.feature.mfcc(
-            y=audio,
-            sr=self.sample_rate,
-            n_mfcc=40,
-            n_fft=2048,
-            hop_length=160
-        )
-        
-        # Extract Mel-Spectrogram
-        mel_spec = librosa.feature.melspectrogram(
-            y=audio,
-            sr=self.sample_rate,
-            n_mels=128,
-            n_fft=2048,
-            hop_length=160
-        )
-        mel_spec_db = librosa.power_to_db(mel_spec, ref=np.max)
-        
-        # Combine features
-        min_time = min(mfcc.shape[1], mel_spec_db.shape[1])
-        mfcc = mfcc[:, :min_time]
-        mel_spec_db = mel_spec_db[:, :min_time]
-        
-        features = np.vstack([mfcc, mel_spec_db])
-        features = features.T
-        features = np.expand_dims(features, axis=-1)
-        features = np.expand_dims(features, axis=0)
-        
-        return features.astype(np.float32)
-    
-    def predict(self, audio):
-        """Run inference."""
-        features = self.extract_features(audio)
+    def predict(self, features):
+        """Run inference on a (time, features, 1) model input."""
+        features = np.expand_dims(features, axis=0).astype(np.float32)
         
         # Run inference
         self.interpreter.set_tensor(self.input_details[0]['index'], features)
@@ -96,10 +77,23 @@ class RealTimeDetector:
         
         return self.labels[pred_idx], confidence, output
     
+    def advance(self) -> bool:
+        """Feed whole hops of captured audio to the streaming extractor."""
+        while not self.audio_queue.empty():
+            self.pending = np.concatenate([self.pending, self.audio_queue.get_nowait()])
+        
+        advanced = False
+        while len(self.pending) >= self.hop_size:
+            self.streamer.push(self.pending[:self.hop_size])
+            self.pending = self.pending[self.hop_size:]
+            advanced = True
+        
+        return advanced
+    
     def audio_callback(self, in_data, frame_count, time_info, status):
         """Audio stream callback."""
-        audio_chunk = np.frombuffer(in_data, dtype=np.float32)
-        self.audio_buffer.extend(audio_chunk)
+        audio_chunk = np.frombuffer(in_data, dtype=np.float32).copy()
+        self.audio_queue.put(audio_chunk)
         
         return (in_data, pyaudio.paContinue)
     
@@ -135,13 +129,11 @@ class RealTimeDetector:
         
         try:
             while True:
-                if len(self.audio_buffer) >= self.chunk_size:
-                    # Get audio chunk
-                    audio = np.array(list(self.audio_buffer))
-                    
-                    # Predict
+                if self.advance() and self.streamer.ready:
+                    # Predict on the current 3 s window
                     start_time = time.time()
-                    prediction, confidence, probabilities = self.predict(audio)
+                    features = self.streamer.get_model_input()
+                    prediction, confidence, probabilities = self.predict(features)
                     inference_time = (time.time() - start_time) * 1000
                     
                     # Display results
@@ -154,7 +146,7 @@ class RealTimeDetector:
                     if prediction != 'Normal' and confidence > 0.7:
                         print(f"\n⚠️  ALERT: {prediction} detected with {confidence:.1%} confidence")
                 
-                time.sleep(0.5)
+                time.sleep(0.05)
         
         except KeyboardInterrupt:
             print("\n\nStopping...")
@@ -163,5 +155,6 @@ class RealTimeDetector:
 
 
 if __name__ == '__main__':
-    detector = RealTimeDetector()
+    import os
+    detector = RealTimeDetector(backend=os.getenv('AUDIO_BACKEND', 'numpy'))
     detector.run()
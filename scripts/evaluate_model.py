@@ -8,6 +8,7 @@ sys.path.append('.')
 import numpy as np
 from pathlib import Path
 from tensorflow import keras
+from src.sharded_dataset import ShardedDataset
 from sklearn.metrics import (
     classification_report,
     confusion_matrix,
@@ -45,10 +46,10 @@ def main():
     print("\nLoading test data...")
     data_dir = Path('data/processed')
     
-    X_test = np.load(data_dir / 'X_test.npy')
-    y_test = np.load(data_dir / 'y_test.npy')
+    test = ShardedDataset.open(data_dir, 'test')  # memory-mapped, paged in per batch
+    y_test = test.labels
     
-    print(f"Test shape: {X_test.shape}")
+    print(f"Test shape: {test.shape}")
     
     # Load model
     print("\nLoading trained model...")
@@ -58,7 +59,7 @@ def main():
     # Predict
     print("\nMaking predictions...")
     y_test_cat = keras.utils.to_categorical(y_test, num_classes=7)
-    y_pred_proba = model.predict(X_test)
+    y_pred_proba = model.predict(test.to_tf_dataset(batch_size=64))
     y_pred = np.argmax(y_pred_proba, axis=1)
     
     # Label names
@@ -5,69 +5,205 @@ Preprocess respiratory audio datasets.
 import sys
 sys.path.append('.')
 
+import os
+import argparse
+from src.config import load_config, window_params
 from src.data_loader import RespiratoryDataLoader
 from src.feature_extractor import RespiratoryFeatureExtractor
+from src.feature_cache import FeatureCache
+from src.waveform_cache import WaveformCache
+from src.feature_codec import CompactFeatureCodec
+from src.sharded_dataset import MANIFEST_NAME, ShardWriter
+from src.source_manifest import SourceManifest, stable_split
+from src.splits import SPLITS, DatasetSplit
 import numpy as np
 from pathlib import Path
 
 
+def add_window_shards(
+    writer, loader, feature_extractor, file_paths, labels, shard_size, num_workers
+):
+    """
+    Featurize every window of ``file_paths`` into shards of ``shard_size``
+    rows with per-window source and offset; returns the indices of the
+    files that loaded.
+    """
+    buffered = []
+    kept = set()
+    
+    def flush(count):
+        features, rows, offsets = (np.concatenate(parts) for parts in zip(*buffered))
+        writer.add_shard(
+            features[:count],
+            labels[rows[:count]],
+            sources=[file_paths[i] for i in rows[:count]],
+            offsets=offsets[:count]
+        )
+        buffered[:] = []
+        if count < len(rows):
+            buffered.append((features[count:], rows[count:], offsets[count:]))
+    
+    for features, rows, offsets in loader.iter_window_features(
+        file_paths, feature_extractor, num_workers=num_workers
+    ):
+        if len(rows) == 0:
+            continue
+        buffered.append((features, rows, offsets))
+        kept.update(rows.tolist())
+        while sum(len(part[1]) for part in buffered) >= shard_size:
+            flush(shard_size)
+    if buffered:
+        flush(sum(len(part[1]) for part in buffered))
+    return sorted(kept)
+
+
 def main():
+    parser = argparse.ArgumentParser(description='Preprocess respiratory audio datasets')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Worker processes for featurization (1 = serial)')
+    parser.add_argument('--shard-size', type=int, default=4096,
+                        help='Examples per memory-mapped shard')
+    parser.add_argument('--compact', choices=['uint8', 'uint16'], default=None,
+                        help='Store log-mel quantized to this type and MFCC as float16')
+    parser.add_argument('--full', action='store_true',
+                        help='Reprocess everything instead of only added/changed files')
+    parser.add_argument('--windows', action='store_true',
+                        help='Cut whole recordings into overlapping windows '
+                             '(audio.window_size / window_increase in config.yaml)')
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("RESPIRATORY AUDIO PREPROCESSING")
     print("=" * 60)
     
-    # Initialize data loader
-    loader = RespiratoryDataLoader(data_dir='data/raw')
+    # Initialize data loader (features are cached by file content + parameters,
+    # decoded audio in a waveform pack so new extractor settings skip decoding)
+    loader = RespiratoryDataLoader(
+        data_dir='data/raw',
+        feature_cache=FeatureCache('data/features'),
+        waveform_cache=WaveformCache('data/features/waveforms'),
+        **(window_params(load_config()) if args.windows else {})
+    )
+    feature_extractor = RespiratoryFeatureExtractor()
+    output_dir = Path('data/processed')
+    codec = None
+    if args.compact:
+        codec = CompactFeatureCodec(3 * feature_extractor.n_mfcc, mel_dtype=args.compact)
+    config = {
+        'extractor': feature_extractor.get_params(),
+        'loader': {
+            'sample_rate': loader.sample_rate,
+            'duration': loader.duration,
+            'backend': loader.backend.name,
+            'window_increase': loader.window_increase
+        },
+        'label_map': loader.label_map,
+        'codec': codec.get_params() if codec else None
+    }
     
-    # Load dataset
-    print("\nLoading audio files...")
-    audio_data, labels, file_paths = loader.load_dataset_from_directory()
+    # List dataset
+    print("\nListing audio files...")
+    file_paths, labels = loader.list_dataset_files()
+    labels = np.array(labels, dtype=int)
     
-    print(f"\nLoaded {len(audio_data)} audio samples")
+    print(f"\nFound {len(file_paths)} audio files")
     print(f"Label distribution:")
     unique, counts = np.unique(labels, return_counts=True)
     for label_id, count in zip(unique, counts):
         label_name = [k for k, v in loader.label_map.items() if v == label_id][0]
         print(f"  {label_name}: {count}")
     
-    # Split data
-    print("\nSplitting into train/val/test...")
-    X_train, y_train, X_val, y_val, X_test, y_test = loader.create_train_val_test_split(
-        audio_data, labels
-    )
-    
-    print(f"Train: {len(X_train)}")
-    print(f"Val: {len(X_val)}")
-    print(f"Test: {len(X_test)}")
+    # Compare against the files processed by earlier runs
+    manifest = SourceManifest(output_dir / 'sources.json')
+    store_complete = all((output_dir / split / MANIFEST_NAME).exists() for split in SPLITS)
+    incremental = not args.full and manifest.config == config and store_complete and manifest.files
+    if not incremental:
+        manifest.files = {}
     
-    # Extract features
-    print("\nExtracting features...")
-    feature_extractor = RespiratoryFeatureExtractor()
+    added, changed, removed, fingerprints = manifest.diff(file_paths, labels)
+    print(f"\nAdded: {len(added)}, changed: {len(changed)}, removed: {len(removed)}, "
+          f"unchanged: {len(file_paths) - len(added) - len(changed)}")
     
-    def extract_features_batch(audio_batch):
-        features = []
-        for audio in audio_batch:
-            feat = feature_extractor.prepare_model_input(audio)
-            features.append(feat)
-        return np.array(features)
+    # Split data by file (all windows of a recording share its split, so
+    # overlapping windows never leak across splits): processed files keep
+    # their split, new files get a stable one
+    split_of = {}
+    if incremental:
+        print("\nAssigning new files to splits...")
+        for i in changed:
+            split_of[file_paths[i]] = manifest.files[file_paths[i]]['split']
+        for i in added:
+            split_of[file_paths[i]] = stable_split(file_paths[i])
+    else:
+        print("\nSplitting into train/val/test...")
+        split_of = DatasetSplit.create(labels, keys=file_paths).assignment()
     
-    X_train_features = extract_features_batch(X_train)
-    X_val_features = extract_features_batch(X_val)
-    X_test_features = extract_features_batch(X_test)
+    # Rows of changed or deleted files are dropped before re-adding; changed
+    # files stay in the manifest (marked stale) so they keep their split even
+    # if they fail to decode this time
+    stale = {}
+    for file_path in removed:
+        stale.setdefault(manifest.files.pop(file_path)['split'], []).append(file_path)
+    for i in changed:
+        stale.setdefault(manifest.mark_stale(file_paths[i]), []).append(file_paths[i])
     
-    print(f"Feature shape: {X_train_features.shape}")
+    # Extract features (cached files skip decoding and featurization).
+    # Workers write each shard straight into its memory-mapped .npy file.
+    print(f"\nExtracting features with {args.workers} worker(s)...")
+    for split in SPLITS:
+        todo = [i for i in added + changed if split_of[file_paths[i]] == split]
+        with ShardWriter(
+            output_dir / split,
+            shard_size=args.shard_size,
+            metadata=config,
+            append=incremental,
+            codec=codec
+        ) as writer:
+            writer.remove_sources(stale.get(split, []))
+            processed = []
+            if loader.window_increase is not None:
+                todo_idx = np.array(todo, dtype=int)
+                kept = add_window_shards(
+                    writer, loader, feature_extractor, [file_paths[i] for i in todo_idx],
+                    labels[todo_idx], args.shard_size, args.workers
+                )
+                processed = todo_idx[kept].tolist()
+            else:
+                for start in range(0, len(todo), args.shard_size):
+                    shard_idx = np.array(todo[start:start + args.shard_size])
+                    shard_paths = [file_paths[i] for i in shard_idx]
+                    features, kept = loader.load_features_from_files(
+                        shard_paths,
+                        feature_extractor,
+                        num_workers=args.workers,
+                        output_path=writer.next_shard_path()
+                    )
+                    if len(kept) == 0:
+                        continue
+                    kept_idx = shard_idx[kept]
+                    writer.add_shard(
+                        features, labels[kept_idx], sources=[file_paths[i] for i in kept_idx]
+                    )
+                    processed.extend(kept_idx.tolist())
+            for i in processed:
+                manifest.files[file_paths[i]] = dict(
+                    fingerprints[file_paths[i]], label=int(labels[i]), split=split
+                )
+        
+        print(f"{split}: {writer.num_examples} examples in {len(writer.shards)} shard(s) "
+              f"(+{len(todo)} processed)")
     
-    # Save processed data
-    print("\nSaving processed data...")
-    output_dir = Path('data/processed')
-    output_dir.mkdir(parents=True, exist_ok=True)
+    # Refresh mtimes of unchanged files so the next run skips hashing them
+    for file_path, fingerprint in fingerprints.items():
+        if file_path in manifest.files:
+            manifest.files[file_path].update(fingerprint)
+    manifest.config = config
+    manifest.save()
     
-    np.save(output_dir / 'X_train.npy', X_train_features)
-    np.save(output_dir / 'y_train.npy', y_train)
-    np.save(output_dir / 'X_val.npy', X_val_features)
-    np.save(output_dir / 'y_val.npy', y_val)
-    np.save(output_dir / 'X_test.npy', X_test_features)
-    np.save(output_dir / 'y_test.npy', y_test)
+    # Persist the file-level split for tools that read raw audio (train --stream)
+    DatasetSplit.from_assignment(
+        {file_path: info['split'] for file_path, info in manifest.files.items()}
+    ).save(output_dir / 'splits.json')
     
     print(f"\nProcessed data saved to {output_dir}")
     print("=" * 60)
@@ -8,7 +8,9 @@ sys.path.append('.')
 import argparse
 import librosa
 import numpy as np
+from src.audio_backend import get_backend
 from src.inference_engine import RespiratoryInferenceEngine
+from src.waveform_cache import WaveformCache
 
 
 def main():
@@ -16,6 +18,9 @@ def main():
     parser.add_argument('--audio', type=str, required=True, help='Path to audio file')
     parser.add_argument('--model', type=str, default='models/crnn_best.h5', help='Model path')
     parser.add_argument('--tflite', action='store_true', help='Use TFLite model')
+    parser.add_argument('--cache', action='store_true',
+                        help='Reuse decoded audio from the waveform cache '
+                             '(data/features/waveforms)')
     
     args = parser.parse_args()
     
@@ -25,7 +30,11 @@ def main():
     
     # Load audio
     print(f"\nLoading audio: {args.audio}")
-    audio, sr = librosa.load(args.audio, sr=16000)
+    if args.cache:
+        cache = WaveformCache('data/features/waveforms')
+        audio, sr = cache.load(args.audio, get_backend(), sr=16000)
+    else:
+        audio, sr = librosa.load(args.audio, sr=16000)
     print(f"Audio duration: {len(audio) / sr:.2f}s")
     
     # Initialize inference engine
@@ -5,10 +5,20 @@ Train respiratory disease classification model.
 import sys
 sys.path.append('.')
 
+import os
+import argparse
 import numpy as np
 from pathlib import Path
-from tensorflow import keras
+from src.augmentation import BatchAugmenter
+from src.config import load_config, window_params
+from src.data_loader import RespiratoryDataLoader
+from src.dataset import RespiratoryDataset
+from src.feature_cache import FeatureCache
+from src.waveform_cache import WaveformCache
+from src.sharded_dataset import ShardedDataset
+from src.splits import DatasetSplit
 from src.model_builder import (
+    build_baseline_cnn,
     build_crnn_model,
     compile_model,
     get_callbacks,
@@ -16,31 +26,119 @@ from src.model_builder import (
 )
 
 
+def build_augmenter(sample_rate: int = 16000):
+    """Training-set augmenter from config.yaml's augmentation section (None if disabled)."""
+    config = load_config()
+    n_mfcc = config.get('features', {}).get('mfcc', {}).get('n_mfcc', 40)
+    return BatchAugmenter.from_config(
+        config.get('augmentation', {}),
+        sample_rate=sample_rate,
+        mel_start=3 * n_mfcc
+    )
+
+
+def load_processed_data(batch_size: int):
+    """Training inputs memory-mapped from the shards written by preprocess_audio.py."""
+    data_dir = Path('data/processed')
+    
+    train = ShardedDataset.open(data_dir, 'train')
+    val = ShardedDataset.open(data_dir, 'val')
+    
+    print(f"Train shape: {train.shape}")
+    print(f"Val shape: {val.shape}")
+    
+    # Batches are paged in from disk as training touches them; stored
+    # features only get the augmenter's spectral masks
+    fit_kwargs = {
+        'x': train.to_tf_dataset(
+            batch_size, num_classes=7, shuffle=True, seed=42, augmenter=build_augmenter()
+        ),
+        'validation_data': val.to_tf_dataset(batch_size, num_classes=7)
+    }
+    return fit_kwargs, train.element_shape
+
+
+def stream_raw_data(args):
+    """Training inputs decoded and featurized on the fly from raw audio."""
+    loader = RespiratoryDataLoader(
+        data_dir=args.data_dir,
+        feature_cache=FeatureCache('data/features') if args.cache else None,
+        waveform_cache=WaveformCache('data/features/waveforms') if args.cache else None,
+        **(window_params(load_config()) if args.windows else {})
+    )
+    if args.csv:
+        manifest = RespiratoryDataset.from_csv(args.csv, loader)
+        file_paths, labels = manifest.file_paths, manifest.labels
+    else:
+        file_paths, labels = loader.list_dataset_files()
+    
+    # Reuse preprocess_audio.py's file-level split (created on first use), so
+    # a recording and all its windows stay in one split across tools
+    split = DatasetSplit.load_or_create('data/processed/splits.json', labels, keys=file_paths)
+    labels = np.asarray(labels)
+    X_train, y_train = [file_paths[i] for i in split['train']], labels[split['train']]
+    X_val, y_val = [file_paths[i] for i in split['val']], labels[split['val']]
+    print(f"Train files: {len(X_train)}")
+    print(f"Val files: {len(X_val)}")
+    
+    dataset_kwargs = {
+        'loader': loader,
+        'batch_size': args.batch_size,
+        'num_workers': args.workers,
+        'use_processes': args.processes
+    }
+    train_ds = RespiratoryDataset(
+        X_train, y_train, shuffle_buffer=args.shuffle_buffer, seed=42,
+        augmenter=build_augmenter(loader.sample_rate), **dataset_kwargs
+    )
+    val_ds = RespiratoryDataset(X_val, y_val, **dataset_kwargs)
+    
+    fit_kwargs = {
+        'x': train_ds.to_tf_dataset(num_classes=7),
+        'validation_data': val_ds.to_tf_dataset(num_classes=7)
+    }
+    return fit_kwargs, train_ds.element_shape
+
+
 def main():
+    parser = argparse.ArgumentParser(description='Train respiratory disease classification model')
+    parser.add_argument('--stream', action='store_true',
+                        help='Stream batches from raw audio instead of data/processed arrays')
+    parser.add_argument('--data-dir', default='data/raw',
+                        help='Raw audio directory (with --stream)')
+    parser.add_argument('--csv', default=None, help='file_path,label manifest (with --stream)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Decode/featurize workers (with --stream)')
+    parser.add_argument('--processes', action='store_true',
+                        help='Use worker processes instead of threads (with --stream)')
+    parser.add_argument('--shuffle-buffer', type=int, default=1024,
+                        help='Examples in the shuffle buffer (with --stream)')
+    parser.add_argument('--cache', action='store_true',
+                        help='Reuse/populate the feature and waveform caches in data/features '
+                             '(with --stream)')
+    parser.add_argument('--windows', action='store_true',
+                        help='Train on overlapping windows of whole recordings (with --stream)')
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--model', choices=['crnn', 'baseline_cnn'], default='crnn',
+                        help='Architecture (baseline_cnn is the screening model of the '
+                             'inference cascade)')
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("RESPIRATORY DISEASE MODEL TRAINING")
     print("=" * 60)
     
-    # Load processed data
-    print("\nLoading processed data...")
-    data_dir = Path('data/processed')
-    
-    X_train = np.load(data_dir / 'X_train.npy')
-    y_train = np.load(data_dir / 'y_train.npy')
-    X_val = np.load(data_dir / 'X_val.npy')
-    y_val = np.load(data_dir / 'y_val.npy')
-    
-    print(f"Train shape: {X_train.shape}")
-    print(f"Val shape: {X_val.shape}")
-    
-    # Convert labels to categorical
-    y_train_cat = keras.utils.to_categorical(y_train, num_classes=7)
-    y_val_cat = keras.utils.to_categorical(y_val, num_classes=7)
+    if args.stream:
+        print("\nStreaming training data from raw audio...")
+        fit_kwargs, input_shape = stream_raw_data(args)
+    else:
+        print("\nLoading processed data...")
+        fit_kwargs, input_shape = load_processed_data(args.batch_size)
     
     # Build model
-    print("\nBuilding CRNN model...")
-    input_shape = X_train.shape[1:]
-    model = build_crnn_model(input_shape, num_classes=7)
+    print(f"\nBuilding {args.model} model...")
+    builder = build_crnn_model if args.model == 'crnn' else build_baseline_cnn
+    model = builder(input_shape, num_classes=7)
     
     print(f"Input shape: {input_shape}")
     model.summary()
@@ -54,7 +152,7 @@ def main():
     models_dir.mkdir(exist_ok=True)
     
     callbacks = get_callbacks(
-        model_path=str(models_dir / 'crnn_best.h5'),
+        model_path=str(models_dir / f'{args.model}_best.h5'),
         patience=15
     )
     
@@ -63,23 +161,22 @@ def main():
     print("=" * 60)
     
     history = model.fit(
-        X_train, y_train_cat,
-        validation_data=(X_val, y_val_cat),
+        **fit_kwargs,
         epochs=100,
-        batch_size=64,
         callbacks=callbacks,
         verbose=1
     )
     
     # Save final model
-    model.save(models_dir / 'crnn_final.h5')
-    print(f"\nFinal model saved to {models_dir / 'crnn_final.h5'}")
+    model.save(models_dir / f'{args.model}_final.h5')
+    print(f"\nFinal model saved to {models_dir / f'{args.model}_final.h5'}")
     
-    # Convert to TFLite
+    # Convert to TFLite (the CRNN is the served model; others keep their own name)
     print("\nConverting to TensorFlow Lite...")
+    tflite_name = 'quantized_model.tflite' if args.model == 'crnn' else f'{args.model}.tflite'
     convert_to_tflite(
         model,
-        output_path=str(models_dir / 'quantized_model.tflite'),
+        output_path=str(models_dir / tflite_name),
         quantize=True
     )
     
@@ -3,17 +3,39 @@
 __version__ = "1.0.0"
 __author__ = "EdgeSense Team"
 
-from .data_loader import RespiratoryDataLoader
-from .feature_extractor import RespiratoryFeatureExtractor
-from .model_builder import build_crnn_model, compile_model
-from .inference_engine import RespiratoryInferenceEngine
-from .anomaly_detector import RespiratoryAnomalyDetector
-
-__all__ = [
-    'RespiratoryDataLoader',
-    'RespiratoryFeatureExtractor',
-    'build_crnn_model',
-    'compile_model',
-    'RespiratoryInferenceEngine',
-    'RespiratoryAnomalyDetector'
-]
+import importlib
+
+# Public names and the submodules that define them. Submodules are imported
+# on first access, so ``from src.feature_extractor import ...`` (e.g. on the
+# Raspberry Pi) does not pull in pandas, scikit-learn or TensorFlow.
+_EXPORTS = {
+    'RespiratoryDataLoader': 'data_loader',
+    'RespiratoryFeatureExtractor': 'feature_extractor',
+    'build_crnn_model': 'model_builder',
+    'compile_model': 'model_builder',
+    'RespiratoryInferenceEngine': 'inference_engine',
+    'RespiratoryAnomalyDetector': 'anomaly_detector',
+    'FeatureCache': 'feature_cache',
+    'WaveformCache': 'waveform_cache',
+    'RespiratoryDataset': 'dataset',
+    'ShardedDataset': 'sharded_dataset',
+    'CompactFeatureCodec': 'feature_codec',
+    'BatchAugmenter': 'augmentation',
+    'DatasetSplit': 'splits',
+    'MicroBatcher': 'batching',
+    'PredictionCache': 'prediction_cache'
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{_EXPORTS[name]}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
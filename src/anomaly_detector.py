@@ -65,6 +65,15 @@ class RespiratoryAnomalyDetector:
         
         return scores
     
+    def predict_with_scores(self, features: np.ndarray):
+        """
+        Predictions (1 normal, -1 anomaly) and anomaly scores in one pass
+        (features are scaled and the forest evaluated once).
+        """
+        scores = self.score_samples(features)
+        predictions = np.where(scores - self.model.offset_ < 0, -1, 1)
+        return predictions, scores
+    
     def save(self, path: str):
         """Save model to disk."""
         joblib.dump({
@@ -0,0 +1,215 @@
+"""
+Pluggable DSP backends for audio loading and feature extraction.
+
+The ``librosa`` backend is the reference implementation. The ``numpy``
+backend reimplements the subset the model input needs (STFT power, mel
+filterbank, dB scaling, deltas, resampling and decoding) with NumPy/SciPy
+and soundfile only, so edge devices can skip importing librosa and numba.
+"""
+
+import os
+import numpy as np
+import scipy.fft
+import scipy.signal as signal
+from typing import Optional, Tuple
+from .resampling import resample
+
+
+# Backend used when none is requested explicitly
+DEFAULT_BACKEND = os.getenv('AUDIO_BACKEND', 'librosa')
+
+
+def frame_power(audio: np.ndarray, n_fft: int, hop_length: int, window: np.ndarray) -> np.ndarray:
+    """Centered (zero-padded) STFT power over the last axis: (..., samples) -> (..., time, freq)."""
+    pad = n_fft // 2
+    pad_width = [(0, 0)] * (audio.ndim - 1) + [(pad, pad)]
+    padded = np.pad(audio, pad_width, mode='constant')
+    frames = np.lib.stride_tricks.sliding_window_view(padded, n_fft, axis=-1)[..., ::hop_length, :]
+    spectrum = scipy.fft.rfft(frames * window, axis=-1)
+    return spectrum.real ** 2 + spectrum.imag ** 2
+
+
+class LibrosaBackend:
+    """Reference backend delegating to librosa."""
+    
+    name = 'librosa'
+    
+    def __init__(self):
+        import librosa
+        self.librosa = librosa
+    
+    def mel_filterbank(
+        self,
+        sr: int,
+        n_fft: int,
+        n_mels: int,
+        fmin: float,
+        fmax: float
+    ) -> np.ndarray:
+        return self.librosa.filters.mel(
+            sr=sr, n_fft=n_fft, n_mels=n_mels, fmin=fmin, fmax=fmax, dtype=np.float32
+        )
+    
+    def power_spectrogram(
+        self,
+        audio: np.ndarray,
+        n_fft: int,
+        hop_length: int,
+        window: np.ndarray
+    ) -> np.ndarray:
+        stft = self.librosa.stft(audio, n_fft=n_fft, hop_length=hop_length, window=window)
+        return np.abs(stft) ** 2
+    
+    def power_to_db(self, S: np.ndarray, ref=1.0) -> np.ndarray:
+        return self.librosa.power_to_db(S, ref=ref)
+    
+    def delta(self, data: np.ndarray, order: int = 1) -> np.ndarray:
+        return self.librosa.feature.delta(data, order=order)
+    
+    def resample(self, audio: np.ndarray, orig_sr: int, target_sr: int) -> np.ndarray:
+        return self.librosa.resample(audio, orig_sr=orig_sr, target_sr=target_sr)
+    
+    def load(
+        self,
+        file_path: str,
+        sr: Optional[int] = None,
+        duration: Optional[float] = None
+    ) -> Tuple[np.ndarray, int]:
+        """
+        Decode at the native rate, then resample with ``src.resampling`` (not
+        librosa's soxr filter) so training and serving see the same filter.
+        """
+        audio, native_sr = self.librosa.load(
+            file_path, sr=None, duration=duration, dtype=np.float32
+        )
+        if sr is not None and sr != native_sr:
+            audio = resample(audio, native_sr, sr)
+        else:
+            sr = native_sr
+        return np.ascontiguousarray(audio, dtype=np.float32), sr
+
+
+class NumpyBackend:
+    """librosa-free backend built on NumPy, SciPy and soundfile."""
+    
+    name = 'numpy'
+    
+    @staticmethod
+    def _hz_to_mel(freqs: np.ndarray) -> np.ndarray:
+        # Slaney mel scale: linear below 1 kHz, logarithmic above
+        freqs = np.asanyarray(freqs, dtype=np.float64)
+        f_sp = 200.0 / 3
+        min_log_hz = 1000.0
+        min_log_mel = min_log_hz / f_sp
+        logstep = np.log(6.4) / 27.0
+        mels = freqs / f_sp
+        log_t = freqs >= min_log_hz
+        log_mels = min_log_mel + np.log(np.maximum(freqs, min_log_hz) / min_log_hz) / logstep
+        mels = np.where(log_t, log_mels, mels)
+        return mels
+    
+    @staticmethod
+    def _mel_to_hz(mels: np.ndarray) -> np.ndarray:
+        mels = np.asanyarray(mels, dtype=np.float64)
+        f_sp = 200.0 / 3
+        min_log_hz = 1000.0
+        min_log_mel = min_log_hz / f_sp
+        logstep = np.log(6.4) / 27.0
+        freqs = f_sp * mels
+        log_t = mels >= min_log_mel
+        return np.where(log_t, min_log_hz * np.exp(logstep * (mels - min_log_mel)), freqs)
+    
+    def mel_filterbank(
+        self,
+        sr: int,
+        n_fft: int,
+        n_mels: int,
+        fmin: float,
+        fmax: float
+    ) -> np.ndarray:
+        """Slaney-normalized triangular mel filterbank (matches librosa.filters.mel)."""
+        if fmax is None:
+            fmax = sr / 2.0
+        fft_freqs = np.fft.rfftfreq(n=n_fft, d=1.0 / sr)
+        mel_f = self._mel_to_hz(
+            np.linspace(self._hz_to_mel(fmin), self._hz_to_mel(fmax), n_mels + 2)
+        )
+        
+        fdiff = np.diff(mel_f)
+        ramps = np.subtract.outer(mel_f, fft_freqs)
+        lower = -ramps[:-2] / fdiff[:-1, np.newaxis]
+        upper = ramps[2:] / fdiff[1:, np.newaxis]
+        weights = np.maximum(0, np.minimum(lower, upper))
+        
+        enorm = 2.0 / (mel_f[2:n_mels + 2] - mel_f[:n_mels])
+        weights *= enorm[:, np.newaxis]
+        return weights.astype(np.float32)
+    
+    def power_spectrogram(
+        self,
+        audio: np.ndarray,
+        n_fft: int,
+        hop_length: int,
+        window: np.ndarray
+    ) -> np.ndarray:
+        """Centered STFT power, shape (1 + n_fft // 2, time) like librosa."""
+        return frame_power(audio, n_fft, hop_length, window).T
+    
+    def power_to_db(
+        self,
+        S: np.ndarray,
+        ref=1.0,
+        amin: float = 1e-10,
+        top_db: float = 80.0
+    ) -> np.ndarray:
+        ref_value = ref(S) if callable(ref) else ref
+        log_spec = 10.0 * np.log10(np.maximum(amin, S))
+        log_spec -= 10.0 * np.log10(np.maximum(amin, ref_value))
+        return np.maximum(log_spec, log_spec.max() - top_db)
+    
+    def delta(self, data: np.ndarray, order: int = 1, width: int = 9) -> np.ndarray:
+        return signal.savgol_filter(
+            data, width, polyorder=order, deriv=order, axis=-1, mode='interp'
+        )
+    
+    def resample(self, audio: np.ndarray, orig_sr: int, target_sr: int) -> np.ndarray:
+        """Polyphase resampling with a cached filter design."""
+        return resample(audio, orig_sr, target_sr)
+    
+    def load(
+        self,
+        file_path: str,
+        sr: Optional[int] = None,
+        duration: Optional[float] = None
+    ) -> Tuple[np.ndarray, int]:
+        """Decode with soundfile, downmix to mono and optionally resample."""
+        import soundfile as sf
+        
+        with sf.SoundFile(file_path) as f:
+            native_sr = f.samplerate
+            frames = -1 if duration is None else int(duration * native_sr)
+            audio = f.read(frames=frames, dtype='float32', always_2d=True)
+        
+        audio = audio.mean(axis=1) if audio.shape[1] > 1 else audio[:, 0]
+        if sr is not None and sr != native_sr:
+            audio = self.resample(audio, native_sr, sr)
+        else:
+            sr = native_sr
+        return np.ascontiguousarray(audio, dtype=np.float32), sr
+
+
+_BACKENDS = {
+    'librosa': LibrosaBackend,
+    'numpy': NumpyBackend,
+}
+_instances = {}
+
+
+def get_backend(name: Optional[str] = None):
+    """Return the (shared) backend instance for ``name``."""
+    name = name or DEFAULT_BACKEND
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown audio backend '{name}'. Options: {sorted(_BACKENDS)}")
+    if name not in _instances:
+        _instances[name] = _BACKENDS[name]()
+    return _instances[name]
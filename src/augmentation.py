@@ -0,0 +1,252 @@
+"""
+Randomized, batched data augmentation for the training input pipeline.
+
+Replaces eager augmentation (six stored copies of every clip): each batch is
+augmented on the fly with fresh random parameters, on raw waveforms (time
+stretch, pitch shift, gain, noise) and/or on model-input spectrograms
+(SpecAugment-style time and frequency masks).
+"""
+
+import numpy as np
+from typing import Dict, Optional, Sequence, Tuple
+from .feature_cache import FeatureCache
+from .feature_extractor import AUDIO_DTYPE
+
+
+class BatchAugmenter:
+    """
+    Apply random augmentations to batches.
+    
+    Every augmentation is applied to each example independently with
+    ``probability``. Time-stretch rates (``stretch_steps`` levels) and pitch
+    shifts (whole semitones) are drawn from a small grid, so the expensive
+    phase-vocoder results can be reused from an optional ``cache`` keyed by
+    clip content and transform parameters.
+    """
+    
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        probability: float = 0.5,
+        time_stretch: Optional[Tuple[float, float]] = (0.9, 1.1),
+        pitch_shift: Optional[Tuple[int, int]] = (-2, 2),
+        noise_level: float = 0.005,
+        gain_db: Optional[Tuple[float, float]] = (-6.0, 6.0),
+        time_masks: int = 2,
+        time_mask_width: int = 30,
+        freq_masks: int = 2,
+        freq_mask_width: int = 16,
+        mel_start: int = 120,
+        stretch_steps: int = 5,
+        cache: Optional[FeatureCache] = None
+    ):
+        self.sample_rate = sample_rate
+        self.probability = probability
+        self.time_stretch = tuple(time_stretch) if time_stretch else None
+        self.pitch_shift = tuple(pitch_shift) if pitch_shift else None
+        self.noise_level = noise_level
+        self.gain_db = tuple(gain_db) if gain_db else None
+        self.time_masks = time_masks
+        self.time_mask_width = time_mask_width
+        self.freq_masks = freq_masks
+        self.freq_mask_width = freq_mask_width
+        self.mel_start = mel_start
+        self.stretch_steps = stretch_steps
+        self.cache = cache
+    
+    @classmethod
+    def from_config(
+        cls,
+        config: Dict,
+        sample_rate: int = 16000,
+        mel_start: int = 120,
+        cache: Optional[FeatureCache] = None
+    ) -> Optional['BatchAugmenter']:
+        """Build from the ``augmentation`` section of config.yaml (None if disabled)."""
+        if not config.get('enabled', False):
+            return None
+        keys = (
+            'probability', 'time_stretch', 'pitch_shift', 'noise_level', 'gain_db',
+            'time_masks', 'time_mask_width', 'freq_masks', 'freq_mask_width', 'stretch_steps'
+        )
+        kwargs = {key: config[key] for key in keys if key in config}
+        if config.get('cache_waveforms', False) and cache is None:
+            cache = FeatureCache('data/features/augmented')
+        return cls(sample_rate=sample_rate, mel_start=mel_start, cache=cache, **kwargs)
+    
+    def get_params(self) -> Dict:
+        """Constructor arguments (the cache as its directory and size bound)."""
+        params = {
+            key: getattr(self, key) for key in (
+                'sample_rate', 'probability', 'time_stretch', 'pitch_shift', 'noise_level',
+                'gain_db', 'time_masks', 'time_mask_width', 'freq_masks', 'freq_mask_width',
+                'mel_start', 'stretch_steps'
+            )
+        }
+        if self.cache is not None:
+            params['cache'] = {
+                'cache_dir': str(self.cache.cache_dir),
+                'max_bytes': self.cache.max_bytes
+            }
+        return params
+    
+    @classmethod
+    def from_params(cls, params: Dict) -> 'BatchAugmenter':
+        params = dict(params)
+        cache_params = params.pop('cache', None)
+        if cache_params is not None:
+            params['cache'] = FeatureCache(**cache_params)
+        return cls(**params)
+    
+    @property
+    def waveform_enabled(self) -> bool:
+        """Whether waveform transforms are active (they need decoded audio)."""
+        return self.probability > 0 and any([
+            self.time_stretch, self.pitch_shift, self.noise_level > 0, self.gain_db
+        ])
+    
+    @property
+    def spectral_enabled(self) -> bool:
+        return self.time_masks > 0 or self.freq_masks > 0
+    
+    def _cached_transform(self, audio: np.ndarray, name: str, value: float) -> np.ndarray:
+        """Time stretch or pitch shift, fixed to the input length, optionally cached."""
+        key = None
+        if self.cache is not None:
+            key = FeatureCache.make_key(audio, {name: value, 'sample_rate': self.sample_rate})
+            cached = self.cache.get(key)
+            if cached is not None:
+                return np.array(cached)
+        
+        import librosa
+        if name == 'time_stretch':
+            result = librosa.effects.time_stretch(audio, rate=value)
+        else:
+            result = librosa.effects.pitch_shift(audio, sr=self.sample_rate, n_steps=value)
+        result = librosa.util.fix_length(result, size=len(audio)).astype(AUDIO_DTYPE, copy=False)
+        
+        if key is not None:
+            self.cache.put(key, result)
+        return result
+    
+    def augment_waveforms(self, audio_batch: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        """Augment a (N, samples) batch of clips; returns a new float32 array."""
+        audio_batch = np.array(audio_batch, dtype=AUDIO_DTYPE)
+        n = len(audio_batch)
+        
+        if self.time_stretch:
+            rates = np.linspace(*self.time_stretch, self.stretch_steps)
+            rates = rates[~np.isclose(rates, 1.0)]
+            for i in np.flatnonzero(rng.random(n) < self.probability):
+                rate = float(rng.choice(rates))
+                audio_batch[i] = self._cached_transform(audio_batch[i], 'time_stretch', rate)
+        
+        if self.pitch_shift:
+            low, high = self.pitch_shift
+            steps = [step for step in range(low, high + 1) if step != 0]
+            for i in np.flatnonzero(rng.random(n) < self.probability):
+                step = int(rng.choice(steps))
+                audio_batch[i] = self._cached_transform(audio_batch[i], 'pitch_shift', step)
+        
+        if self.gain_db:
+            applied = rng.random(n) < self.probability
+            gain_db = np.where(applied, rng.uniform(*self.gain_db, size=n), 0.0)
+            audio_batch *= (10.0 ** (gain_db / 20.0)).astype(AUDIO_DTYPE)[:, np.newaxis]
+        
+        if self.noise_level > 0:
+            noisy = rng.random(n) < self.probability
+            noise = rng.normal(0, self.noise_level, audio_batch[noisy].shape)
+            audio_batch[noisy] += noise.astype(AUDIO_DTYPE)
+        
+        return audio_batch
+    
+    def _random_masks(
+        self,
+        rng: np.random.Generator,
+        n: int,
+        size: int,
+        count: int,
+        max_width: int
+    ) -> np.ndarray:
+        """(n, size) boolean mask of ``count`` random spans of up to ``max_width``."""
+        widths = rng.integers(0, max_width + 1, size=(n, count))
+        widths = np.where(rng.random((n, 1)) < self.probability, widths, 0)
+        starts = (rng.random((n, count)) * np.maximum(size - widths, 1)).astype(int)
+        positions = np.arange(size)
+        ends = starts + widths
+        spans = (positions >= starts[..., np.newaxis]) & (positions < ends[..., np.newaxis])
+        return spans.any(axis=1)
+    
+    def augment_features(self, features: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        """
+        Time-mask all feature columns and frequency-mask the log-mel bands of
+        a (N, time, features, 1) batch; masked cells take the example's mean
+        over time for that column.
+        """
+        features = np.array(features, dtype=AUDIO_DTYPE)
+        if not self.spectral_enabled or len(features) == 0:
+            return features
+        
+        n, n_time, n_features = features.shape[:3]
+        masked = np.zeros((n, n_time, n_features), dtype=bool)
+        if self.time_masks > 0:
+            frames = self._random_masks(rng, n, n_time, self.time_masks, self.time_mask_width)
+            masked |= frames[:, :, np.newaxis]
+        if self.freq_masks > 0:
+            n_mels = n_features - self.mel_start
+            bands = self._random_masks(rng, n, n_mels, self.freq_masks, self.freq_mask_width)
+            masked[:, :, self.mel_start:] |= bands[:, np.newaxis, :]
+        
+        fill = features.mean(axis=1, keepdims=True)
+        return np.where(masked[..., np.newaxis], fill, features)
+
+
+def augment_and_featurize(
+    loader,
+    feature_extractor,
+    augmenter: BatchAugmenter,
+    file_paths: Sequence[str],
+    seed: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Decode, augment and featurize one block of files.
+    
+    Without waveform transforms the (cacheable) clean features are loaded
+    and only spectral masks are applied.
+    
+    Returns:
+        (features, kept) like RespiratoryDataLoader.load_features_from_files
+    """
+    rng = np.random.default_rng(seed)
+    if augmenter.waveform_enabled and loader.window_increase is not None:
+        features, kept, _ = loader._featurize_windows(
+            file_paths,
+            feature_extractor,
+            progress=False,
+            transform=lambda audio: augmenter.augment_waveforms(audio, rng)
+        )
+        if len(kept) > 0:
+            features = augmenter.augment_features(features, rng)
+        return features, kept
+    
+    if not augmenter.waveform_enabled:
+        features, kept = loader._featurize_files(
+            file_paths, feature_extractor, batch_size=len(file_paths), progress=False
+        )
+        if len(kept) > 0:
+            features = augmenter.augment_features(features, rng)
+        return features, kept
+    
+    clips, kept = [], []
+    for i, file_path in enumerate(file_paths):
+        audio = loader.load_audio_file(file_path)
+        if audio is not None:
+            clips.append(audio)
+            kept.append(i)
+    kept = np.array(kept, dtype=int)
+    if not clips:
+        return np.empty((0,), dtype=AUDIO_DTYPE), kept
+    
+    audio_batch = augmenter.augment_waveforms(np.stack(clips), rng)
+    features = feature_extractor.prepare_model_input_batch(audio_batch)
+    return augmenter.augment_features(features, rng), kept
@@ -0,0 +1,162 @@
+"""
+Dynamic micro-batching of concurrent prediction requests.
+
+Request threads featurize their own clip and enqueue it; scheduler threads
+gather queued inputs until ``max_batch_size`` is reached or ``max_wait_ms``
+has passed since the first one, run a single batched inference and hand
+each caller its own result.
+"""
+
+import bisect
+import queue
+import threading
+import time
+import numpy as np
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Sequence
+
+
+class Histogram:
+    """Thread-safe histogram with cumulative ``le`` buckets (Prometheus style)."""
+    
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = sorted(bounds)
+        self._counts = [0] * (len(self.bounds) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.bounds, value)] += 1
+            self._sum += value
+    
+    def snapshot(self) -> Dict:
+        """{'buckets': {bound: observations <= bound, '+Inf': all}, 'count', 'sum'}."""
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        cumulative = np.cumsum(counts).tolist()
+        buckets = {str(bound): count for bound, count in zip(self.bounds, cumulative)}
+        buckets['+Inf'] = cumulative[-1]
+        return {'buckets': buckets, 'count': cumulative[-1], 'sum': total}
+
+
+def _powers_of_two(limit: int) -> List[int]:
+    return [2 ** i for i in range(int(np.log2(max(limit, 1))) + 1)]
+
+
+class MicroBatcher:
+    """
+    Batch concurrent ``RespiratoryInferenceEngine`` requests.
+    
+    ``num_workers`` scheduler threads (default: the engine's interpreter
+    pool size) each form and run batches, so several batches can be in
+    flight on the pool at once. Batch sizes and the queue depth seen by
+    arriving requests are recorded as histograms (see ``stats``).
+    """
+    
+    def __init__(
+        self,
+        engine,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        num_workers: Optional[int] = None
+    ):
+        self.engine = engine
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.batch_sizes = Histogram(_powers_of_two(max_batch_size))
+        self.queue_depths = Histogram(_powers_of_two(1024))
+        self._queue: queue.Queue = queue.Queue()
+        
+        if num_workers is None:
+            pool = getattr(engine, 'interpreter_pool', None)
+            num_workers = pool.size if pool is not None else 1
+        self._workers = [
+            threading.Thread(target=self._run, name=f'micro-batcher-{i}', daemon=True)
+            for i in range(num_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+    
+    def submit(self, audio: np.ndarray, sample_rate: int = 16000) -> Future:
+        """Featurize ``audio`` in the calling thread and queue it; the Future yields its result."""
+        features = self.engine.prepare_input(audio, sample_rate)
+        future = Future()
+        self.queue_depths.observe(self._queue.qsize())
+        self._queue.put((features, future))
+        return future
+    
+    def predict(
+        self,
+        audio: np.ndarray,
+        sample_rate: int = 16000,
+        timeout: Optional[float] = None
+    ) -> Dict:
+        """Blocking ``submit`` (same result as ``engine.predict``, including its cache)."""
+        cache = getattr(self.engine, 'prediction_cache', None)
+        if cache is not None:
+            return cache.get_or_compute(
+                self.engine.prediction_key(audio, sample_rate),
+                lambda: self.submit(audio, sample_rate).result(timeout)
+            )
+        return self.submit(audio, sample_rate).result(timeout)
+    
+    def _collect(self) -> Optional[list]:
+        """Block for one request, then gather more until the batch is full or the wait ends."""
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    item = self._queue.get(timeout=remaining)
+                else:
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # leave the shutdown signal for the next collect
+                break
+            batch.append(item)
+        return batch
+    
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            # Drop requests cancelled while queued
+            batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            self.batch_sizes.observe(len(batch))
+            
+            try:
+                features = np.stack([features for features, _ in batch])
+                results = self.engine.predict_features(features)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+    
+    def stats(self) -> Dict:
+        """Current queue length plus batch-size and queue-depth histograms."""
+        return {
+            'pending': self._queue.qsize(),
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait_ms,
+            'batch_size': self.batch_sizes.snapshot(),
+            'queue_depth': self.queue_depths.snapshot()
+        }
+    
+    def close(self):
+        """Stop the scheduler threads once queued requests are served."""
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
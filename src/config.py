@@ -0,0 +1,33 @@
+"""
+Access to the project configuration file (config.yaml).
+"""
+
+import os
+import yaml
+from pathlib import Path
+from typing import Dict, Optional
+
+
+# Location of the configuration file, overridable for deployments
+CONFIG_PATH = os.getenv('EDGESENSE_CONFIG', 'config.yaml')
+
+
+def load_config(path: Optional[str] = None) -> Dict:
+    """Load the YAML configuration (an empty dict if the file is missing)."""
+    path = Path(path or CONFIG_PATH)
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return yaml.safe_load(f) or {}
+
+
+def window_params(config: Dict) -> Dict:
+    """
+    RespiratoryDataLoader arguments for sliding windows from the ``audio``
+    section (``window_size`` / ``window_increase`` in milliseconds).
+    """
+    audio = config.get('audio', {})
+    return {
+        'duration': audio.get('window_size', 3000) / 1000,
+        'window_increase': audio.get('window_increase', 500) / 1000
+    }
@@ -3,28 +3,50 @@ Data loading and preprocessing utilities for respiratory audio datasets.
 """
 
 import os
+import tempfile
+from collections import deque
 import numpy as np
 import pandas as pd
-import librosa
 import soundfile as sf
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Tuple, List, Dict
-from sklearn.model_selection import train_test_split
+from typing import Callable, Iterator, Tuple, List, Dict, Optional, Union
 from tqdm import tqdm
+from .audio_backend import get_backend
+from .feature_cache import FeatureCache
+from .waveform_cache import WaveformCache
+from .feature_extractor import AUDIO_DTYPE, RespiratoryFeatureExtractor
+from .splits import split_indices
+from .windowing import sliding_windows, window_offsets
 
 
 class RespiratoryDataLoader:
-    """Load and preprocess respiratory audio datasets."""
+    """
+    Load and preprocess respiratory audio datasets.
+    
+    By default every recording yields one example: its first ``duration``
+    seconds. With ``window_increase`` (seconds) set, featurization instead
+    covers whole recordings with ``duration``-long windows every
+    ``window_increase`` seconds, one example per window.
+    """
     
     def __init__(
         self,
         data_dir: str = 'data/raw',
         sample_rate: int = 16000,
-        duration: float = 3.0
+        duration: float = 3.0,
+        feature_cache: Optional[FeatureCache] = None,
+        backend: Optional[str] = None,
+        waveform_cache: Optional[WaveformCache] = None,
+        window_increase: Optional[float] = None
     ):
         self.data_dir = Path(data_dir)
         self.sample_rate = sample_rate
         self.duration = duration
+        self.feature_cache = feature_cache
+        self.waveform_cache = waveform_cache
+        self.window_increase = window_increase
+        self.backend = get_backend(backend)
         self.label_map = {
             'normal': 0,
             'asthma': 1,
@@ -38,7 +60,14 @@ class RespiratoryDataLoader:
     def load_audio_file(self, file_path: str) -> np.ndarray:
         """Load and preprocess single audio file."""
         try:
-            audio, sr = librosa.load(file_path, sr=self.sample_rate, duration=self.duration)
+            if self.waveform_cache is not None:
+                audio, sr = self.waveform_cache.load(
+                    file_path, self.backend, sr=self.sample_rate, duration=self.duration
+                )
+            else:
+                audio, sr = self.backend.load(
+                    file_path, sr=self.sample_rate, duration=self.duration
+                )
             
             # Pad if too short
             target_length = int(self.sample_rate * self.duration)
@@ -54,7 +83,42 @@ class RespiratoryDataLoader:
             print(f"Error loading {file_path}: {e}")
             return None
     
-    def load_dataset_from_directory(self) -> Tuple[List[np.ndarray], List[int], List[str]]:
+    def load_recording(self, file_path: str) -> Optional[np.ndarray]:
+        """Decode a whole recording at ``sample_rate`` (no truncation, padding or normalization)."""
+        try:
+            if self.waveform_cache is not None:
+                audio, _ = self.waveform_cache.load(file_path, self.backend, sr=self.sample_rate)
+            else:
+                audio, _ = self.backend.load(file_path, sr=self.sample_rate)
+            return audio
+        except Exception as e:
+            print(f"Error loading {file_path}: {e}")
+            return None
+    
+    def load_windows(self, file_path: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Segment a whole recording into overlapping windows.
+        
+        Returns:
+            (windows, offsets): a (n_windows, samples) strided view of the
+            decoded recording and each window's start sample, or None if
+            the file failed to load
+        """
+        audio = self.load_recording(file_path)
+        if audio is None:
+            return None
+        window_length = int(self.sample_rate * self.duration)
+        hop_length = int(self.sample_rate * self.window_increase)
+        return (
+            sliding_windows(audio, window_length, hop_length),
+            window_offsets(len(audio), window_length, hop_length)
+        )
+    
+    def load_dataset_from_directory(
+        self,
+        num_workers: int = 1,
+        as_array: bool = False
+    ) -> Tuple[Union[List[np.ndarray], np.ndarray], List[int], List[str]]:
         """
         Load dataset from directory structure:
         data/raw/
@@ -62,10 +126,97 @@ class RespiratoryDataLoader:
             asthma/
             copd/
             ...
+        
+        See load_audio_files for ``num_workers`` and ``as_array``.
         """
-        audio_data = []
-        labels = []
+        all_paths, all_labels = self.list_dataset_files()
+        print(f"Loading {len(all_paths)} files...")
+        
+        audio_data, kept = self.load_audio_files(
+            all_paths, num_workers=num_workers, as_array=as_array
+        )
+        labels = [all_labels[i] for i in kept]
+        file_paths = [all_paths[i] for i in kept]
+        
+        return audio_data, labels, file_paths
+    
+    def iter_audio_files(
+        self,
+        file_paths: List[str],
+        num_workers: int = 1,
+        prefetch: int = 4,
+        use_processes: bool = False,
+        desc: str = "Loading"
+    ) -> Iterator[Tuple[int, Optional[np.ndarray]]]:
+        """
+        Decode files in a worker pool, yielding (index, audio) in input order.
+        
+        At most ``num_workers * prefetch`` files are in flight, so memory stays
+        bounded however far the pool runs ahead of the consumer. Files that
+        fail to load are reported by load_audio_file and yield None. Threads
+        suit soundfile decoding (it releases the GIL); use processes for
+        decoders that hold it.
+        """
+        if num_workers <= 1:
+            for i, file_path in enumerate(tqdm(file_paths, desc=desc)):
+                yield i, self.load_audio_file(file_path)
+            return
+        
+        if use_processes:
+            pool = ProcessPoolExecutor(
+                max_workers=num_workers,
+                initializer=_init_load_worker,
+                initargs=(self.get_params(),)
+            )
+            load = _load_audio_worker
+        else:
+            pool = ThreadPoolExecutor(max_workers=num_workers)
+            load = self.load_audio_file
+        
+        results = bounded_map(pool, load, file_paths, num_workers * prefetch)
+        with pool:
+            try:
+                yield from enumerate(tqdm(results, total=len(file_paths), desc=desc))
+            finally:
+                results.close()  # cancel queued files if the consumer stops early
+    
+    def load_audio_files(
+        self,
+        file_paths: List[str],
+        num_workers: int = 1,
+        prefetch: int = 4,
+        use_processes: bool = False,
+        as_array: bool = False
+    ) -> Tuple[Union[List[np.ndarray], np.ndarray], np.ndarray]:
+        """
+        Decode audio files, optionally in parallel (see iter_audio_files).
+        
+        Returns:
+            (audio, kept) where audio is a list of clips, or with ``as_array``
+            a preallocated (len(kept), samples) float32 array, and kept
+            indexes the files that loaded successfully
+        """
+        n_samples = int(self.sample_rate * self.duration)
+        audio_data = np.empty((len(file_paths), n_samples), dtype=AUDIO_DTYPE) if as_array else []
+        kept = []
+        
+        for i, audio in self.iter_audio_files(file_paths, num_workers, prefetch, use_processes):
+            if audio is None:
+                continue
+            if as_array:
+                audio_data[len(kept)] = audio[:n_samples]
+            else:
+                audio_data.append(audio)
+            kept.append(i)
+        
+        if as_array:
+            audio_data = audio_data[:len(kept)]
+        return audio_data, np.array(kept, dtype=int)
+    
+    def list_dataset_files(self) -> Tuple[List[str], List[int]]:
+        """List audio files and labels from the directory structure without decoding."""
         file_paths = []
+        labels = []
         
         for label_name, label_id in self.label_map.items():
             label_dir = self.data_dir / label_name
@@ -75,32 +226,321 @@ class RespiratoryDataLoader:
                 continue
             
             audio_files = list(label_dir.glob('*.wav')) + list(label_dir.glob('*.mp3'))
+            file_paths.extend(str(audio_file) for audio_file in audio_files)
+            labels.extend([label_id] * len(audio_files))
+        
+        return file_paths, labels
+    
+    def _file_cache_key(
+        self,
+        file_path: str,
+        feature_extractor: RespiratoryFeatureExtractor
+    ) -> str:
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        return FeatureCache.make_key(data, {
+            'load': {
+                'sample_rate': self.sample_rate,
+                'duration': self.duration,
+                'backend': self.backend.name
+            },
+            'model_input': feature_extractor.get_params()
+        })
+    
+    def get_params(self) -> Dict:
+        """Constructor arguments needed to rebuild this loader in a worker process."""
+        params = {
+            'data_dir': str(self.data_dir),
+            'sample_rate': self.sample_rate,
+            'duration': self.duration,
+            'backend': self.backend.name,
+            'window_increase': self.window_increase
+        }
+        if self.feature_cache is not None:
+            params['feature_cache'] = {
+                'cache_dir': str(self.feature_cache.cache_dir),
+                'max_bytes': self.feature_cache.max_bytes
+            }
+        if self.waveform_cache is not None:
+            params['waveform_cache'] = {'cache_dir': str(self.waveform_cache.cache_dir)}
+        return params
+    
+    def load_features_from_files(
+        self,
+        file_paths: List[str],
+        feature_extractor: RespiratoryFeatureExtractor,
+        batch_size: int = 32,
+        num_workers: int = 1,
+        output_path: Optional[str] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Decode and featurize audio files into a (N, time, features, 1) array.
+        
+        With a feature cache, files whose content and parameters are already
+        cached are neither decoded nor featurized again. With
+        ``num_workers > 1`` blocks of files are featurized in worker processes
+        that write straight into a preallocated memory-mapped .npy output
+        (``output_path``, or an anonymous temporary file); rows always follow
+        the order of ``file_paths``.
+        
+        In windowing mode (``window_increase``) every file yields one row per
+        window and ``output_path`` is not supported; use
+        iter_window_features to also get each window's offset.
+        
+        Returns:
+            (features, kept) where kept indexes the file of every row
+        """
+        if self.window_increase is not None:
+            if output_path is not None:
+                raise ValueError("output_path is not supported with window_increase")
+            blocks = list(self.iter_window_features(
+                file_paths, feature_extractor, batch_size, num_workers
+            ))
+            if not blocks:
+                return np.empty((0,), dtype=AUDIO_DTYPE), np.empty(0, dtype=int)
+            return np.concatenate([b[0] for b in blocks]), np.concatenate([b[1] for b in blocks])
+        if num_workers > 1 or output_path is not None:
+            return self._featurize_parallel(
+                file_paths, feature_extractor, batch_size, num_workers, output_path
+            )
+        return self._featurize_files(file_paths, feature_extractor, batch_size)
+    
+    def _featurize_files(
+        self,
+        file_paths: List[str],
+        feature_extractor: RespiratoryFeatureExtractor,
+        batch_size: int = 32,
+        progress: bool = True
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        if self.window_increase is not None:
+            features, rows, _ = self._featurize_windows(
+                file_paths, feature_extractor, batch_size, progress
+            )
+            return features, rows
+        
+        features = {}
+        pending_idx, pending_audio, pending_keys = [], [], []
+        
+        def flush():
+            batch = feature_extractor.prepare_model_input_batch(np.stack(pending_audio))
+            for i, key, feat in zip(pending_idx, pending_keys, batch):
+                features[i] = feat
+                if key is not None:
+                    self.feature_cache.put(key, feat)
+            pending_idx.clear()
+            pending_audio.clear()
+            pending_keys.clear()
+        
+        for i, file_path in enumerate(tqdm(file_paths, desc="Featurizing", disable=not progress)):
+            key = None
+            if self.feature_cache is not None:
+                key = self._file_cache_key(file_path, feature_extractor)
+                cached = self.feature_cache.get(key)
+                if cached is not None:
+                    features[i] = cached
+                    continue
             
-            print(f"Loading {len(audio_files)} files from {label_name}...")
+            audio = self.load_audio_file(file_path)
+            if audio is None:
+                continue
+            pending_idx.append(i)
+            pending_audio.append(audio)
+            pending_keys.append(key)
+            if len(pending_audio) >= batch_size:
+                flush()
+        
+        if pending_audio:
+            flush()
+        
+        kept = np.array(sorted(features), dtype=int)
+        if len(kept) == 0:
+            return np.empty((0,), dtype=AUDIO_DTYPE), kept
+        return np.stack([features[i] for i in kept]), kept
+    
+    def iter_window_features(
+        self,
+        file_paths: List[str],
+        feature_extractor: RespiratoryFeatureExtractor,
+        batch_size: int = 32,
+        num_workers: int = 1,
+        files_per_block: int = 8,
+        prefetch: int = 2
+    ) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Featurize the sliding windows of ``file_paths`` block by block.
+        
+        Blocks of ``files_per_block`` files are processed in order, by up to
+        ``num_workers`` processes with bounded prefetch, so memory stays
+        bounded however long the recordings are.
+        
+        Yields:
+            (features, rows, offsets) per block, where rows index
+            ``file_paths`` and offsets are window start samples
+        """
+        blocks = [
+            (start, list(file_paths[start:start + files_per_block]), batch_size)
+            for start in range(0, len(file_paths), files_per_block)
+        ]
+        if num_workers <= 1:
+            for start, paths, _ in tqdm(blocks, desc="Featurizing windows"):
+                features, rows, offsets = self._featurize_windows(
+                    paths, feature_extractor, batch_size, progress=False
+                )
+                yield features, start + rows, offsets
+            return
+        
+        pool = ProcessPoolExecutor(
+            max_workers=num_workers,
+            initializer=_init_featurize_worker,
+            initargs=(self.get_params(), feature_extractor.get_params())
+        )
+        results = bounded_map(pool, _featurize_windows_block, blocks, num_workers * prefetch)
+        with pool:
+            try:
+                yield from tqdm(results, total=len(blocks), desc="Featurizing windows")
+            finally:
+                results.close()
+    
+    def _featurize_windows(
+        self,
+        file_paths: List[str],
+        feature_extractor: RespiratoryFeatureExtractor,
+        batch_size: int = 32,
+        progress: bool = True,
+        transform: Optional[Callable[[np.ndarray], np.ndarray]] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Featurize every window of every file; windows are only copied out of
+        the decoded recordings ``batch_size`` at a time, peak-normalized like
+        load_audio_file and optionally passed through ``transform``.
+        
+        Returns:
+            (features, rows, offsets) with rows indexing ``file_paths``
+        """
+        chunks, rows, offsets = [], [], []
+        pending: List[np.ndarray] = []
+        
+        def flush():
+            audio = np.concatenate(pending).astype(AUDIO_DTYPE, copy=False)
+            peaks = np.abs(audio).max(axis=1, keepdims=True)
+            np.divide(audio, peaks, out=audio, where=peaks > 0)
+            if transform is not None:
+                audio = transform(audio)
+            chunks.append(feature_extractor.prepare_model_input_batch(audio))
+            pending.clear()
+        
+        for i, file_path in enumerate(tqdm(file_paths, desc="Featurizing", disable=not progress)):
+            loaded = self.load_windows(file_path)
+            if loaded is None:
+                continue
+            windows, window_starts = loaded
+            rows.append(np.full(len(windows), i, dtype=int))
+            offsets.append(window_starts)
             
-            for audio_file in tqdm(audio_files, desc=label_name):
-                audio = self.load_audio_file(str(audio_file))
-                if audio is not None:
-                    audio_data.append(audio)
-                    labels.append(label_id)
-                    file_paths.append(str(audio_file))
+            start = 0
+            while start < len(windows):
+                count = min(batch_size - sum(len(p) for p in pending), len(windows) - start)
+                pending.append(windows[start:start + count])
+                start += count
+                if sum(len(p) for p in pending) >= batch_size:
+                    flush()
         
-        return audio_data, labels, file_paths
+        if pending:
+            flush()
+        
+        if not chunks:
+            return (
+                np.empty((0,), dtype=AUDIO_DTYPE),
+                np.empty(0, dtype=int),
+                np.empty(0, dtype=np.int64)
+            )
+        return np.concatenate(chunks), np.concatenate(rows), np.concatenate(offsets)
     
-    def load_from_csv(self, csv_path: str) -> Tuple[List[np.ndarray], List[int]]:
+    def _featurize_parallel(
+        self,
+        file_paths: List[str],
+        feature_extractor: RespiratoryFeatureExtractor,
+        batch_size: int,
+        num_workers: int,
+        output_path: Optional[str]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        n_samples = int(self.sample_rate * self.duration)
+        shape = (
+            len(file_paths),
+            1 + n_samples // feature_extractor.hop_length,
+            3 * feature_extractor.n_mfcc + feature_extractor.n_mels,
+            1
+        )
+        
+        # Workers write rows into a preallocated .npy that every process maps
+        final_path = output_path
+        if output_path is None:
+            fd, output_path = tempfile.mkstemp(suffix='.npy')
+            os.close(fd)
+        else:
+            Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+            output_path = f'{output_path}.partial'
+        output = np.lib.format.open_memmap(output_path, mode='w+', dtype=AUDIO_DTYPE, shape=shape)
+        del output
+        
+        blocks = [
+            (start, list(file_paths[start:start + batch_size]))
+            for start in range(0, len(file_paths), batch_size)
+        ]
+        kept = []
+        with ProcessPoolExecutor(
+            max_workers=max(1, num_workers),
+            initializer=_init_featurize_worker,
+            initargs=(self.get_params(), feature_extractor.get_params(), output_path)
+        ) as pool:
+            for block_kept in tqdm(
+                pool.map(_featurize_block, blocks), total=len(blocks), desc="Featurizing"
+            ):
+                kept.extend(block_kept)
+        kept = np.array(kept, dtype=int)
+        
+        if len(kept) < len(file_paths):
+            # Compact the rows of files that failed to load
+            source = np.load(output_path, mmap_mode='r')
+            compact_path = f'{output_path}.compact'
+            compact = np.lib.format.open_memmap(
+                compact_path, mode='w+', dtype=AUDIO_DTYPE, shape=(len(kept),) + shape[1:]
+            )
+            for start in range(0, len(kept), batch_size):
+                compact[start:start + batch_size] = source[kept[start:start + batch_size]]
+            compact.flush()
+            del source, compact
+            os.replace(compact_path, output_path)
+        
+        if final_path is not None:
+            os.replace(output_path, final_path)
+            return np.load(final_path, mmap_mode='r'), kept
+        
+        # Anonymous output: the mapping stays valid after the file is unlinked
+        features = np.load(output_path, mmap_mode='r')
+        os.unlink(output_path)
+        return features, kept
+    
+    def load_from_csv(
+        self,
+        csv_path: str,
+        num_workers: int = 1,
+        as_array: bool = False
+    ) -> Tuple[Union[List[np.ndarray], np.ndarray], List[int]]:
         """
         Load dataset from CSV manifest.
         CSV format: file_path, label
+        
+        See load_audio_files for ``num_workers`` and ``as_array``.
         """
         df = pd.read_csv(csv_path)
-        audio_data = []
-        labels = []
+        file_paths = df['file_path'].tolist()
+        label_ids = [self.label_map[label] for label in df['label']]
         
-        for _, row in tqdm(df.iterrows(), total=len(df), desc="Loading from CSV"):
-            audio = self.load_audio_file(row['file_path'])
-            if audio is not None:
-                audio_data.append(audio)
-                labels.append(self.label_map[row['label']])
+        audio_data, kept = self.load_audio_files(
+            file_paths, num_workers=num_workers, as_array=as_array
+        )
+        labels = [label_ids[i] for i in kept]
         
         return audio_data, labels
     
@@ -112,29 +552,27 @@ class RespiratoryDataLoader:
         val_size: float = 0.15,
         random_state: int = 42
     ) -> Tuple:
-        """Split data into train, validation, and test sets."""
-        
-        # First split: train+val vs test
-        X_temp, X_test, y_temp, y_test = train_test_split(
-            audio_data, labels,
-            test_size=test_size,
-            random_state=random_state,
-            stratify=labels
-        )
+        """
+        Split data into train, validation, and test sets.
         
-        # Second split: train vs val
-        val_ratio = val_size / (1 - test_size)
-        X_train, X_val, y_train, y_val = train_test_split(
-            X_temp, y_temp,
-            test_size=val_ratio,
-            random_state=random_state,
-            stratify=y_temp
+        The split is computed on indices (see src.splits), so each partition
+        is gathered exactly once; use DatasetSplit directly to get index sets
+        or lazy views instead of copies.
+        """
+        indices = split_indices(
+            labels, test_size=test_size, val_size=val_size, random_state=random_state
         )
+        labels = np.asarray(labels)
+        
+        def gather(rows: np.ndarray):
+            if isinstance(audio_data, np.ndarray):
+                return audio_data[rows]
+            return np.array([audio_data[i] for i in rows])
         
         return (
-            np.array(X_train), np.array(y_train),
-            np.array(X_val), np.array(y_val),
-            np.array(X_test), np.array(y_test)
+            gather(indices['train']), labels[indices['train']],
+            gather(indices['val']), labels[indices['val']],
+            gather(indices['test']), labels[indices['test']]
         )
     
     def save_processed_data(
@@ -142,18 +580,25 @@ class RespiratoryDataLoader:
         X_train, y_train,
         X_val, y_val,
         X_test, y_test,
-        output_dir: str = 'data/processed'
+        output_dir: str = 'data/processed',
+        shard_size: int = 4096,
+        metadata: Optional[Dict] = None,
+        codec=None
     ):
-        """Save processed data to disk."""
-        output_path = Path(output_dir)
-        output_path.mkdir(parents=True, exist_ok=True)
+        """
+        Save processed data to disk as memory-mappable shards (one directory per split).
         
-        np.save(output_path / 'X_train.npy', X_train)
-        np.save(output_path / 'y_train.npy', y_train)
-        np.save(output_path / 'X_val.npy', X_val)
-        np.save(output_path / 'y_val.npy', y_val)
-        np.save(output_path / 'X_test.npy', X_test)
-        np.save(output_path / 'y_test.npy', y_test)
+        ``codec`` (e.g. CompactFeatureCodec) stores the features compactly.
+        """
+        from .sharded_dataset import ShardWriter
+        
+        output_path = Path(output_dir)
+        splits = {'train': (X_train, y_train), 'val': (X_val, y_val), 'test': (X_test, y_test)}
+        for split, (X, y) in splits.items():
+            with ShardWriter(
+                output_path / split, shard_size=shard_size, metadata=metadata, codec=codec
+            ) as writer:
+                writer.write_arrays(X, y)
         
         print(f"Processed data saved to {output_dir}")
     
@@ -161,33 +606,110 @@ class RespiratoryDataLoader:
         self,
         data_dir: str = 'data/processed'
     ) -> Tuple:
-        """Load preprocessed data from disk."""
-        data_path = Path(data_dir)
+        """
+        Open preprocessed data without reading it into memory.
         
-        X_train = np.load(data_path / 'X_train.npy')
-        y_train = np.load(data_path / 'y_train.npy')
-        X_val = np.load(data_path / 'X_val.npy')
-        y_val = np.load(data_path / 'y_val.npy')
-        X_test = np.load(data_path / 'X_test.npy')
-        y_test = np.load(data_path / 'y_test.npy')
+        Each X is a memory-mapped ShardedDataset (index it or iterate its
+        batches); each y is the in-memory label array.
+        """
+        from .sharded_dataset import ShardedDataset
+        
+        splits = [ShardedDataset.open(data_dir, split) for split in ('train', 'val', 'test')]
+        X_train, X_val, X_test = splits
         
-        return X_train, y_train, X_val, y_val, X_test, y_test
+        return X_train, X_train.labels, X_val, X_val.labels, X_test, X_test.labels
 
 
-def augment_audio(audio: np.ndarray, sr: int = 16000) -> List[np.ndarray]:
-    """Apply audio augmentation techniques."""
-    augmented = [audio]  # Original
-    
-    # Time stretch
-    augmented.append(librosa.effects.time_stretch(audio, rate=0.9))
-    augmented.append(librosa.effects.time_stretch(audio, rate=1.1))
-    
-    # Pitch shift
-    augmented.append(librosa.effects.pitch_shift(audio, sr=sr, n_steps=2))
-    augmented.append(librosa.effects.pitch_shift(audio, sr=sr, n_steps=-2))
-    
-    # Add noise
-    noise = np.random.normal(0, 0.005, audio.shape)
-    augmented.append(audio + noise)
-    
-    return augmented
+def bounded_map(pool, fn, items, max_pending: int) -> Iterator:
+    """
+    Like pool.map, but with at most ``max_pending`` tasks submitted ahead of
+    the consumer; results are yielded in input order.
+    """
+    pending = deque()
+    try:
+        for item in items:
+            pending.append(pool.submit(fn, item))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+_worker_state = {}
+
+
+def _init_load_worker(loader_params: Dict):
+    """Build the loader once per worker process."""
+    loader_params = dict(loader_params)
+    cache_params = loader_params.pop('feature_cache', None)
+    if cache_params is not None:
+        loader_params['feature_cache'] = FeatureCache(**cache_params)
+    waveform_params = loader_params.pop('waveform_cache', None)
+    if waveform_params is not None:
+        loader_params['waveform_cache'] = WaveformCache(**waveform_params)
+    _worker_state['loader'] = RespiratoryDataLoader(**loader_params)
+
+
+def _load_audio_worker(file_path: str) -> Optional[np.ndarray]:
+    return _worker_state['loader'].load_audio_file(file_path)
+
+
+def _init_featurize_worker(
+    loader_params: Dict,
+    extractor_params: Dict,
+    output_path: Optional[str] = None,
+    augmenter_params: Optional[Dict] = None
+):
+    """Build the loader, extractor, augmenter and output mapping once per worker process."""
+    _init_load_worker(loader_params)
+    _worker_state['extractor'] = RespiratoryFeatureExtractor(**extractor_params)
+    if output_path is not None:
+        _worker_state['output'] = np.load(output_path, mmap_mode='r+')
+    if augmenter_params is not None:
+        from .augmentation import BatchAugmenter
+        _worker_state['augmenter'] = BatchAugmenter.from_params(augmenter_params)
+
+
+def _featurize_files_worker(file_paths: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Featurize one block of files and return (features, kept)."""
+    return _worker_state['loader']._featurize_files(
+        file_paths, _worker_state['extractor'], batch_size=len(file_paths), progress=False
+    )
+
+
+def _featurize_windows_block(
+    block: Tuple[int, List[str], int]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Featurize the windows of one (start, file_paths, batch_size) block; rows are global."""
+    start, file_paths, batch_size = block
+    features, rows, offsets = _worker_state['loader']._featurize_windows(
+        file_paths, _worker_state['extractor'], batch_size, progress=False
+    )
+    return features, start + rows, offsets
+
+
+def _augment_featurize_worker(block: Tuple[List[str], int]) -> Tuple[np.ndarray, np.ndarray]:
+    """Decode, augment and featurize one (file_paths, seed) block."""
+    from .augmentation import augment_and_featurize
+    file_paths, seed = block
+    return augment_and_featurize(
+        _worker_state['loader'], _worker_state['extractor'], _worker_state['augmenter'],
+        file_paths, seed
+    )
+
+
+def _featurize_block(block: Tuple[int, List[str]]) -> List[int]:
+    """Featurize one block of files into its rows of the shared output."""
+    start, file_paths = block
+    loader = _worker_state['loader']
+    features, kept = loader._featurize_files(
+        file_paths, _worker_state['extractor'], batch_size=len(file_paths), progress=False
+    )
+    output = _worker_state['output']
+    if len(kept) > 0:
+        output[start + kept] = features
+        output.flush()
+    return (start + kept).tolist()
@@ -0,0 +1,218 @@
+"""
+Streaming (features, label) datasets for training without loading the corpus.
+"""
+
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+from .data_loader import (
+    RespiratoryDataLoader,
+    bounded_map,
+    _augment_featurize_worker,
+    _featurize_files_worker,
+    _init_featurize_worker
+)
+from .augmentation import BatchAugmenter, augment_and_featurize
+from .feature_extractor import AUDIO_DTYPE, RespiratoryFeatureExtractor
+
+
+class RespiratoryDataset:
+    """
+    Lazily decoded and featurized batches of model inputs.
+    
+    Files are decoded and featurized in blocks of ``batch_size`` by a thread
+    or process pool with at most ``num_workers * prefetch`` blocks in flight,
+    so peak memory is bounded by the prefetch depth and shuffle buffer rather
+    than the corpus size. With ``shuffle_buffer > 0`` the file order is
+    reshuffled every epoch and examples are drawn at random from a buffer of
+    that many examples. Files that fail to load are skipped. With a
+    windowing loader (``window_increase``) a block yields every window of
+    its files, so keep ``batch_size`` modest for long recordings.
+    
+    An ``augmenter`` re-randomizes every block with a seed drawn from the
+    dataset's generator, so each epoch sees fresh augmentations while runs
+    with the same ``seed`` are reproducible.
+    """
+    
+    def __init__(
+        self,
+        file_paths: Sequence[str],
+        labels: Sequence[int],
+        loader: Optional[RespiratoryDataLoader] = None,
+        feature_extractor: Optional[RespiratoryFeatureExtractor] = None,
+        batch_size: int = 64,
+        shuffle_buffer: int = 0,
+        num_workers: int = 1,
+        prefetch: int = 2,
+        use_processes: bool = False,
+        seed: Optional[int] = None,
+        augmenter: Optional[BatchAugmenter] = None
+    ):
+        self.file_paths = list(file_paths)
+        self.labels = np.asarray(labels, dtype=np.int64)
+        self.loader = loader or RespiratoryDataLoader()
+        self.feature_extractor = feature_extractor or RespiratoryFeatureExtractor()
+        self.batch_size = batch_size
+        self.shuffle_buffer = shuffle_buffer
+        self.num_workers = num_workers
+        self.prefetch = prefetch
+        self.use_processes = use_processes
+        self.augmenter = augmenter
+        self.rng = np.random.default_rng(seed)
+    
+    @classmethod
+    def from_directory(cls, loader: RespiratoryDataLoader, **kwargs) -> 'RespiratoryDataset':
+        """Dataset over the loader's ``data_dir/<label>/`` layout."""
+        file_paths, labels = loader.list_dataset_files()
+        return cls(file_paths, labels, loader=loader, **kwargs)
+    
+    @classmethod
+    def from_csv(
+        cls,
+        csv_path: str,
+        loader: RespiratoryDataLoader,
+        **kwargs
+    ) -> 'RespiratoryDataset':
+        """Dataset over a ``file_path, label`` CSV manifest."""
+        df = pd.read_csv(csv_path)
+        labels = [loader.label_map[label] for label in df['label']]
+        return cls(df['file_path'].tolist(), labels, loader=loader, **kwargs)
+    
+    @property
+    def element_shape(self) -> Tuple[int, int, int]:
+        """Shape of one model input: (time, features, 1)."""
+        extractor = self.feature_extractor
+        n_samples = int(self.loader.sample_rate * self.loader.duration)
+        return (
+            1 + n_samples // extractor.hop_length,
+            3 * extractor.n_mfcc + extractor.n_mels,
+            1
+        )
+    
+    def __len__(self) -> int:
+        """Number of batches per epoch (an upper bound if files fail to load)."""
+        return -(-len(self.file_paths) // self.batch_size)
+    
+    def _iter_blocks(self, order: np.ndarray) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Yield (features, labels) per block of files, in ``order``."""
+        blocks = [
+            order[start:start + self.batch_size]
+            for start in range(0, len(order), self.batch_size)
+        ]
+        
+        # One seed per block, drawn up front so results don't depend on scheduling
+        seeds = self.rng.integers(2 ** 32, size=len(blocks)).tolist()
+        
+        def featurize(item: Tuple[np.ndarray, int]) -> Tuple[np.ndarray, np.ndarray]:
+            block, seed = item
+            paths = [self.file_paths[i] for i in block]
+            if self.augmenter is not None:
+                return augment_and_featurize(
+                    self.loader, self.feature_extractor, self.augmenter, paths, seed
+                )
+            return self.loader._featurize_files(
+                paths, self.feature_extractor, batch_size=len(block), progress=False
+            )
+        
+        if self.num_workers <= 1:
+            for block, seed in zip(blocks, seeds):
+                features, kept = featurize((block, seed))
+                if len(kept) > 0:
+                    yield features, self.labels[block[kept]]
+            return
+        
+        max_pending = self.num_workers * self.prefetch
+        if self.use_processes:
+            augmenter_params = self.augmenter.get_params() if self.augmenter is not None else None
+            pool = ProcessPoolExecutor(
+                max_workers=self.num_workers,
+                initializer=_init_featurize_worker,
+                initargs=(
+                    self.loader.get_params(), self.feature_extractor.get_params(),
+                    None, augmenter_params
+                )
+            )
+            path_blocks = [[self.file_paths[i] for i in block] for block in blocks]
+            if self.augmenter is not None:
+                results = bounded_map(
+                    pool, _augment_featurize_worker, list(zip(path_blocks, seeds)), max_pending
+                )
+            else:
+                results = bounded_map(pool, _featurize_files_worker, path_blocks, max_pending)
+        else:
+            pool = ThreadPoolExecutor(max_workers=self.num_workers)
+            results = bounded_map(pool, featurize, list(zip(blocks, seeds)), max_pending)
+        
+        with pool:
+            try:
+                for block, (features, kept) in zip(blocks, results):
+                    if len(kept) > 0:
+                        yield features, self.labels[block[kept]]
+            finally:
+                results.close()  # cancel queued blocks if the consumer stops early
+    
+    def __iter__(self) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Yield (features, labels) batches for one epoch."""
+        order = np.arange(len(self.file_paths))
+        if self.shuffle_buffer > 0:
+            self.rng.shuffle(order)
+        
+        buffer_x: List[np.ndarray] = []
+        buffer_y: List[int] = []
+        
+        def take(count: int) -> Tuple[np.ndarray, np.ndarray]:
+            if self.shuffle_buffer > 0:
+                # Swap random picks to the end of the buffer, then pop them
+                for i in range(count):
+                    j = self.rng.integers(len(buffer_x) - i)
+                    last = len(buffer_x) - 1 - i
+                    buffer_x[j], buffer_x[last] = buffer_x[last], buffer_x[j]
+                    buffer_y[j], buffer_y[last] = buffer_y[last], buffer_y[j]
+                batch = slice(len(buffer_x) - count, None)
+            else:
+                batch = slice(0, count)
+            features = np.stack(buffer_x[batch]).astype(AUDIO_DTYPE, copy=False)
+            labels = np.array(buffer_y[batch], dtype=np.int64)
+            del buffer_x[batch], buffer_y[batch]
+            return features, labels
+        
+        fill = max(self.shuffle_buffer, self.batch_size)
+        for features, labels in self._iter_blocks(order):
+            buffer_x.extend(features)
+            buffer_y.extend(labels.tolist())
+            while len(buffer_x) >= fill:
+                yield take(self.batch_size)
+        
+        while buffer_x:
+            yield take(min(self.batch_size, len(buffer_x)))
+    
+    def to_tf_dataset(self, num_classes: Optional[int] = None):
+        """
+        Wrap the iterator as a prefetching tf.data.Dataset for model.fit.
+        
+        With ``num_classes`` labels are one-hot encoded (for
+        categorical_crossentropy). Each epoch re-runs the iterator.
+        """
+        return batches_to_tf_dataset(lambda: iter(self), self.element_shape, num_classes)
+
+
+def batches_to_tf_dataset(
+    make_batches: Callable[[], Iterator[Tuple[np.ndarray, np.ndarray]]],
+    element_shape: Tuple[int, ...],
+    num_classes: Optional[int] = None
+):
+    """tf.data.Dataset over (features, labels) batches from ``make_batches()``."""
+    import tensorflow as tf
+    
+    signature = (
+        tf.TensorSpec(shape=(None,) + tuple(element_shape), dtype=tf.float32),
+        tf.TensorSpec(shape=(None,), dtype=tf.int64)
+    )
+    dataset = tf.data.Dataset.from_generator(make_batches, output_signature=signature)
+    if num_classes is not None:
+        dataset = dataset.map(
+            lambda x, y: (x, tf.one_hot(y, num_classes)),
+            num_parallel_calls=tf.data.AUTOTUNE
+        )
+    return dataset.prefetch(tf.data.AUTOTUNE)
@@ -0,0 +1,133 @@
+"""
+Content-addressed on-disk cache for extracted features.
+"""
+
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+
+class FeatureCache:
+    """
+    Size-bounded LRU cache of feature arrays stored as .npy files.
+    
+    Entries are keyed by a hash of the source bytes (decoded PCM or the raw
+    audio file) plus the parameters that produced them, so changing either
+    the audio or the extractor configuration never returns a stale entry.
+    Hits are returned memory-mapped and refresh the entry's access time.
+    Once ``max_bytes`` is exceeded the least recently used entries are
+    evicted down to ``low_water`` of it, so a full cache scans the
+    directory once per batch of evictions rather than on every ``put``.
+    """
+    
+    def __init__(
+        self,
+        cache_dir: str = 'data/features',
+        max_bytes: int = 2 * 1024 ** 3,
+        mmap: bool = True,
+        low_water: float = 0.9
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        self.mmap = mmap
+        self.hits = 0
+        self.misses = 0
+        self._size = sum(path.stat().st_size for path in self._entries())
+    
+    @staticmethod
+    def make_key(data: Union[bytes, np.ndarray], params: Dict) -> str:
+        """Hash source bytes together with the producing parameters."""
+        digest = hashlib.sha256()
+        if isinstance(data, np.ndarray):
+            data = np.ascontiguousarray(data).tobytes()
+        digest.update(data)
+        digest.update(json.dumps(params, sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+    
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f'{key}.npy'
+    
+    def _entries(self):
+        return self.cache_dir.glob('*/*.npy')
+    
+    @property
+    def size_bytes(self) -> int:
+        return self._size
+    
+    def __len__(self) -> int:
+        return sum(1 for _ in self._entries())
+    
+    def __contains__(self, key: str) -> bool:
+        return self._path(key).exists()
+    
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Return the cached array (memory-mapped) or None."""
+        path = self._path(key)
+        try:
+            array = np.load(path, mmap_mode='r' if self.mmap else None)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, ValueError):
+            # Truncated or corrupt entry: drop it and recompute
+            self._remove(path)
+            self.misses += 1
+            return None
+        
+        os.utime(path)  # LRU: mark as recently used
+        self.hits += 1
+        return array
+    
+    def put(self, key: str, array: np.ndarray):
+        """Store an array, evicting least recently used entries if needed."""
+        path = self._path(key)
+        if path.exists():
+            return
+        
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f'{path.stem}.{os.getpid()}.{threading.get_ident()}.tmp')
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.ascontiguousarray(array))
+        os.replace(tmp_path, path)  # atomic, so readers never see partial files
+        
+        self._size += path.stat().st_size
+        if self._size > self.max_bytes:
+            self._evict()
+    
+    def _remove(self, path: Path):
+        try:
+            size = path.stat().st_size
+            path.unlink()
+            self._size -= size
+        except FileNotFoundError:
+            pass
+    
+    def _evict(self):
+        """Delete least recently used entries until under ``low_water * max_bytes``."""
+        entries = []
+        for path in self._entries():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        
+        # Resync with disk (other processes may share the directory)
+        self._size = sum(size for _, size, _ in entries)
+        target = self.low_water * self.max_bytes
+        for _, _, path in sorted(entries):
+            if self._size <= target:
+                break
+            self._remove(path)
+    
+    def clear(self):
+        """Remove all cached entries."""
+        for path in list(self._entries()):
+            self._remove(path)
+        self._size = 0
@@ -0,0 +1,82 @@
+"""
+Compact storage codec for model-input feature arrays.
+
+Model inputs are (N, time, features, 1) float32 stacks of MFCC + deltas
+followed by log-mel bands. The compact codec stores the MFCC block as
+float16 and quantizes every log-mel band of every example to uint8 (or
+uint16) with its own scale/offset, cutting a 3 s clip from ~300 KB to
+~110 KB (uint8). Decoding is a vectorized multiply-add per batch.
+"""
+
+import numpy as np
+from typing import Dict, Optional
+from .feature_extractor import AUDIO_DTYPE
+
+
+class CompactFeatureCodec:
+    """Encode/decode feature batches as float16 MFCC + quantized log-mel parts."""
+    
+    name = 'compact'
+    parts = ('mfcc', 'mel', 'mel_scale', 'mel_offset')
+    
+    def __init__(self, mfcc_features: int = 120, mel_dtype: str = 'uint8'):
+        if mel_dtype not in ('uint8', 'uint16'):
+            raise ValueError(f"mel_dtype must be 'uint8' or 'uint16', got '{mel_dtype}'")
+        self.mfcc_features = mfcc_features
+        self.mel_dtype = np.dtype(mel_dtype)
+    
+    @classmethod
+    def from_params(cls, params: Optional[Dict]) -> Optional['CompactFeatureCodec']:
+        """Rebuild a codec from get_params() output (None means uncompressed)."""
+        if params is None:
+            return None
+        if params['name'] != cls.name:
+            raise ValueError(f"Unknown feature codec '{params['name']}'")
+        return cls(params['mfcc_features'], params['mel_dtype'])
+    
+    def get_params(self) -> Dict:
+        return {
+            'name': self.name,
+            'mfcc_features': self.mfcc_features,
+            'mel_dtype': self.mel_dtype.name
+        }
+    
+    def part_specs(self, n: int, element_shape) -> Dict[str, tuple]:
+        """(shape, dtype) of every encoded part for ``n`` examples."""
+        n_time, n_features = element_shape[:2]
+        n_mels = n_features - self.mfcc_features
+        return {
+            'mfcc': ((n, n_time, self.mfcc_features), np.dtype(np.float16)),
+            'mel': ((n, n_time, n_mels), self.mel_dtype),
+            'mel_scale': ((n, n_mels), np.dtype(np.float32)),
+            'mel_offset': ((n, n_mels), np.dtype(np.float32))
+        }
+    
+    def encode(self, features: np.ndarray) -> Dict[str, np.ndarray]:
+        """(N, time, features, 1) float32 -> dict of compact arrays."""
+        features = np.asarray(features)[..., 0]
+        mel = features[..., self.mfcc_features:].astype(np.float32)
+        
+        # Per example and mel band: map [min, max] over time onto the integer range
+        offset = mel.min(axis=1)
+        span = mel.max(axis=1) - offset
+        qmax = np.iinfo(self.mel_dtype).max
+        scale = np.where(span > 0, span / qmax, 1.0).astype(np.float32)
+        quantized = np.rint((mel - offset[:, np.newaxis]) / scale[:, np.newaxis])
+        
+        return {
+            'mfcc': features[..., :self.mfcc_features].astype(np.float16),
+            'mel': np.clip(quantized, 0, qmax).astype(self.mel_dtype),
+            'mel_scale': scale,
+            'mel_offset': offset.astype(np.float32)
+        }
+    
+    def decode(self, parts: Dict[str, np.ndarray]) -> np.ndarray:
+        """Dict of compact arrays -> (N, time, features, 1) float32."""
+        mfcc, mel = parts['mfcc'], parts['mel']
+        n, n_time = mel.shape[:2]
+        out = np.empty((n, n_time, self.mfcc_features + mel.shape[2], 1), dtype=AUDIO_DTYPE)
+        out[..., :self.mfcc_features, 0] = mfcc
+        np.multiply(mel, parts['mel_scale'][:, np.newaxis], out=out[..., self.mfcc_features:, 0])
+        out[..., self.mfcc_features:, 0] += parts['mel_offset'][:, np.newaxis]
+        return out
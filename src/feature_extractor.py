@@ -3,10 +3,60 @@ Feature extraction module for respiratory audio analysis.
 Extracts MFCC, Mel-Spectrogram, and other acoustic features.
 """
 
+import math
 import numpy as np
-import librosa
+import scipy.fft
 import scipy.signal as signal
-from typing import Dict, Tuple
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+from .audio_backend import frame_power, get_backend
+from .feature_cache import FeatureCache
+from .resampling import resample
+from .windowing import sliding_windows, window_offsets
+
+
+# Audio and features stay float32 from decode to model input
+AUDIO_DTYPE = np.float32
+
+
+@lru_cache(maxsize=None)
+def get_feature_tables(
+    sample_rate: int,
+    n_fft: int,
+    n_mels: int,
+    n_mfcc: int,
+    fmin: float,
+    fmax: float,
+    backend: str = 'librosa'
+) -> Dict[str, np.ndarray]:
+    """
+    Process-wide cache of the STFT window, mel filterbank and DCT basis.
+    
+    Tables are built once per configuration and shared (read-only) by every
+    extractor instance.
+    """
+    tables = {
+        'window': signal.get_window('hann', n_fft, fftbins=True).astype(AUDIO_DTYPE),
+        'mel_basis': get_backend(backend).mel_filterbank(sample_rate, n_fft, n_mels, fmin, fmax),
+        # Orthonormal DCT-II, truncated to the first n_mfcc coefficients
+        'dct_basis': scipy.fft.dct(
+            np.eye(n_mels, dtype=AUDIO_DTYPE), type=2, norm='ortho', axis=0
+        )[:n_mfcc],
+    }
+    for table in tables.values():
+        table.flags.writeable = False
+    return tables
+
+
+@lru_cache(maxsize=128)
+def get_chroma_filterbank(sample_rate: int, n_fft: int, tuning: float) -> np.ndarray:
+    """Cached chroma filterbank (tuning is estimated per clip on a 0.01-bin grid)."""
+    import librosa
+    chroma_fb = librosa.filters.chroma(
+        sr=sample_rate, n_fft=n_fft, tuning=tuning, dtype=AUDIO_DTYPE
+    )
+    chroma_fb.flags.writeable = False
+    return chroma_fb
 
 
 class RespiratoryFeatureExtractor:
@@ -20,7 +70,9 @@ class RespiratoryFeatureExtractor:
         n_fft: int = 2048,
         hop_length: int = 160,
         fmin: int = 20,
-        fmax: int = 8000
+        fmax: int = 8000,
+        cache: Optional[FeatureCache] = None,
+        backend: Optional[str] = None
     ):
         self.sample_rate = sample_rate
         self.n_mfcc = n_mfcc
@@ -29,116 +81,285 @@ class RespiratoryFeatureExtractor:
         self.hop_length = hop_length
         self.fmin = fmin
         self.fmax = fmax
+        self.cache = cache
+        self.backend = get_backend(backend)
     
-    def extract_mfcc(self, audio: np.ndarray) -> np.ndarray:
-        """Extract MFCC features."""
-        mfcc = librosa.feature.mfcc(
-            y=audio,
-            sr=self.sample_rate,
-            n_mfcc=self.n_mfcc,
-            n_fft=self.n_fft,
-            hop_length=self.hop_length,
-            fmin=self.fmin,
-            fmax=self.fmax
+    def get_params(self) -> Dict:
+        """Parameters that determine the extracted features (used as cache keys)."""
+        return {
+            'sample_rate': self.sample_rate,
+            'n_mfcc': self.n_mfcc,
+            'n_mels': self.n_mels,
+            'n_fft': self.n_fft,
+            'hop_length': self.hop_length,
+            'fmin': self.fmin,
+            'fmax': self.fmax,
+            'backend': self.backend.name
+        }
+    
+    def _cache_key(self, audio: np.ndarray) -> str:
+        return FeatureCache.make_key(
+            np.asarray(audio, dtype=AUDIO_DTYPE), {'model_input': self.get_params()}
         )
+    
+    @property
+    def tables(self) -> Dict[str, np.ndarray]:
+        """Cached window, mel filterbank and DCT basis for this configuration."""
+        return get_feature_tables(
+            self.sample_rate, self.n_fft, self.n_mels, self.n_mfcc, self.fmin, self.fmax,
+            self.backend.name
+        )
+    
+    def compute_spectrogram(self, audio: np.ndarray) -> np.ndarray:
+        """Compute the power spectrogram shared by all spectral features."""
+        return self.backend.power_spectrogram(
+            np.asarray(audio, dtype=AUDIO_DTYPE),
+            self.n_fft,
+            self.hop_length,
+            self.tables['window']
+        )
+    
+    def _mel_power(self, power_spec: np.ndarray) -> np.ndarray:
+        """Project a power spectrogram onto the mel filterbank."""
+        return self.tables['mel_basis'] @ power_spec
+    
+    def _mfcc_from_mel(self, mel_spec: np.ndarray) -> np.ndarray:
+        """MFCC with delta and delta-delta from a mel power spectrogram."""
+        mfcc = self.tables['dct_basis'] @ self.backend.power_to_db(mel_spec)
         # Add delta and delta-delta
-        mfcc_delta = librosa.feature.delta(mfcc)
-        mfcc_delta2 = librosa.feature.delta(mfcc, order=2)
+        mfcc_delta = self.backend.delta(mfcc)
+        mfcc_delta2 = self.backend.delta(mfcc, order=2)
         
         return np.concatenate([mfcc, mfcc_delta, mfcc_delta2], axis=0)
     
-    def extract_mel_spectrogram(self, audio: np.ndarray) -> np.ndarray:
+    def extract_mfcc(self, audio: np.ndarray, power_spec: np.ndarray = None) -> np.ndarray:
+        """Extract MFCC features."""
+        if power_spec is None:
+            power_spec = self.compute_spectrogram(audio)
+        return self._mfcc_from_mel(self._mel_power(power_spec))
+    
+    def extract_mel_spectrogram(
+        self,
+        audio: np.ndarray,
+        power_spec: np.ndarray = None
+    ) -> np.ndarray:
         """Extract Mel-Spectrogram."""
-        mel_spec = librosa.feature.melspectrogram(
-            y=audio,
-            sr=self.sample_rate,
-            n_mels=self.n_mels,
-            n_fft=self.n_fft,
-            hop_length=self.hop_length,
-            fmin=self.fmin,
-            fmax=self.fmax
-        )
+        if power_spec is None:
+            power_spec = self.compute_spectrogram(audio)
+        mel_spec = self._mel_power(power_spec)
         # Convert to log scale
-        mel_spec_db = librosa.power_to_db(mel_spec, ref=np.max)
+        mel_spec_db = self.backend.power_to_db(mel_spec, ref=np.max)
         return mel_spec_db
     
-    def extract_spectral_features(self, audio: np.ndarray) -> Dict[str, np.ndarray]:
-        """Extract spectral features."""
+    def extract_spectral_features(
+        self,
+        audio: np.ndarray,
+        power_spec: np.ndarray = None
+    ) -> Dict[str, np.ndarray]:
+        """Extract spectral features (descriptors always come from librosa)."""
+        import librosa
+        
+        if power_spec is None:
+            power_spec = self.compute_spectrogram(audio)
+        # Centroid, rolloff and bandwidth are defined on the magnitude spectrogram
+        magnitude = np.sqrt(power_spec)
+        
         features = {}
         
         # Spectral centroid
         features['spectral_centroid'] = librosa.feature.spectral_centroid(
-            y=audio, sr=self.sample_rate, n_fft=self.n_fft, hop_length=self.hop_length
-        )[0]
+            S=magnitude, sr=self.sample_rate, n_fft=self.n_fft, hop_length=self.hop_length
+        )[0].astype(AUDIO_DTYPE)
         
         # Spectral rolloff
         features['spectral_rolloff'] = librosa.feature.spectral_rolloff(
-            y=audio, sr=self.sample_rate, n_fft=self.n_fft, hop_length=self.hop_length, roll_percent=0.85
-        )[0]
+            S=magnitude, sr=self.sample_rate, n_fft=self.n_fft, hop_length=self.hop_length,
+            roll_percent=0.85
+        )[0].astype(AUDIO_DTYPE)
         
         # Zero crossing rate
         features['zero_crossing_rate'] = librosa.feature.zero_crossing_rate(
             audio, frame_length=self.n_fft, hop_length=self.hop_length
-        )[0]
+        )[0].astype(AUDIO_DTYPE)
         
         # Spectral bandwidth
         features['spectral_bandwidth'] = librosa.feature.spectral_bandwidth(
-            y=audio, sr=self.sample_rate, n_fft=self.n_fft, hop_length=self.hop_length
-        )[0]
+            S=magnitude, sr=self.sample_rate, n_fft=self.n_fft, hop_length=self.hop_length
+        )[0].astype(AUDIO_DTYPE)
         
         return features
     
-    def extract_chroma_features(self, audio: np.ndarray) -> np.ndarray:
-        """Extract chroma features."""
-        chroma = librosa.feature.chroma_stft(
-            y=audio,
-            sr=self.sample_rate,
-            n_fft=self.n_fft,
-            hop_length=self.hop_length
-        )
+    def extract_chroma_features(
+        self,
+        audio: np.ndarray,
+        power_spec: np.ndarray = None
+    ) -> np.ndarray:
+        """Extract chroma features (always computed with librosa)."""
+        import librosa
+        
+        if power_spec is None:
+            power_spec = self.compute_spectrogram(audio)
+        tuning = librosa.estimate_tuning(S=power_spec, sr=self.sample_rate, bins_per_octave=12)
+        chroma_fb = get_chroma_filterbank(self.sample_rate, self.n_fft, float(tuning))
+        chroma = librosa.util.normalize(chroma_fb @ power_spec, norm=np.inf, axis=-2)
         return chroma
     
-    def extract_breathing_cadence(self, audio: np.ndarray) -> Dict[str, float]:
-        """Extract breathing rhythm patterns."""
-        # Apply bandpass filter for breathing frequency (0.1-1 Hz)
-        sos = signal.butter(4, [0.1, 1.0], btype='band', fs=self.sample_rate, output='sos')
-        filtered = signal.sosfilt(sos, audio)
-        
-        # Detect peaks (breathing cycles)
-        peaks, properties = signal.find_peaks(
-            np.abs(filtered),
-            distance=self.sample_rate * 0.5,  # Min 0.5s between breaths
-            prominence=0.1
-        )
+    def _envelope_filter(self, envelope_rate: float):
+        """Breathing band-pass (0.1-1 Hz) designed at the envelope rate."""
+        decimation = max(1, int(round(self.sample_rate / envelope_rate)))
+        env_fs = self.sample_rate / decimation
+        sos = signal.butter(4, [0.1, 1.0], btype='band', fs=env_fs, output='sos')
+        return decimation, env_fs, sos
+    
+    @staticmethod
+    def _cadence_stats(
+        filtered: np.ndarray,
+        env_fs: float,
+        duration: float,
+        first: int = 0,
+        last: Optional[int] = None
+    ) -> Dict[str, float]:
+        """Breathing rate/regularity from envelope peaks in filtered[first:last]."""
+        peaks = np.zeros(0, dtype=int)
+        scale = np.max(np.abs(filtered)) if len(filtered) else 0
+        if scale > 0:
+            # Detect peaks (breathing cycles)
+            peaks, _ = signal.find_peaks(
+                filtered,
+                distance=max(1, int(env_fs * 0.5)),  # Min 0.5s between breaths
+                prominence=0.1 * scale
+            )
+        last = len(filtered) if last is None else last
+        peaks = peaks[(peaks >= first) & (peaks < last)]
         
         # Calculate breathing rate
-        duration = len(audio) / self.sample_rate
-        breathing_rate = len(peaks) / duration * 60  # breaths per minute
+        breathing_rate = len(peaks) / duration * 60 if duration > 0 else 0  # breaths per minute
         
         # Calculate regularity (coefficient of variation)
         if len(peaks) > 1:
-            intervals = np.diff(peaks) / self.sample_rate
+            intervals = np.diff(peaks) / env_fs
             regularity = np.std(intervals) / np.mean(intervals) if np.mean(intervals) > 0 else 0
         else:
             regularity = 0
         
         return {
-            'breathing_rate': breathing_rate,
-            'regularity': regularity,
+            'breathing_rate': float(breathing_rate),
+            'regularity': float(regularity),
             'num_cycles': len(peaks)
         }
     
+    def extract_breathing_cadence(
+        self,
+        audio: np.ndarray,
+        envelope_rate: float = 50.0
+    ) -> Dict[str, float]:
+        """
+        Extract breathing rhythm patterns.
+        
+        The rectified signal is averaged down to an amplitude envelope at
+        ``envelope_rate`` Hz; band-pass filtering and peak detection run at
+        that rate, where a 0.1-1 Hz filter is well conditioned in float32.
+        """
+        decimation, env_fs, sos = self._envelope_filter(envelope_rate)
+        n_blocks = len(audio) // decimation
+        envelope = np.abs(
+            np.asarray(audio[:n_blocks * decimation], dtype=AUDIO_DTYPE)
+        ).reshape(n_blocks, decimation).mean(axis=1)
+        
+        if n_blocks == 0:
+            return self._cadence_stats(envelope, env_fs, len(audio) / self.sample_rate)
+        
+        # Start the filter in steady state to avoid a start-up transient
+        zi = signal.sosfilt_zi(sos) * envelope[0]
+        filtered, _ = signal.sosfilt(sos, envelope, zi=zi)
+        
+        return self._cadence_stats(
+            filtered.astype(AUDIO_DTYPE), env_fs, len(audio) / self.sample_rate
+        )
+    
+    def iter_breathing_cadence(
+        self,
+        chunks: Iterable[np.ndarray],
+        segment_duration: float = 60.0,
+        envelope_rate: float = 50.0
+    ) -> Iterator[Dict[str, float]]:
+        """
+        Breathing cadence per segment (default: per minute) of a long recording.
+        
+        Consumes audio chunk by chunk; only the low-rate envelope around the
+        current segment is kept in memory, so hour-long recordings never need
+        to be held at the full sample rate.
+        
+        Yields:
+            dict with start_time, duration, breathing_rate, regularity, num_cycles
+        """
+        decimation, env_fs, sos = self._envelope_filter(envelope_rate)
+        segment = int(round(segment_duration * env_fs))
+        context = int(round(2.0 * env_fs))  # lets peaks at segment edges be found
+        
+        zi = None
+        leftover = np.zeros(0, dtype=AUDIO_DTYPE)
+        buffer = np.zeros(0, dtype=AUDIO_DTYPE)
+        buffer_start = 0  # envelope index of buffer[0]
+        segment_start = 0
+        
+        def emit(end: int, available: int) -> Dict[str, float]:
+            window_start = max(0, segment_start - context)
+            window_end = min(end + context, available)
+            window = buffer[window_start - buffer_start:window_end - buffer_start]
+            stats = self._cadence_stats(
+                window,
+                env_fs,
+                (end - segment_start) / env_fs,
+                first=segment_start - window_start,
+                last=end - window_start
+            )
+            stats['start_time'] = segment_start / env_fs
+            stats['duration'] = (end - segment_start) / env_fs
+            return stats
+        
+        for chunk in chunks:
+            samples = np.concatenate([leftover, np.asarray(chunk, dtype=AUDIO_DTYPE)])
+            n_blocks = len(samples) // decimation
+            leftover = samples[n_blocks * decimation:]
+            if n_blocks == 0:
+                continue
+            
+            blocks = np.abs(samples[:n_blocks * decimation]).reshape(n_blocks, decimation)
+            envelope = blocks.mean(axis=1)
+            if zi is None:
+                zi = signal.sosfilt_zi(sos) * envelope[0]
+            filtered, zi = signal.sosfilt(sos, envelope, zi=zi)
+            buffer = np.concatenate([buffer, filtered.astype(AUDIO_DTYPE)])
+            
+            available = buffer_start + len(buffer)
+            while available >= segment_start + segment + context:
+                yield emit(segment_start + segment, available)
+                segment_start += segment
+                # Keep only the left context of the next segment
+                keep_from = max(buffer_start, segment_start - context)
+                buffer = buffer[keep_from - buffer_start:]
+                buffer_start = keep_from
+        
+        available = buffer_start + len(buffer)
+        while segment_start < available:
+            end = min(segment_start + segment, available)
+            yield emit(end, available)
+            segment_start = end
+    
     def extract_all_features(self, audio: np.ndarray) -> Dict[str, np.ndarray]:
-        """Extract all features for model input."""
+        """Extract all features for model input (one STFT shared by every feature)."""
         features = {}
+        power_spec = self.compute_spectrogram(audio)
+        mel_power = self._mel_power(power_spec)
         
         # Core features
-        features['mfcc'] = self.extract_mfcc(audio)
-        features['mel_spectrogram'] = self.extract_mel_spectrogram(audio)
-        features['chroma'] = self.extract_chroma_features(audio)
+        features['mfcc'] = self._mfcc_from_mel(mel_power)
+        features['mel_spectrogram'] = self.backend.power_to_db(mel_power, ref=np.max)
+        features['chroma'] = self.extract_chroma_features(audio, power_spec)
         
         # Spectral features
-        spectral = self.extract_spectral_features(audio)
+        spectral = self.extract_spectral_features(audio, power_spec)
         features.update(spectral)
         
         # Breathing patterns
@@ -149,8 +370,21 @@ class RespiratoryFeatureExtractor:
     
     def prepare_model_input(self, audio: np.ndarray) -> np.ndarray:
         """Prepare features for model inference (MFCC + Mel-Spec combined)."""
-        mfcc = self.extract_mfcc(audio)
-        mel_spec = self.extract_mel_spectrogram(audio)
+        if self.cache is None:
+            return self._compute_model_input(audio)
+        
+        key = self._cache_key(audio)
+        combined = self.cache.get(key)
+        if combined is None:
+            combined = self._compute_model_input(audio)
+            self.cache.put(key, combined)
+        return combined
+    
+    def _compute_model_input(self, audio: np.ndarray) -> np.ndarray:
+        # MFCC and Mel-Spec share one STFT and one mel projection
+        mel_power = self._mel_power(self.compute_spectrogram(audio))
+        mfcc = self._mfcc_from_mel(mel_power)
+        mel_spec = self.backend.power_to_db(mel_power, ref=np.max)
         
         # Ensure same time dimension
         min_time = min(mfcc.shape[1], mel_spec.shape[1])
@@ -165,6 +399,289 @@ class RespiratoryFeatureExtractor:
         combined = np.expand_dims(combined, axis=-1)  # (time, features, 1)
         
         return combined
+    
+    def _power_spectrogram_batch(self, audio_batch: np.ndarray) -> np.ndarray:
+        """Batched centered STFT power: (N, samples) -> (N, time, n_fft // 2 + 1)."""
+        return frame_power(audio_batch, self.n_fft, self.hop_length, self.tables['window'])
+    
+    def _model_input_from_mel(self, mel_power: np.ndarray) -> np.ndarray:
+        """Batched MFCC + log-mel stack: (N, time, n_mels) -> (N, time, features, 1)."""
+        amin, top_db = 1e-10, 80.0
+        log_mel = 10.0 * np.log10(np.maximum(mel_power, amin))
+        
+        # MFCC: power_to_db(ref=1.0) followed by an orthonormal DCT-II
+        mfcc_db = np.maximum(log_mel, log_mel.max(axis=(1, 2), keepdims=True) - top_db)
+        mfcc = mfcc_db @ self.tables['dct_basis'].T
+        mfcc_delta = signal.savgol_filter(mfcc, 9, polyorder=1, deriv=1, axis=1, mode='interp')
+        mfcc_delta2 = signal.savgol_filter(mfcc, 9, polyorder=2, deriv=2, axis=1, mode='interp')
+        
+        # Mel-Spec: power_to_db(ref=np.max)
+        ref = np.maximum(mel_power.max(axis=(1, 2), keepdims=True), amin)
+        mel_db = log_mel - 10.0 * np.log10(ref)
+        mel_db = np.maximum(mel_db, mel_db.max(axis=(1, 2), keepdims=True) - top_db)
+        
+        combined = np.concatenate([mfcc, mfcc_delta, mfcc_delta2, mel_db], axis=-1)
+        return combined[..., np.newaxis]
+    
+    def prepare_model_input_batch(
+        self,
+        audio_batch: np.ndarray,
+        chunk_size: int = 32
+    ) -> np.ndarray:
+        """
+        Prepare model input for a batch of equal-length clips.
+        
+        Vectorized equivalent of calling prepare_model_input on every row:
+        framing, rFFT, mel projection and DCT run over the whole chunk.
+        
+        Args:
+            audio_batch: (N, samples) float32 array
+            chunk_size: clips processed per vectorized step (bounds memory)
+        
+        Returns:
+            (N, time, features, 1) array
+        """
+        audio_batch = np.atleast_2d(np.asarray(audio_batch, dtype=AUDIO_DTYPE))
+        mel_basis = self.tables['mel_basis']
+        
+        n_clips, n_samples = audio_batch.shape
+        n_frames = 1 + n_samples // self.hop_length
+        n_features = 3 * self.n_mfcc + self.n_mels
+        output = np.empty((n_clips, n_frames, n_features, 1), dtype=AUDIO_DTYPE)
+        
+        # Serve cached rows first; only the misses are featurized
+        todo = np.arange(n_clips)
+        if self.cache is not None:
+            keys = [self._cache_key(audio) for audio in audio_batch]
+            missing = []
+            for i, key in enumerate(keys):
+                cached = self.cache.get(key)
+                if cached is None:
+                    missing.append(i)
+                else:
+                    output[i] = cached
+            todo = np.array(missing, dtype=int)
+        
+        for start in range(0, len(todo), chunk_size):
+            rows = todo[start:start + chunk_size]
+            mel_power = self._power_spectrogram_batch(audio_batch[rows]) @ mel_basis.T
+            output[rows] = self._model_input_from_mel(mel_power)
+            if self.cache is not None:
+                for i in rows:
+                    self.cache.put(keys[i], output[i])
+        
+        return output
+    
+    def _frames_to_mel(self, frames: np.ndarray) -> np.ndarray:
+        """Mel power of already windowed (..., n_fft) frames."""
+        spectrum = scipy.fft.rfft(frames, axis=-1)
+        return (spectrum.real ** 2 + spectrum.imag ** 2) @ self.tables['mel_basis'].T
+    
+    def iter_window_model_inputs(
+        self,
+        audio: np.ndarray,
+        window_length: int,
+        window_hop: int,
+        batch_size: int = 64,
+        normalize: bool = True,
+        include_end: bool = False
+    ) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Model inputs for every sliding window of a long recording at
+        ``sample_rate``, as (offsets, (n, time, features, 1)) batches.
+        
+        Offsets follow window_offsets; rows equal prepare_model_input_batch
+        on each window (peak-normalized first with ``normalize``). When
+        ``window_hop`` is a multiple of ``hop_length`` the STFT is computed
+        once over the whole signal and overlapping windows share the mel
+        power of their interior frames; only the frames that reach past a
+        window's edges (zero-padded in per-window featurization) are
+        transformed again. Otherwise each window is featurized separately.
+        With ``include_end`` a window aligned to the end of the recording
+        follows in its own batch when the hop grid misses the tail.
+        """
+        audio = np.asarray(audio, dtype=AUDIO_DTYPE)
+        if len(audio) < window_length:
+            audio = np.pad(audio, (0, window_length - len(audio)), mode='constant')
+        yield from self._iter_grid_window_inputs(
+            audio, window_length, window_hop, batch_size, normalize
+        )
+        
+        end_offset = window_offsets(len(audio), window_length, window_hop, include_end)[-1]
+        if end_offset % window_hop != 0:
+            clip = audio[end_offset:]
+            peak = np.abs(clip).max()
+            if normalize and peak > 0:
+                clip = clip / peak
+            yield (
+                np.array([end_offset], dtype=np.int64),
+                self.prepare_model_input_batch(clip[np.newaxis])
+            )
+    
+    def _iter_grid_window_inputs(
+        self,
+        audio: np.ndarray,
+        window_length: int,
+        window_hop: int,
+        batch_size: int,
+        normalize: bool
+    ) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """iter_window_model_inputs for the windows on the hop grid."""
+        offsets = window_offsets(len(audio), window_length, window_hop)
+        
+        # Peak of every window, from maxima over blocks that tile both window and hop
+        scale = np.ones(len(offsets), dtype=AUDIO_DTYPE)
+        if normalize:
+            block = math.gcd(window_length, window_hop)
+            n_blocks = (offsets[-1] + window_length) // block
+            block_peaks = np.abs(audio[:n_blocks * block]).reshape(n_blocks, block).max(axis=1)
+            peaks = np.lib.stride_tricks.sliding_window_view(
+                block_peaks, window_length // block
+            )[::window_hop // block].max(axis=1)
+            scale[peaks > 0] = peaks[peaks > 0]
+        
+        if window_hop % self.hop_length != 0:
+            windows = sliding_windows(audio, window_length, window_hop)
+            for start in range(0, len(offsets), batch_size):
+                batch = slice(start, start + batch_size)
+                clips = windows[batch] / scale[batch, np.newaxis]
+                yield offsets[batch], self.prepare_model_input_batch(clips)
+            return
+        
+        hop, pad = self.hop_length, self.n_fft // 2
+        n_frames = 1 + window_length // hop
+        window = self.tables['window']
+        # Centered frames of the whole recording; window frame i of the window
+        # at offset o is recording frame o // hop + i
+        frames = np.lib.stride_tricks.sliding_window_view(
+            np.pad(audio, (pad, pad), mode='constant'), self.n_fft
+        )[::hop]
+        positions = (np.arange(n_frames) * hop - pad)[:, np.newaxis] + np.arange(self.n_fft)
+        inside = (positions >= 0) & (positions < window_length)
+        edge = np.flatnonzero(~inside.all(axis=1))
+        edge_taper = inside[edge] * window
+        
+        # Mel power of recording frames, carried over between batches
+        mel = np.empty((0, self.n_mels), dtype=AUDIO_DTYPE)
+        mel_start = 0
+        for start in range(0, len(offsets), batch_size):
+            batch_offsets = offsets[start:start + batch_size]
+            first_frame = batch_offsets // hop
+            needed_from, needed_to = first_frame[0], first_frame[-1] + n_frames
+            
+            computed_to = mel_start + len(mel)
+            new_from = max(needed_from, computed_to)
+            new_mel = self._frames_to_mel(frames[new_from:needed_to] * window)
+            mel = np.concatenate([
+                mel[needed_from - mel_start:],
+                new_mel.astype(AUDIO_DTYPE, copy=False)
+            ])
+            mel_start = needed_from
+            
+            window_mel = mel[(first_frame - mel_start)[:, np.newaxis] + np.arange(n_frames)]
+            edge_frames = frames[first_frame[:, np.newaxis] + edge] * edge_taper
+            window_mel[:, edge] = self._frames_to_mel(edge_frames)
+            window_mel /= scale[start:start + batch_size, np.newaxis, np.newaxis] ** 2
+            yield batch_offsets, self._model_input_from_mel(window_mel)
+
+
+class StreamingFeatureExtractor:
+    """
+    Incremental model input over a rolling audio window.
+    
+    Keeps the last ``window_samples`` of audio together with the mel power
+    of every STFT frame that lies entirely inside the window. When the
+    window advances by a multiple of ``hop_length`` only the frames for the
+    new audio (plus the zero-padded frames at both window edges) are
+    transformed; log scaling, DCT and deltas are then redone over the
+    window, which keeps the result equivalent to ``prepare_model_input``.
+    """
+    
+    def __init__(
+        self,
+        extractor: RespiratoryFeatureExtractor = None,
+        window_samples: int = 48000,
+        normalize: bool = True
+    ):
+        self.extractor = extractor or RespiratoryFeatureExtractor()
+        self.window_samples = window_samples
+        self.normalize = normalize
+        
+        hop = self.extractor.hop_length
+        pad = self.extractor.n_fft // 2
+        self.n_frames = 1 + window_samples // hop
+        
+        # Frames whose n_fft span needs no centre padding can be reused
+        starts = np.arange(self.n_frames) * hop - pad
+        self._interior = (starts >= 0) & (starts + self.extractor.n_fft <= window_samples)
+        
+        self.reset()
+    
+    def reset(self):
+        """Clear buffered audio and cached frames."""
+        self._audio = np.zeros(self.window_samples, dtype=AUDIO_DTYPE)
+        self._mel = np.zeros((self.n_frames, self.extractor.n_mels), dtype=AUDIO_DTYPE)
+        self._valid = np.zeros(self.n_frames, dtype=bool)
+        self._cache_start = 0
+        self.total_samples = 0
+    
+    @property
+    def ready(self) -> bool:
+        """Whether a full window of audio has been received."""
+        return self.total_samples >= self.window_samples
+    
+    def push(self, samples: np.ndarray):
+        """Append new audio samples to the rolling window."""
+        samples = np.asarray(samples, dtype=AUDIO_DTYPE).ravel()
+        n = len(samples)
+        if n >= self.window_samples:
+            self._audio[:] = samples[-self.window_samples:]
+        elif n > 0:
+            self._audio[:-n] = self._audio[n:]
+            self._audio[-n:] = samples
+        self.total_samples += n
+    
+    def _align_cache(self):
+        """Shift cached frames to the current window position."""
+        window_start = self.total_samples - self.window_samples
+        offset = window_start - self._cache_start
+        hop = self.extractor.hop_length
+        
+        if offset % hop != 0 or offset // hop >= self.n_frames:
+            self._valid[:] = False
+        elif offset > 0:
+            shift = offset // hop
+            self._mel[:-shift] = self._mel[shift:]
+            self._valid[:-shift] = self._valid[shift:]
+            self._valid[-shift:] = False
+        
+        self._cache_start = window_start
+    
+    def get_model_input(self) -> np.ndarray:
+        """Current (time, features, 1) model input for the buffered window."""
+        extractor = self.extractor
+        self._align_cache()
+        
+        # Recompute new interior frames and the zero-padded edge frames
+        needed = np.flatnonzero(~(self._valid & self._interior))
+        if len(needed) > 0:
+            pad = extractor.n_fft // 2
+            padded = np.pad(self._audio, (pad, pad), mode='constant')
+            frames = np.lib.stride_tricks.sliding_window_view(
+                padded, extractor.n_fft
+            )[::extractor.hop_length][needed]
+            spectrum = scipy.fft.rfft(frames * extractor.tables['window'], axis=-1)
+            power = spectrum.real ** 2 + spectrum.imag ** 2
+            self._mel[needed] = power @ extractor.tables['mel_basis'].T
+            self._valid[needed] = self._interior[needed]
+        
+        mel_power = self._mel
+        if self.normalize:
+            peak = np.max(np.abs(self._audio))
+            if peak > 0:
+                mel_power = mel_power / peak ** 2
+        
+        return extractor._model_input_from_mel(mel_power[np.newaxis])[0]
 
 
 def preprocess_audio(
@@ -174,15 +691,16 @@ def preprocess_audio(
     duration: float = 3.0,
     normalize: bool = True
 ) -> np.ndarray:
-    """Preprocess audio: resample, trim/pad, normalize."""
-    
-    # Resample if needed
-    if sample_rate != target_sr:
-        audio = librosa.resample(audio, orig_sr=sample_rate, target_sr=target_sr)
+    """Preprocess audio: resample, trim/pad, normalize (returns float32)."""
+    audio = np.asarray(audio, dtype=AUDIO_DTYPE)
     
     # Target length
     target_length = int(target_sr * duration)
     
+    # Resample if needed (cached polyphase filter, only the kept samples)
+    if sample_rate != target_sr:
+        audio = resample(audio, sample_rate, target_sr, num_samples=target_length)
+    
     # Trim or pad
     if len(audio) > target_length:
         audio = audio[:target_length]
@@ -2,35 +2,196 @@
 Real-time inference engine for respiratory disease detection.
 """
 
+import hashlib
+import os
+import queue
+import threading
 import numpy as np
 import tensorflow as tf
-from typing import Dict, Tuple
-from .feature_extractor import RespiratoryFeatureExtractor, preprocess_audio
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from .feature_extractor import AUDIO_DTYPE, RespiratoryFeatureExtractor, preprocess_audio
 from .anomaly_detector import RespiratoryAnomalyDetector
+from .config import window_params
+from .feature_cache import FeatureCache
+from .prediction_cache import PredictionCache
+from .resampling import resample
+
+
+class PooledInterpreter:
+    """
+    TFLite interpreters for one model, allocated once per batch-size bucket.
+    
+    Batches are zero-padded up to the next power of two (at most
+    ``max_batch_size``; larger batches run in chunks) and each bucket gets
+    its own interpreter, so varying batch sizes never reallocate tensors.
+    Models whose batch dimension cannot be resized run in padded chunks of
+    their fixed batch size.
+    """
+    
+    def __init__(
+        self,
+        model_content: bytes,
+        num_threads: Optional[int] = None,
+        max_batch_size: int = 64
+    ):
+        self.model_content = model_content
+        self.num_threads = num_threads
+        self.max_batch_size = max_batch_size
+        self.interpreter = tf.lite.Interpreter(model_content=model_content, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self.input_details = self.interpreter.get_input_details()
+        self.output_details = self.interpreter.get_output_details()
+        self.batch_size = int(self.input_details[0]['shape'][0])
+        self.resizable = True
+        self.buckets: Dict[int, tf.lite.Interpreter] = {self.batch_size: self.interpreter}
+    
+    def _interpreter_for(self, n: int) -> Tuple[tf.lite.Interpreter, int]:
+        """Interpreter and batch size to run the next ``n`` rows with."""
+        if not self.resizable:
+            return self.interpreter, self.batch_size
+        bucket = min(1 << (n - 1).bit_length(), self.max_batch_size)
+        interpreter = self.buckets.get(bucket)
+        if interpreter is None:
+            interpreter = tf.lite.Interpreter(
+                model_content=self.model_content, num_threads=self.num_threads
+            )
+            shape = (bucket,) + tuple(self.input_details[0]['shape'][1:])
+            try:
+                interpreter.resize_tensor_input(self.input_details[0]['index'], shape)
+                interpreter.allocate_tensors()
+            except (RuntimeError, ValueError):
+                # Fixed-batch model
+                self.resizable = False
+                return self.interpreter, self.batch_size
+            self.buckets[bucket] = interpreter
+        return interpreter, bucket
+    
+    def run(self, features: np.ndarray) -> np.ndarray:
+        """Model outputs for a float32 (N, ...) batch (one invoke per bucket-sized chunk)."""
+        outputs = []
+        start = 0
+        while start < len(features):
+            interpreter, batch_size = self._interpreter_for(len(features) - start)
+            chunk = features[start:start + batch_size]
+            n = len(chunk)
+            if n < batch_size:
+                padding = np.zeros((batch_size - n,) + chunk.shape[1:], dtype=chunk.dtype)
+                chunk = np.concatenate([chunk, padding])
+            interpreter.set_tensor(self.input_details[0]['index'], chunk)
+            interpreter.invoke()
+            outputs.append(interpreter.get_tensor(self.output_details[0]['index'])[:n])
+            start += n
+        return np.concatenate(outputs)
+
+
+class InterpreterPool:
+    """
+    TFLite interpreters over one shared model buffer, for concurrent callers.
+    
+    An interpreter must not be invoked from two threads at once, so callers
+    check one out for the duration of a call (blocking while all ``size``
+    are busy) and it is checked back in afterwards. Each interpreter runs
+    its ops on ``num_threads`` threads; ``size * num_threads`` should not
+    exceed the available cores.
+    """
+    
+    def __init__(self, model_path: str, size: int = 1, num_threads: Optional[int] = None):
+        if size < 1:
+            raise ValueError(f"Pool size must be at least 1, got {size}")
+        with open(model_path, 'rb') as f:
+            self.model_content = f.read()
+        self.size = size
+        self.num_threads = num_threads
+        # LIFO so a lightly loaded server keeps reusing the same warm interpreter
+        self._idle = queue.LifoQueue()
+        for _ in range(size):
+            self._idle.put(PooledInterpreter(self.model_content, num_threads))
+    
+    @property
+    def available(self) -> int:
+        """Interpreters not currently checked out."""
+        return self._idle.qsize()
+    
+    @contextmanager
+    def checkout(self, timeout: Optional[float] = None) -> Iterator[PooledInterpreter]:
+        """Borrow an interpreter (raises queue.Empty after ``timeout`` seconds)."""
+        interpreter = self._idle.get(timeout=timeout)
+        try:
+            yield interpreter
+        finally:
+            self._idle.put(interpreter)
 
 
 class RespiratoryInferenceEngine:
-    """Real-time inference for respiratory disease detection."""
+    """
+    Real-time inference for respiratory disease detection.
+    
+    TFLite models run on an InterpreterPool of ``pool_size`` interpreters
+    with ``num_threads`` intra-op threads each, so one engine can serve
+    concurrent requests from several threads.
+    
+    With a ``prediction_cache``, ``predict`` returns the stored result for a
+    recording already seen (same decoded PCM, model and extractor settings).
+    
+    ``predict`` scores a single clip (longer audio is truncated); whole
+    recordings are scored window by window with ``predict_windows`` /
+    ``predict_long`` (``window_seconds`` long, every ``hop_seconds``).
+    
+    With a ``screening_model_path`` (e.g. a baseline CNN) the engine runs a
+    cascade: the screening model scores every clip and only clips whose
+    confidence is below ``escalation_threshold`` (or that the anomaly
+    detector flags, with ``escalate_anomalies``) are re-scored by the main
+    model. Results record which model answered; ``cascade_stats`` reports
+    the escalation rate.
+    """
     
     def __init__(
         self,
         model_path: str,
         anomaly_detector_path: str = None,
-        use_tflite: bool = False
+        use_tflite: bool = False,
+        backend: str = None,
+        pool_size: int = 1,
+        num_threads: Optional[int] = None,
+        prediction_cache: Optional[PredictionCache] = None,
+        window_seconds: float = 3.0,
+        hop_seconds: float = 0.5,
+        screening_model_path: Optional[str] = None,
+        escalation_threshold: float = 0.9,
+        escalate_anomalies: bool = True
     ):
         self.use_tflite = use_tflite
-        self.feature_extractor = RespiratoryFeatureExtractor()
+        self.prediction_cache = prediction_cache
+        self.window_seconds = window_seconds
+        self.hop_seconds = hop_seconds
+        self.feature_extractor = RespiratoryFeatureExtractor(backend=backend)
+        self.backend = self.feature_extractor.backend
         
         # Load classification model
         if use_tflite:
-            self.interpreter = tf.lite.Interpreter(model_path=model_path)
-            self.interpreter.allocate_tensors()
-            self.input_details = self.interpreter.get_input_details()
-            self.output_details = self.interpreter.get_output_details()
+            self.interpreter_pool = InterpreterPool(model_path, pool_size, num_threads)
+            with self.interpreter_pool.checkout() as interpreter:
+                self.input_details = interpreter.input_details
+                self.output_details = interpreter.output_details
             self.model = None
         else:
             self.model = tf.keras.models.load_model(model_path)
-            self.interpreter = None
+            self.interpreter_pool = None
+        self.model_version = self._model_version(model_path)
+        
+        # Optional cheap first stage of a cascade (same format as the main model)
+        self.screening_model = None
+        if screening_model_path:
+            if use_tflite:
+                self.screening_model = InterpreterPool(screening_model_path, pool_size, num_threads)
+            else:
+                self.screening_model = tf.keras.models.load_model(screening_model_path)
+        self.escalation_threshold = escalation_threshold
+        self.escalate_anomalies = escalate_anomalies
+        self.screened = 0
+        self.escalated = 0
+        self._cascade_lock = threading.Lock()
         
         # Load anomaly detector
         self.anomaly_detector = None
@@ -44,6 +205,62 @@ class RespiratoryInferenceEngine:
             'Abnormal',
             'Cough'
         ]
+        
+        # Everything besides the audio that determines a prediction
+        self._prediction_params = {
+            'model': self.model_version,
+            'cascade': {
+                'screening_model': self._model_version(screening_model_path),
+                'escalation_threshold': escalation_threshold,
+                'escalate_anomalies': escalate_anomalies
+            } if screening_model_path else None,
+            'anomaly_detector': (
+                self._model_version(anomaly_detector_path) if anomaly_detector_path else None
+            ),
+            'extractor': self.feature_extractor.get_params()
+        }
+    
+    @staticmethod
+    def _model_version(path: str) -> str:
+        """Content hash of a model file (path and mtime for model directories)."""
+        if os.path.isdir(path):
+            return f'{os.path.abspath(path)}@{os.stat(path).st_mtime_ns}'
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()[:16]
+    
+    @classmethod
+    def from_config(cls, model_path: str, config: Dict, **kwargs) -> 'RespiratoryInferenceEngine':
+        """
+        Engine with the interpreter pool sized by config.yaml's ``inference``
+        section (``interpreter_pool_size``, ``interpreter_threads``), its
+        ``prediction_cache`` and ``cascade`` settings, and long-recording
+        windows from ``audio.window_size`` / ``window_increase``.
+        """
+        windows = window_params(config)
+        kwargs.setdefault('window_seconds', windows['duration'])
+        kwargs.setdefault('hop_seconds', windows['window_increase'])
+        inference = config.get('inference', {})
+        cascade = inference.get('cascade', {})
+        if cascade.get('enabled', False):
+            kwargs.setdefault('screening_model_path', cascade['screening_model'])
+            kwargs.setdefault('escalation_threshold', cascade.get('escalation_threshold', 0.9))
+            kwargs.setdefault('escalate_anomalies', cascade.get('escalate_anomalies', True))
+        kwargs.setdefault('pool_size', inference.get('interpreter_pool_size', 1))
+        kwargs.setdefault('num_threads', inference.get('interpreter_threads'))
+        cache = inference.get('prediction_cache', {})
+        if cache.get('enabled', False):
+            kwargs.setdefault('prediction_cache', PredictionCache(
+                max_entries=cache.get('max_entries', 1024),
+                ttl_seconds=cache.get('ttl_seconds', 3600)
+            ))
+        return cls(model_path, **kwargs)
+    
+    def prediction_key(self, audio: np.ndarray, sample_rate: int) -> str:
+        """Prediction cache key: hash of the decoded PCM, its rate, model and extractor settings."""
+        return FeatureCache.make_key(audio, {'sample_rate': sample_rate, **self._prediction_params})
     
     def predict(
         self,
@@ -54,6 +271,9 @@ class RespiratoryInferenceEngine:
         """
         Predict respiratory condition from audio.
         
+        Served from the prediction cache, when configured, unless
+        ``return_features`` is set.
+        
         Returns:
             dict with keys:
                 - prediction: class name
@@ -62,62 +282,195 @@ class RespiratoryInferenceEngine:
                 - is_anomaly: whether pattern is anomalous
                 - anomaly_score: anomaly score
         """
+        if self.prediction_cache is not None and not return_features:
+            return self.prediction_cache.get_or_compute(
+                self.prediction_key(audio, sample_rate), lambda: self._predict(audio, sample_rate)
+            )
+        return self._predict(audio, sample_rate, return_features)
+    
+    def _predict(self, audio: np.ndarray, sample_rate: int, return_features: bool = False) -> Dict:
+        # Add batch dimension
+        features = np.expand_dims(self.prepare_input(audio, sample_rate), axis=0)
         
-        # Preprocess audio
-        audio_processed = preprocess_audio(audio, sample_rate)
+        result = self.predict_features(features)[0]
+        if return_features:
+            result['features'] = features
         
-        # Extract features
+        return result
+    
+    def prepare_input(self, audio: np.ndarray, sample_rate: int = 16000) -> np.ndarray:
+        """Preprocess one clip into a float32 (time, features, 1) model input."""
+        audio_processed = preprocess_audio(audio, sample_rate)
         features = self.feature_extractor.prepare_model_input(audio_processed)
-        features = np.expand_dims(features, axis=0)  # Add batch dimension
-        
-        # Classification
-        if self.use_tflite:
-            # TFLite inference
-            self.interpreter.set_tensor(self.input_details[0]['index'], features.astype(np.float32))
-            self.interpreter.invoke()
-            probabilities = self.interpreter.get_tensor(self.output_details[0]['index'])[0]
-        else:
-            # Keras inference
-            probabilities = self.model.predict(features, verbose=0)[0]
+        return features.astype(AUDIO_DTYPE, copy=False)
+    
+    def predict_batch(
+        self,
+        audio_batch: Sequence[np.ndarray],
+        sample_rate: int = 16000,
+        batch_size: int = 64
+    ) -> List[Dict]:
+        """
+        Predict on a batch of clips (any lengths; each is resampled, trimmed
+        or padded like ``predict``).
         
-        # Get prediction
-        predicted_class = np.argmax(probabilities)
-        confidence = probabilities[predicted_class]
-        prediction = self.label_names[predicted_class]
+        Clips are featurized together and classified with one model call
+        per ``batch_size`` chunk; anomaly scores are computed in one
+        vectorized call per chunk. Returns one result dict per clip, as
+        ``predict``.
+        """
+        results = []
+        for start in range(0, len(audio_batch), batch_size):
+            clips = audio_batch[start:start + batch_size]
+            audio = np.stack([preprocess_audio(clip, sample_rate) for clip in clips])
+            features = self.feature_extractor.prepare_model_input_batch(audio)
+            results.extend(self.predict_features(features))
+        return results
+    
+    def predict_windows(
+        self,
+        audio: np.ndarray,
+        sample_rate: int = 16000,
+        window_seconds: Optional[float] = None,
+        hop_seconds: Optional[float] = None,
+        batch_size: int = 64
+    ) -> List[Dict]:
+        """
+        Timeline of predictions over a whole recording.
+        
+        The recording is resampled once and cut into ``window_seconds``
+        windows every ``hop_seconds`` (engine defaults), plus one window
+        aligned to the end when the hop grid misses the tail; their
+        features come from one STFT of the full signal (see
+        ``RespiratoryFeatureExtractor.iter_window_model_inputs``) and are
+        classified ``batch_size`` windows per model call. Each window gets a
+        ``predict`` result dict plus its ``start_s`` and ``end_s``.
+        """
+        target_sr = self.feature_extractor.sample_rate
+        audio = resample(np.asarray(audio, dtype=AUDIO_DTYPE), sample_rate, target_sr)
+        window_length = int(round((window_seconds or self.window_seconds) * target_sr))
+        window_hop = int(round((hop_seconds or self.hop_seconds) * target_sr))
+        
+        timeline = []
+        for offsets, features in self.feature_extractor.iter_window_model_inputs(
+            audio, window_length, window_hop, batch_size, include_end=True
+        ):
+            for offset, result in zip(offsets, self.predict_features(features)):
+                result['start_s'] = float(offset / target_sr)
+                result['end_s'] = float((offset + window_length) / target_sr)
+                timeline.append(result)
+        return timeline
+    
+    def predict_long(self, audio: np.ndarray, sample_rate: int = 16000, **kwargs) -> Dict:
+        """
+        Whole-recording prediction: class probabilities averaged over the
+        ``predict_windows`` timeline (returned under ``windows``), the share
+        of windows predicted as each class and, with an anomaly detector,
+        the share of anomalous windows.
+        """
+        windows = self.predict_windows(audio, sample_rate, **kwargs)
+        probabilities = np.mean([
+            [window['probabilities'][name] for name in self.label_names]
+            for window in windows
+        ], axis=0)
+        predicted_class = int(np.argmax(probabilities))
+        predictions = [window['prediction'] for window in windows]
         
         result = {
-            'prediction': prediction,
-            'confidence': float(confidence),
+            'prediction': self.label_names[predicted_class],
+            'confidence': float(probabilities[predicted_class]),
             'probabilities': {
-                name: float(prob)
-                for name, prob in zip(self.label_names, probabilities)
-            }
+                name: float(prob) for name, prob in zip(self.label_names, probabilities)
+            },
+            'window_fractions': {
+                name: predictions.count(name) / len(windows) for name in self.label_names
+            },
+            'duration_s': len(audio) / sample_rate,
+            'windows': windows
         }
+        if self.anomaly_detector:
+            anomalous = [window['is_anomaly'] for window in windows]
+            result['anomalous_fraction'] = float(np.mean(anomalous))
+        return result
+    
+    def classify(self, features: np.ndarray) -> np.ndarray:
+        """Main-model class probabilities for a (N, time, features, 1) batch in one model call."""
+        if not self.use_tflite:
+            return self._run(self.model, features)
+        return self._run(self.interpreter_pool, features)
+    
+    @staticmethod
+    def _run(model, features: np.ndarray) -> np.ndarray:
+        """Probabilities from a Keras model or an InterpreterPool."""
+        features = np.ascontiguousarray(features, dtype=AUDIO_DTYPE)
+        if not isinstance(model, InterpreterPool):
+            return np.array(model.predict_on_batch(features))
         
-        # Anomaly detection
+        with model.checkout() as interpreter:
+            return interpreter.run(features)
+    
+    def predict_features(self, features: np.ndarray) -> List[Dict]:
+        """
+        Result dicts for a batch of ``prepare_input`` outputs, (N, time, features, 1).
+        
+        Runs the anomaly detector and the cascade when configured; the
+        prediction cache is not consulted (it is keyed on raw audio).
+        """
+        anomaly = None
         if self.anomaly_detector:
-            anomaly_pred = self.anomaly_detector.predict(features)
-            anomaly_score = self.anomaly_detector.score_samples(features)[0]
-            
-            result['is_anomaly'] = bool(anomaly_pred[0] == -1)
-            result['anomaly_score'] = float(anomaly_score)
+            anomaly = self.anomaly_detector.predict_with_scores(features)
+        if self.screening_model is None:
+            return self._format_results(self.classify(features), anomaly)
         
-        if return_features:
-            result['features'] = features
+        probabilities = self._run(self.screening_model, features)
+        escalate = probabilities.max(axis=1) < self.escalation_threshold
+        if anomaly is not None and self.escalate_anomalies:
+            escalate |= anomaly[0] == -1
+        if escalate.any():
+            probabilities[escalate] = self.classify(features[escalate])
+        with self._cascade_lock:
+            self.screened += len(features)
+            self.escalated += int(escalate.sum())
         
-        return result
+        results = self._format_results(probabilities, anomaly)
+        for result, escalated in zip(results, escalate):
+            result['model'] = 'main' if escalated else 'screening'
+        return results
     
-    def predict_batch(
+    def cascade_stats(self) -> Dict:
+        """Clips scored by the screening model and the share escalated to the main model."""
+        with self._cascade_lock:
+            return {
+                'screened': self.screened,
+                'escalated': self.escalated,
+                'escalation_rate': self.escalated / self.screened if self.screened else 0.0,
+                'escalation_threshold': self.escalation_threshold
+            }
+    
+    def _format_results(
         self,
-        audio_batch: np.ndarray,
-        sample_rate: int = 16000
-    ) -> list:
-        """Predict on batch of audio samples."""
-        results = []
+        probabilities: np.ndarray,
+        anomaly: Optional[Tuple] = None
+    ) -> List[Dict]:
+        """Per-clip result dicts from class probabilities and anomaly (predictions, scores)."""
+        predicted = np.argmax(probabilities, axis=1)
+        results = [
+            {
+                'prediction': self.label_names[predicted_class],
+                'confidence': float(probs[predicted_class]),
+                'probabilities': {
+                    name: float(prob)
+                    for name, prob in zip(self.label_names, probs)
+                }
+            }
+            for predicted_class, probs in zip(predicted, probabilities)
+        ]
         
-        for audio in audio_batch:
-            result = self.predict(audio, sample_rate)
-            results.append(result)
+        # Anomaly detection
+        if anomaly is not None:
+            for result, pred, score in zip(results, *anomaly):
+                result['is_anomaly'] = bool(pred == -1)
+                result['anomaly_score'] = float(score)
         
         return results
     
@@ -0,0 +1,119 @@
+"""
+In-memory cache of prediction results for repeated recordings.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache of prediction result dicts with a time-to-live.
+    
+    Keys are content hashes (see ``RespiratoryInferenceEngine.prediction_key``),
+    so retries and duplicate uploads of the same recording hit the cache
+    however they were named. Concurrent requests for a key that is being
+    computed wait for that computation instead of repeating it. Callers
+    always receive their own copy of the result.
+    """
+    
+    def __init__(self, max_entries: int = 1024, ttl_seconds: Optional[float] = 3600.0):
+        if max_entries < 1:
+            raise ValueError(f"max_entries must be at least 1, got {max_entries}")
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()  # key -> (stored_at, result)
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def _lookup(self, key: str) -> Optional[Dict]:
+        """Fresh entry for ``key`` (refreshing its LRU position) or None; caller holds the lock."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, result = entry
+        if self.ttl_seconds is not None and time.monotonic() - stored_at > self.ttl_seconds:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return result
+    
+    def get(self, key: str) -> Optional[Dict]:
+        """Cached result for ``key`` or None (does not count as a hit or miss)."""
+        with self._lock:
+            result = self._lookup(key)
+        return copy.deepcopy(result) if result is not None else None
+    
+    def put(self, key: str, result: Dict):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), copy.deepcopy(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def get_or_compute(self, key: str, compute: Callable[[], Dict]) -> Dict:
+        """
+        Cached result for ``key``, else ``compute()`` once: identical
+        requests arriving meanwhile wait for it. Exceptions propagate to
+        every waiter and nothing is cached.
+        """
+        with self._lock:
+            result = self._lookup(key)
+            if result is not None:
+                self.hits += 1
+                return copy.deepcopy(result)
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                owner = False
+            else:
+                self.misses += 1
+                future = self._inflight[key] = Future()
+                owner = True
+        
+        if not owner:
+            return copy.deepcopy(future.result())
+        
+        try:
+            result = compute()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            self.put(key, result)
+            future.set_result(result)
+            return copy.deepcopy(result)
+        finally:
+            with self._lock:
+                del self._inflight[key]
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict:
+        """Entry count and hit/miss/coalesced/eviction counters."""
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits + self.coalesced) / lookups if lookups else 0.0
+            }
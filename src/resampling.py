@@ -0,0 +1,149 @@
+"""
+Polyphase resampling with cached filter designs.
+
+Uploads arrive mostly at 44.1 kHz or 48 kHz (plus 8 kHz telephony audio)
+while the model runs at 16 kHz. The anti-aliasing filter for each rational
+rate pair is designed once per process and reused; the filter matches
+``scipy.signal.resample_poly`` defaults (Kaiser window, beta 5.0), so results
+are identical to it. The FFT method is never used.
+"""
+
+import numpy as np
+import scipy.signal as signal
+from math import gcd
+from functools import lru_cache
+from typing import Optional, Tuple
+
+
+# Rate pairs designed eagerly by warm_resample_filters()
+COMMON_RATE_PAIRS = ((48000, 16000), (44100, 16000), (8000, 16000))
+
+
+@lru_cache(maxsize=32)
+def get_resample_filter(orig_sr: int, target_sr: int) -> Tuple[int, int, np.ndarray]:
+    """
+    Return (up, down, taps) for resampling ``orig_sr`` -> ``target_sr``.
+    
+    ``taps`` is the read-only low-pass FIR (length ``20 * max(up, down) + 1``)
+    that resample_poly would design for the reduced ratio up/down.
+    """
+    factor = gcd(int(orig_sr), int(target_sr))
+    up, down = int(target_sr) // factor, int(orig_sr) // factor
+    max_rate = max(up, down)
+    half_len = 10 * max_rate
+    taps = signal.firwin(2 * half_len + 1, 1.0 / max_rate, window=('kaiser', 5.0))
+    taps.setflags(write=False)
+    return up, down, taps
+
+
+@lru_cache(maxsize=32)
+def _polyphase_table(orig_sr: int, target_sr: int) -> np.ndarray:
+    """Gain-scaled taps split into ``up`` phases: table[p, k] = up * taps[p + k * up]."""
+    up, _, taps = get_resample_filter(orig_sr, target_sr)
+    n_taps = -(-len(taps) // up)
+    padded = np.zeros(n_taps * up)
+    padded[:len(taps)] = taps * up
+    table = padded.reshape(n_taps, up).T.astype(np.float32)
+    table.setflags(write=False)
+    return table
+
+
+def warm_resample_filters(pairs=COMMON_RATE_PAIRS):
+    """Design the filters for common input rates ahead of the first request."""
+    for orig_sr, target_sr in pairs:
+        get_resample_filter(orig_sr, target_sr)
+        _polyphase_table(orig_sr, target_sr)
+
+
+def resample(
+    audio: np.ndarray,
+    orig_sr: int,
+    target_sr: int,
+    num_samples: Optional[int] = None,
+    axis: int = -1
+) -> np.ndarray:
+    """
+    Polyphase-resample ``audio`` along ``axis`` (dtype is preserved).
+    
+    With ``num_samples`` at most the first ``num_samples`` output samples
+    are returned, and the input is cut to the samples that contribute to
+    them before filtering (the kept outputs are unchanged).
+    """
+    audio = np.asarray(audio)
+    if orig_sr == target_sr:
+        return audio
+    
+    up, down, taps = get_resample_filter(orig_sr, target_sr)
+    if num_samples is not None:
+        half_len = (len(taps) - 1) // 2
+        needed = ((num_samples - 1) * down + half_len) // up + 1
+        if audio.shape[axis] > needed:
+            audio = np.take(audio, np.arange(needed), axis=axis)
+    
+    resampled = signal.resample_poly(audio, up, down, axis=axis, window=taps)
+    if num_samples is not None:
+        kept = min(num_samples, resampled.shape[axis])
+        resampled = np.take(resampled, np.arange(kept), axis=axis)
+    return resampled.astype(audio.dtype, copy=False)
+
+
+class StreamingResampler:
+    """
+    Chunk-by-chunk polyphase resampler for mono float32 audio.
+    
+    Feeding a signal in arbitrary chunks through :meth:`process` followed by
+    :meth:`flush` yields the same samples as :func:`resample` on the whole
+    signal; only the last filter-length of input is kept between calls.
+    """
+    
+    def __init__(self, orig_sr: int, target_sr: int):
+        self.orig_sr = orig_sr
+        self.target_sr = target_sr
+        self.up, self.down, taps = get_resample_filter(orig_sr, target_sr)
+        self.half_len = (len(taps) - 1) // 2
+        self.table = _polyphase_table(orig_sr, target_sr)
+        self.reset()
+    
+    def reset(self):
+        """Forget all buffered input."""
+        n_taps = self.table.shape[1]
+        # Leading zeros stand in for the samples before the signal starts
+        self._buffer = np.zeros(n_taps - 1, dtype=np.float32)
+        self._offset = -(n_taps - 1)  # absolute index of _buffer[0]
+        self._n_in = 0
+        self._n_out = 0
+    
+    def _emit(self, end: int) -> np.ndarray:
+        """Compute output samples [_n_out, end) from the buffer."""
+        n_taps = self.table.shape[1]
+        positions = np.arange(self._n_out, end) * self.down + self.half_len
+        newest = positions // self.up - self._offset
+        frames = self._buffer[newest[:, np.newaxis] - np.arange(n_taps)]
+        out = np.einsum('mk,mk->m', frames, self.table[positions % self.up])
+        self._n_out = end
+        
+        # Drop input that no future output can reach
+        first_needed = (end * self.down + self.half_len) // self.up - (n_taps - 1)
+        drop = max(0, first_needed - self._offset)
+        self._buffer = self._buffer[drop:]
+        self._offset += drop
+        return out.astype(np.float32, copy=False)
+    
+    def process(self, chunk: np.ndarray) -> np.ndarray:
+        """Add input samples and return every output sample now fully determined."""
+        chunk = np.asarray(chunk, dtype=np.float32)
+        self._buffer = np.concatenate([self._buffer, chunk])
+        self._n_in += len(chunk)
+        
+        # Output m needs inputs up to (m * down + half_len) // up
+        end = -(-(self._n_in * self.up - self.half_len) // self.down)
+        return self._emit(max(end, self._n_out))
+    
+    def flush(self) -> np.ndarray:
+        """Return the remaining output (zero-padding the signal end) and reset."""
+        total = -(-(self._n_in * self.up) // self.down)
+        tail = self.half_len // self.up + self.table.shape[1] + 1
+        self._buffer = np.concatenate([self._buffer, np.zeros(tail, dtype=np.float32)])
+        out = self._emit(max(total, self._n_out))
+        self.reset()
+        return out
@@ -0,0 +1,428 @@
+"""
+Sharded, memory-mapped on-disk format for processed feature sets.
+
+A split directory (e.g. ``data/processed/train/``) holds fixed-size shards
+``features-00000.npy`` / ``labels-00000.npy`` and a ``manifest.json`` with
+shapes, dtype, label counts and the extractor parameters that produced the
+features. Readers memory-map the shards, so opening a split is instant and
+only the rows a batch touches are paged in. With a feature codec each
+shard's features are stored as compact parts (``features-00000.mel.npy``
+etc.) and decoded per batch.
+"""
+
+import json
+import os
+import numpy as np
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from .dataset import batches_to_tf_dataset
+from .feature_codec import CompactFeatureCodec
+from .feature_extractor import AUDIO_DTYPE
+
+
+FORMAT_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+
+
+class ShardWriter:
+    """
+    Write a split as shards plus a manifest.
+    
+    Shards are added whole with :meth:`add_shard` (optionally after being
+    written in place at :meth:`next_shard_path`, e.g. by
+    ``RespiratoryDataLoader.load_features_from_files(output_path=...)``) or
+    cut from in-memory arrays with :meth:`write_arrays`. The manifest is
+    written last by :meth:`close`, so an interrupted run never looks complete.
+    
+    With ``append=True`` an existing split is extended: its shards are kept,
+    new shards are numbered after them, and rows can be dropped by source
+    path with :meth:`remove_sources`.
+    
+    With a ``codec`` features are encoded before they are stored (shards
+    written in place at next_shard_path are converted and the float file
+    removed).
+    """
+    
+    def __init__(
+        self,
+        output_dir: str,
+        shard_size: int = 4096,
+        metadata: Optional[Dict] = None,
+        append: bool = False,
+        codec: Optional[CompactFeatureCodec] = None
+    ):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.shard_size = shard_size
+        self.metadata = metadata or {}
+        self.codec = codec
+        self.shards: List[Dict] = []
+        self.element_shape = None
+        self.dtype = None
+        
+        manifest_path = self.output_dir / MANIFEST_NAME
+        if append and manifest_path.exists():
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            stored = manifest.get('codec')
+            requested = codec.get_params() if codec else None
+            if requested != stored:
+                raise ValueError(
+                    f"Cannot append with codec {requested} to a split stored with {stored}"
+                )
+            self.shards = manifest['shards']
+            self.element_shape = manifest['element_shape']
+            self.dtype = manifest['dtype'] if self.shards else None
+            self.metadata = metadata if metadata is not None else manifest.get('metadata', {})
+        else:
+            # Start from a clean directory so stale shards never get mixed in
+            for path in [manifest_path, *self.output_dir.glob('*-[0-9]*.npy')]:
+                path.unlink(missing_ok=True)
+        
+        self._next_index = 1 + max(
+            (int(shard['labels'].split('-')[1].split('.')[0]) for shard in self.shards),
+            default=-1
+        )
+    
+    @property
+    def num_examples(self) -> int:
+        return sum(shard['num_examples'] for shard in self.shards)
+    
+    def _shard_names(self, index: int) -> Tuple[str, str]:
+        return f'features-{index:05d}.npy', f'labels-{index:05d}.npy'
+    
+    def _shard_files(self, shard: Dict) -> List[Path]:
+        features = shard['features']
+        names = list(features.values()) if isinstance(features, dict) else [features]
+        return [self.output_dir / name for name in names + [shard['labels']]]
+    
+    def _encode_shard(
+        self,
+        features: np.ndarray,
+        index: int,
+        chunk_size: int = 256
+    ) -> Dict[str, str]:
+        """Write the codec parts of a shard chunk by chunk; returns part -> file name."""
+        names = {part: f'features-{index:05d}.{part}.npy' for part in self.codec.parts}
+        specs = self.codec.part_specs(len(features), features.shape[1:])
+        outputs = {
+            part: np.lib.format.open_memmap(
+                self.output_dir / names[part], mode='w+', dtype=dtype, shape=shape
+            )
+            for part, (shape, dtype) in specs.items()
+        }
+        for start in range(0, len(features), chunk_size):
+            encoded = self.codec.encode(features[start:start + chunk_size])
+            for part, array in encoded.items():
+                outputs[part][start:start + chunk_size] = array
+        for output in outputs.values():
+            output.flush()
+        return names
+    
+    def next_shard_path(self) -> str:
+        """Path the next shard's features should be written to."""
+        return str(self.output_dir / self._shard_names(self._next_index)[0])
+    
+    def add_shard(
+        self,
+        features: np.ndarray,
+        labels: Sequence[int],
+        sources: Optional[Sequence[str]] = None,
+        offsets: Optional[Sequence[int]] = None
+    ):
+        """
+        Register the next shard, saving ``features`` unless already written there.
+        
+        ``sources`` optionally names the source file of every row and
+        ``offsets`` the start sample of rows cut from longer recordings.
+        """
+        features_name, labels_name = self._shard_names(self._next_index)
+        features_path = self.output_dir / features_name
+        labels = np.asarray(labels, dtype=np.int64)
+        if len(features) != len(labels):
+            raise ValueError(f"Shard has {len(features)} feature rows but {len(labels)} labels")
+        if sources is not None and len(sources) != len(labels):
+            raise ValueError(f"Shard has {len(labels)} rows but {len(sources)} sources")
+        if offsets is not None and len(offsets) != len(labels):
+            raise ValueError(f"Shard has {len(labels)} rows but {len(offsets)} offsets")
+        
+        if self.element_shape is None or not self.shards:
+            self.element_shape = list(features.shape[1:])
+            self.dtype = str(features.dtype)
+        elif list(features.shape[1:]) != self.element_shape or str(features.dtype) != self.dtype:
+            raise ValueError(
+                f"Shard {features.shape[1:]}/{features.dtype} does not match "
+                f"{tuple(self.element_shape)}/{self.dtype}"
+            )
+        
+        already_written = (
+            isinstance(features, np.memmap)
+            and features.filename is not None
+            and Path(features.filename).resolve() == features_path.resolve()
+        )
+        if self.codec is not None:
+            features_name = self._encode_shard(features, self._next_index)
+            if already_written:
+                del features
+                features_path.unlink()
+        elif not already_written:
+            np.save(features_path, np.ascontiguousarray(features))
+        np.save(self.output_dir / labels_name, labels)
+        
+        shard = {
+            'features': features_name,
+            'labels': labels_name,
+            'num_examples': len(labels)
+        }
+        if sources is not None:
+            shard['sources'] = [str(source) for source in sources]
+        if offsets is not None:
+            shard['offsets'] = [int(offset) for offset in offsets]
+        self.shards.append(shard)
+        self._next_index += 1
+    
+    def remove_sources(self, sources: Iterable[str]) -> int:
+        """
+        Drop every row whose source is in ``sources`` (shards written with
+        ``sources``); affected shards are rewritten, emptied ones deleted.
+        
+        Returns:
+            number of rows removed
+        """
+        sources = set(sources)
+        removed = 0
+        kept_shards = []
+        for shard in self.shards:
+            keep = np.array(
+                [source not in sources for source in shard.get('sources', [])], dtype=bool
+            )
+            if keep.all():
+                kept_shards.append(shard)
+                continue
+            
+            removed += int((~keep).sum())
+            if keep.any():
+                for path in self._shard_files(shard):
+                    tmp_path = path.with_name(f'{path.stem}.tmp.npy')
+                    np.save(tmp_path, np.load(path, mmap_mode='r')[keep])
+                    os.replace(tmp_path, path)  # open readers keep the old mapping
+                shard['sources'] = [s for s, k in zip(shard['sources'], keep) if k]
+                if 'offsets' in shard:
+                    shard['offsets'] = [o for o, k in zip(shard['offsets'], keep) if k]
+                shard['num_examples'] = int(keep.sum())
+                kept_shards.append(shard)
+            else:
+                for path in self._shard_files(shard):
+                    path.unlink()
+        self.shards = kept_shards
+        return removed
+    
+    def write_arrays(self, features: np.ndarray, labels: Sequence[int]):
+        """Cut in-memory (or memory-mapped) arrays into shards of ``shard_size``."""
+        labels = np.asarray(labels)
+        for start in range(0, len(labels), self.shard_size):
+            stop = start + self.shard_size
+            self.add_shard(features[start:stop], labels[start:stop])
+    
+    def close(self) -> Dict:
+        """Write the manifest and return it."""
+        label_counts: Dict[int, int] = {}
+        for shard in self.shards:
+            labels = np.load(self.output_dir / shard['labels'])
+            for label, count in zip(*np.unique(labels, return_counts=True)):
+                label_counts[int(label)] = label_counts.get(int(label), 0) + int(count)
+        
+        manifest = {
+            'format_version': FORMAT_VERSION,
+            'num_examples': self.num_examples,
+            'element_shape': self.element_shape,
+            'dtype': self.dtype or np.dtype(AUDIO_DTYPE).name,
+            'label_counts': {str(label): count for label, count in sorted(label_counts.items())},
+            'codec': self.codec.get_params() if self.codec else None,
+            'shards': self.shards,
+            'metadata': self.metadata
+        }
+        tmp_path = self.output_dir / f'{MANIFEST_NAME}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.output_dir / MANIFEST_NAME)
+        return manifest
+    
+    def __enter__(self) -> 'ShardWriter':
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+
+
+class ShardedDataset:
+    """
+    Read-only, memory-mapped view of a processed split.
+    
+    Indexing (ints, slices or index arrays) returns feature rows as a NumPy
+    array, reading only the rows requested (and decoding them if the split
+    was stored with a codec); labels are small and kept in memory.
+    """
+    
+    def __init__(
+        self,
+        features: List,
+        labels: np.ndarray,
+        manifest: Dict,
+        codec: Optional[CompactFeatureCodec] = None
+    ):
+        self.shards = features
+        self.labels = labels
+        self.manifest = manifest
+        self.codec = codec
+        self._offsets = np.cumsum([0] + [
+            len(shard['mel'] if codec else shard) for shard in features
+        ])
+    
+    @classmethod
+    def open(cls, data_dir: str, split: Optional[str] = None) -> 'ShardedDataset':
+        """
+        Open ``data_dir/split`` (or ``data_dir`` itself when ``split`` is None).
+        
+        Splits saved as a single ``X_<split>.npy`` / ``y_<split>.npy`` pair
+        are opened as a one-shard dataset.
+        """
+        data_dir = Path(data_dir)
+        split_dir = data_dir / split if split else data_dir
+        manifest_path = split_dir / MANIFEST_NAME
+        
+        if manifest_path.exists():
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            if manifest['format_version'] > FORMAT_VERSION:
+                raise ValueError(f"Unsupported processed-data format {manifest['format_version']}")
+            codec = CompactFeatureCodec.from_params(manifest.get('codec'))
+            features = []
+            for shard in manifest['shards']:
+                if codec:
+                    features.append({
+                        part: np.load(split_dir / name, mmap_mode='r')
+                        for part, name in shard['features'].items()
+                    })
+                else:
+                    features.append(np.load(split_dir / shard['features'], mmap_mode='r'))
+            labels = [np.load(split_dir / shard['labels']) for shard in manifest['shards']]
+            labels = np.concatenate(labels) if labels else np.empty(0, dtype=np.int64)
+            return cls(features, labels, manifest, codec)
+        
+        if split and (data_dir / f'X_{split}.npy').exists():
+            features = np.load(data_dir / f'X_{split}.npy', mmap_mode='r')
+            labels = np.load(data_dir / f'y_{split}.npy')
+            manifest = {
+                'format_version': 0,
+                'num_examples': len(labels),
+                'element_shape': list(features.shape[1:]),
+                'dtype': str(features.dtype),
+                'metadata': {}
+            }
+            return cls([features], labels, manifest)
+        
+        raise FileNotFoundError(f"No processed data found at {split_dir}")
+    
+    @property
+    def element_shape(self) -> Tuple[int, ...]:
+        return tuple(self.manifest['element_shape'])
+    
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return (len(self),) + self.element_shape
+    
+    @property
+    def dtype(self) -> np.dtype:
+        return np.dtype(self.manifest['dtype'])
+    
+    @property
+    def metadata(self) -> Dict:
+        return self.manifest.get('metadata', {})
+    
+    def __len__(self) -> int:
+        return int(self._offsets[-1])
+    
+    @property
+    def provenance(self) -> Tuple[List[Optional[str]], np.ndarray]:
+        """Source file and start sample of every row (None / 0 where not recorded)."""
+        sources, offsets = [], []
+        for shard in self.manifest.get('shards', [{'num_examples': len(self)}]):
+            n = shard['num_examples']
+            sources.extend(shard.get('sources', [None] * n))
+            offsets.extend(shard.get('offsets', [0] * n))
+        return sources, np.asarray(offsets, dtype=np.int64)
+    
+    def take(self, indices: Sequence[int]) -> np.ndarray:
+        """Gather feature rows by global index (reads each shard in index order)."""
+        indices = np.asarray(indices, dtype=np.int64)
+        indices = np.where(indices < 0, indices + len(self), indices)
+        if indices.size and (indices.min() < 0 or indices.max() >= len(self)):
+            raise IndexError(f"Index out of range for dataset of length {len(self)}")
+        
+        out = np.empty((len(indices),) + self.element_shape, dtype=self.dtype)
+        shard_ids = np.searchsorted(self._offsets, indices, side='right') - 1
+        for shard_id in np.unique(shard_ids):
+            rows = np.flatnonzero(shard_ids == shard_id)
+            local = indices[rows] - self._offsets[shard_id]
+            order = np.argsort(local, kind='stable')
+            shard = self.shards[shard_id]
+            if self.codec:
+                parts = {part: array[local[order]] for part, array in shard.items()}
+                out[rows[order]] = self.codec.decode(parts)
+            else:
+                out[rows[order]] = shard[local[order]]
+        return out
+    
+    def __getitem__(self, index) -> np.ndarray:
+        if isinstance(index, slice):
+            return self.take(np.arange(len(self))[index])
+        if np.isscalar(index):
+            return self.take([index])[0]
+        return self.take(index)
+    
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        array = self.take(np.arange(len(self)))
+        return array if dtype is None else array.astype(dtype, copy=False)
+    
+    def iter_batches(
+        self,
+        batch_size: int = 64,
+        shuffle: bool = False,
+        seed: Optional[int] = None,
+        augmenter=None
+    ) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Yield (features, labels) batches, paging in only each batch's rows.
+        
+        An optional BatchAugmenter applies its spectral masks to each batch
+        (stored features have no waveform to transform).
+        """
+        rng = np.random.default_rng(seed)
+        order = np.arange(len(self))
+        if shuffle:
+            rng.shuffle(order)
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            features = self.take(batch)
+            if augmenter is not None:
+                features = augmenter.augment_features(features, rng)
+            yield features, self.labels[batch]
+    
+    def to_tf_dataset(
+        self,
+        batch_size: int = 64,
+        num_classes: Optional[int] = None,
+        shuffle: bool = False,
+        seed: Optional[int] = None,
+        augmenter=None
+    ):
+        """Prefetching tf.data.Dataset of batches for model.fit / model.predict."""
+        rng = np.random.default_rng(seed)
+        
+        def make_batches():
+            # A fresh shuffle for every epoch
+            return self.iter_batches(batch_size, shuffle, int(rng.integers(2 ** 31)), augmenter)
+        
+        return batches_to_tf_dataset(make_batches, self.element_shape, num_classes)
@@ -0,0 +1,116 @@
+"""
+Manifest of the source recordings behind a processed dataset.
+
+Tracks every processed file's size, mtime, content hash, label and split,
+plus the configuration that produced the features, so preprocessing can
+pick up only added or changed recordings and keep existing ones in their
+split.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+def file_sha256(file_path: str, chunk_size: int = 1 << 20) -> str:
+    """Hex SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def stable_split(key: str, val_size: float = 0.15, test_size: float = 0.15) -> str:
+    """
+    Deterministic split for a new item, from a hash of ``key``.
+    
+    The assignment depends only on the key, so it never changes as other
+    files are added or removed.
+    """
+    bucket = int(hashlib.sha256(key.encode('utf-8')).hexdigest()[:8], 16) / 16 ** 8
+    if bucket < test_size:
+        return 'test'
+    if bucket < test_size + val_size:
+        return 'val'
+    return 'train'
+
+
+class SourceManifest:
+    """
+    ``{path: {size, mtime_ns, sha256, label, split}}`` plus a config dict,
+    stored as JSON next to the processed splits.
+    
+    Entries whose rows were dropped for reprocessing are kept with
+    ``stale: True`` until they are processed again, so a file that fails to
+    re-decode never loses its split (and cannot resurface in another one).
+    """
+    
+    def __init__(self, path: str = 'data/processed/sources.json'):
+        self.path = Path(path)
+        self.config: Optional[Dict] = None
+        self.files: Dict[str, Dict] = {}
+        if self.path.exists():
+            with open(self.path) as f:
+                manifest = json.load(f)
+            self.config = manifest['config']
+            self.files = manifest['files']
+    
+    def fingerprint(self, file_path: str) -> Dict:
+        """Size, mtime and content hash; the hash is reused when size and mtime are unchanged."""
+        stat = os.stat(file_path)
+        known = self.files.get(file_path)
+        if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+            sha256 = known['sha256']
+        else:
+            sha256 = file_sha256(file_path)
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256}
+    
+    def diff(
+        self,
+        file_paths: Sequence[str],
+        labels: Sequence[int]
+    ) -> Tuple[List[int], List[int], List[str], Dict[str, Dict]]:
+        """
+        Compare the current files against the manifest.
+        
+        Returns:
+            (added, changed, removed, fingerprints) where added and changed
+            index ``file_paths``, removed lists manifest paths no longer
+            present, and fingerprints maps every current path to its
+            fingerprint. A file whose label changed, or a stale entry, counts
+            as changed.
+        """
+        added, changed = [], []
+        fingerprints = {}
+        for i, (file_path, label) in enumerate(zip(file_paths, labels)):
+            fingerprints[file_path] = self.fingerprint(file_path)
+            known = self.files.get(file_path)
+            if known is None:
+                added.append(i)
+            elif (
+                known.get('stale')
+                or known['sha256'] != fingerprints[file_path]['sha256']
+                or known['label'] != int(label)
+            ):
+                changed.append(i)
+        
+        current = set(file_paths)
+        removed = [file_path for file_path in self.files if file_path not in current]
+        return added, changed, removed, fingerprints
+    
+    def mark_stale(self, file_path: str) -> str:
+        """Flag an entry for reprocessing, keeping its split; returns the split."""
+        entry = self.files[file_path]
+        entry['stale'] = True
+        return entry['split']
+    
+    def save(self):
+        """Write the manifest atomically."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f'{self.path.name}.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'config': self.config, 'files': self.files}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
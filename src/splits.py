@@ -0,0 +1,217 @@
+"""
+Index-based train/val/test splits.
+
+Splits are computed on index arrays only (never on the data), can be
+stratified by label and grouped (e.g. all windows of one recording stay
+together), and are persisted so preprocessing, training and evaluation
+reuse the same assignment. Partitions are read through lazy views, so an
+existing array or memmap is never copied as a whole.
+"""
+
+import json
+import os
+import numpy as np
+from pathlib import Path
+from typing import Dict, Iterator, Mapping, Optional, Sequence
+from sklearn.model_selection import train_test_split
+from .source_manifest import stable_split
+
+
+SPLITS = ('train', 'val', 'test')
+
+
+def split_indices(
+    labels: Sequence[int],
+    groups: Optional[Sequence] = None,
+    test_size: float = 0.15,
+    val_size: float = 0.15,
+    stratify: bool = True,
+    random_state: int = 42
+) -> Dict[str, np.ndarray]:
+    """
+    Split ``range(len(labels))`` into sorted train/val/test index arrays.
+    
+    With ``groups`` whole groups are assigned to one split (stratified by
+    each group's first label). Without groups the result matches
+    ``train_test_split`` applied to the data itself.
+    """
+    labels = np.asarray(labels)
+    if groups is None:
+        units, unit_labels = np.arange(len(labels)), labels
+    else:
+        group_ids, first, inverse = np.unique(
+            np.asarray(groups), return_index=True, return_inverse=True
+        )
+        units, unit_labels = np.arange(len(group_ids)), labels[first]
+    
+    # First split: train+val vs test; second split: train vs val
+    temp, test, temp_labels, _ = train_test_split(
+        units, unit_labels,
+        test_size=test_size,
+        random_state=random_state,
+        stratify=unit_labels if stratify else None
+    )
+    train, val = train_test_split(
+        temp,
+        test_size=val_size / (1 - test_size),
+        random_state=random_state,
+        stratify=temp_labels if stratify else None
+    )
+    
+    parts = {'train': train, 'val': val, 'test': test}
+    if groups is not None:
+        parts = {split: np.flatnonzero(np.isin(inverse, part)) for split, part in parts.items()}
+    return {split: np.sort(part) for split, part in parts.items()}
+
+
+class IndexedView:
+    """
+    Lazy row subset of an array, memmap or ShardedDataset.
+    
+    Indexing maps through ``indices`` and reads only the requested rows.
+    """
+    
+    def __init__(self, array, indices: np.ndarray):
+        self.array = array
+        self.indices = np.asarray(indices, dtype=np.int64)
+    
+    @property
+    def shape(self):
+        return (len(self.indices),) + tuple(self.array.shape[1:])
+    
+    @property
+    def dtype(self):
+        return self.array.dtype
+    
+    def __len__(self) -> int:
+        return len(self.indices)
+    
+    def __getitem__(self, index):
+        return self.array[self.indices[index]]
+    
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        array = np.asarray(self.array[self.indices])
+        return array if dtype is None else array.astype(dtype, copy=False)
+    
+    def iter_batches(self, batch_size: int = 64) -> Iterator[np.ndarray]:
+        for start in range(0, len(self), batch_size):
+            yield self[start:start + batch_size]
+
+
+class DatasetSplit:
+    """
+    Train/val/test index sets over N items, optionally keyed (e.g. by file path).
+    
+    Saved splits store keys when available, so they survive files being
+    added or listed in a different order: on load, known keys keep their
+    split and new keys get a deterministic ``stable_split``.
+    """
+    
+    def __init__(
+        self,
+        indices: Mapping[str, np.ndarray],
+        keys: Optional[Sequence[str]] = None,
+        params: Optional[Dict] = None
+    ):
+        self.indices = {
+            split: np.asarray(indices.get(split, []), dtype=np.int64) for split in SPLITS
+        }
+        self.keys = list(keys) if keys is not None else None
+        self.params = params or {}
+    
+    @classmethod
+    def create(
+        cls,
+        labels: Sequence[int],
+        keys: Optional[Sequence[str]] = None,
+        groups: Optional[Sequence] = None,
+        test_size: float = 0.15,
+        val_size: float = 0.15,
+        stratify: bool = True,
+        random_state: int = 42
+    ) -> 'DatasetSplit':
+        """New split of ``labels`` (see split_indices)."""
+        params = {
+            'test_size': test_size,
+            'val_size': val_size,
+            'stratify': stratify,
+            'grouped': groups is not None,
+            'random_state': random_state
+        }
+        indices = split_indices(labels, groups, test_size, val_size, stratify, random_state)
+        return cls(indices, keys, params)
+    
+    @classmethod
+    def from_assignment(
+        cls,
+        assignment: Mapping[str, str],
+        params: Optional[Dict] = None
+    ) -> 'DatasetSplit':
+        """Split from a ``{key: split}`` mapping."""
+        keys = list(assignment)
+        splits = np.array([assignment[key] for key in keys], dtype=str)
+        return cls({split: np.flatnonzero(splits == split) for split in SPLITS}, keys, params)
+    
+    def __getitem__(self, split: str) -> np.ndarray:
+        return self.indices[split]
+    
+    def __len__(self) -> int:
+        return sum(len(indices) for indices in self.indices.values())
+    
+    def assignment(self) -> Dict[str, str]:
+        """``{key: split}`` for a keyed split."""
+        if self.keys is None:
+            raise ValueError("Split has no keys")
+        return {self.keys[i]: split for split in SPLITS for i in self.indices[split]}
+    
+    def view(self, array, split: str) -> IndexedView:
+        """Lazy view of ``split``'s rows of ``array`` (ndarray, memmap or ShardedDataset)."""
+        return IndexedView(array, self.indices[split])
+    
+    def save(self, path: str):
+        """Write the split as JSON atomically (keys if known, else indices)."""
+        if self.keys is not None:
+            splits = {split: [self.keys[i] for i in self.indices[split]] for split in SPLITS}
+        else:
+            splits = {split: self.indices[split].tolist() for split in SPLITS}
+        
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f'{path.name}.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'params': self.params, 'keyed': self.keys is not None, 'splits': splits}, f)
+        os.replace(tmp_path, path)
+    
+    @classmethod
+    def load(cls, path: str, keys: Optional[Sequence[str]] = None) -> 'DatasetSplit':
+        """
+        Read a saved split. With ``keys`` a keyed split is re-indexed to that
+        order: stored keys keep their split, unknown ones get stable_split,
+        and stored keys not in ``keys`` are dropped.
+        """
+        with open(path) as f:
+            stored = json.load(f)
+        if not stored['keyed']:
+            return cls(stored['splits'], params=stored['params'])
+        
+        assignment = {
+            key: split for split, split_keys in stored['splits'].items() for key in split_keys
+        }
+        if keys is not None:
+            assignment = {key: assignment.get(key) or stable_split(key) for key in keys}
+        return cls.from_assignment(assignment, stored['params'])
+    
+    @classmethod
+    def load_or_create(
+        cls,
+        path: str,
+        labels: Sequence[int],
+        keys: Sequence[str],
+        **kwargs
+    ) -> 'DatasetSplit':
+        """Reuse the split saved at ``path`` for ``keys``, or create and save one."""
+        if Path(path).exists():
+            return cls.load(path, keys)
+        split = cls.create(labels, keys, **kwargs)
+        split.save(path)
+        return split
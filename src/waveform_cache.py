@@ -0,0 +1,164 @@
+"""
+Pack-file cache of decoded waveforms.
+
+Decoding (especially MP3) and resampling dominate raw-audio loading. The
+cache keeps every decoded, resampled clip as int16 samples appended to one
+pack file, with an append-only index of offsets, so repeated runs over the
+same corpus read memory-mapped PCM instead of decoding.
+"""
+
+import os
+import json
+import threading
+import numpy as np
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from .feature_extractor import AUDIO_DTYPE
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialized within a process
+    fcntl = None
+
+
+class WaveformCache:
+    """
+    Append-only int16 pack of decoded clips with an offset index.
+    
+    ``waveforms.pack`` holds the samples of every clip back to back;
+    ``waveforms.index`` holds one JSON line per clip with its key, offset,
+    length and scale (clips are stored peak-scaled to the int16 range).
+    Keys combine the file's path, size and mtime with the decode
+    parameters, so an edited file is decoded again; its old samples stay
+    in the pack until ``clear()``. Appends take an exclusive file lock, so
+    worker processes can share one cache directory.
+    """
+    
+    PACK_NAME = 'waveforms.pack'
+    INDEX_NAME = 'waveforms.index'
+    
+    def __init__(self, cache_dir: str = 'data/features/waveforms'):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.pack_path = self.cache_dir / self.PACK_NAME
+        self.index_path = self.cache_dir / self.INDEX_NAME
+        self.pack_path.touch()
+        self.index_path.touch()
+        self.hits = 0
+        self.misses = 0
+        self._index: Dict[str, Tuple[int, int, float]] = {}
+        self._index_pos = 0
+        self._pack: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        self._refresh_index()
+    
+    @staticmethod
+    def make_key(file_path: str, params: Dict) -> str:
+        """Key from the file's identity (path, size, mtime) and decode parameters."""
+        stat = os.stat(file_path)
+        return json.dumps(
+            [os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns, params],
+            sort_keys=True
+        )
+    
+    def _refresh_index(self):
+        """Read index lines appended since the last refresh (possibly by other processes)."""
+        with open(self.index_path, 'rb') as f:
+            f.seek(self._index_pos)
+            data = f.read()
+        # Only consume complete lines; a concurrent writer may be mid-line
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            entry = json.loads(line)
+            self._index[entry['key']] = (entry['offset'], entry['length'], entry['scale'])
+        self._index_pos += end
+    
+    def __len__(self) -> int:
+        return len(self._index)
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+    
+    @property
+    def size_bytes(self) -> int:
+        return self.pack_path.stat().st_size
+    
+    def _samples(self, offset: int, length: int) -> Optional[np.ndarray]:
+        """An entry's int16 samples, or None if the pack does not hold them."""
+        if length == 0:
+            return np.zeros(0, dtype=np.int16)
+        # Remap when the pack has grown past the current mapping; an empty or
+        # truncated pack (which cannot be mapped) holds no entries
+        if self._pack is None or offset + length > len(self._pack):
+            pack_samples = self.pack_path.stat().st_size // np.dtype(np.int16).itemsize
+            if offset + length > pack_samples:
+                return None
+            self._pack = np.memmap(self.pack_path, dtype=np.int16, mode='r')
+        return self._pack[offset:offset + length]
+    
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Return the cached clip as float32, or None."""
+        with self._lock:
+            if key not in self._index:
+                self._refresh_index()
+            entry = self._index.get(key)
+            samples = self._samples(*entry[:2]) if entry is not None else None
+            if samples is None:
+                self.misses += 1
+                return None
+            scale = entry[2]
+            self.hits += 1
+        return samples.astype(AUDIO_DTYPE) * AUDIO_DTYPE(scale)
+    
+    def put(self, key: str, audio: np.ndarray):
+        """Append a clip to the pack and record it in the index."""
+        audio = np.asarray(audio, dtype=AUDIO_DTYPE)
+        peak = float(np.max(np.abs(audio))) if audio.size else 0.0
+        scale = peak / np.iinfo(np.int16).max if peak > 0 else 1.0
+        samples = np.rint(audio / scale).astype(np.int16)
+        
+        with self._lock, open(self.index_path, 'ab') as index:
+            if fcntl is not None:
+                fcntl.flock(index, fcntl.LOCK_EX)
+            try:
+                self._refresh_index()
+                if key in self._index:
+                    return
+                # Samples first, then the index line, so readers never see an
+                # offset whose samples are not yet written
+                with open(self.pack_path, 'ab') as pack:
+                    offset = pack.seek(0, os.SEEK_END) // samples.itemsize
+                    pack.write(samples.tobytes())
+                entry = {'key': key, 'offset': offset, 'length': len(samples), 'scale': scale}
+                index.write(json.dumps(entry).encode('utf-8') + b'\n')
+                index.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(index, fcntl.LOCK_UN)
+    
+    def load(
+        self,
+        file_path: str,
+        backend,
+        sr: int,
+        duration: Optional[float] = None
+    ) -> Tuple[np.ndarray, int]:
+        """
+        ``backend.load`` with caching. A target ``sr`` is required so cached
+        samples need no rate of their own.
+        """
+        key = self.make_key(file_path, {'sr': sr, 'duration': duration, 'backend': backend.name})
+        audio = self.get(key)
+        if audio is None:
+            audio, sr = backend.load(file_path, sr=sr, duration=duration)
+            self.put(key, audio)
+        return audio, sr
+    
+    def clear(self):
+        """Remove all cached clips."""
+        with self._lock:
+            self._pack = None
+            self.pack_path.write_bytes(b'')
+            self.index_path.write_bytes(b'')
+            self._index = {}
+            self._index_pos = 0
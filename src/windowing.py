@@ -0,0 +1,42 @@
+"""
+Sliding-window segmentation of long recordings.
+
+Windows are strided views into the decoded waveform, so segmenting a
+multi-minute recording allocates nothing until a batch of windows is
+copied out for featurization.
+"""
+
+import numpy as np
+
+
+def window_offsets(
+    n_samples: int,
+    window_length: int,
+    hop_length: int,
+    include_end: bool = False
+) -> np.ndarray:
+    """
+    Start sample of every full window (a single window at 0 for short
+    recordings). With ``include_end`` a tail past the last full window is
+    covered by one more window aligned to the end of the recording.
+    """
+    if n_samples <= window_length:
+        return np.zeros(1, dtype=np.int64)
+    offsets = np.arange(0, n_samples - window_length + 1, hop_length, dtype=np.int64)
+    if include_end and offsets[-1] != n_samples - window_length:
+        offsets = np.append(offsets, np.int64(n_samples - window_length))
+    return offsets
+
+
+def sliding_windows(audio: np.ndarray, window_length: int, hop_length: int) -> np.ndarray:
+    """
+    (n_windows, window_length) read-only view of ``audio`` at ``hop_length``
+    steps, matching window_offsets. Recordings shorter than one window are
+    zero-padded (the only case that copies); a tail shorter than the hop
+    is dropped.
+    """
+    audio = np.asarray(audio)
+    if len(audio) < window_length:
+        audio = np.pad(audio, (0, window_length - len(audio)), mode='constant')
+    windows = np.lib.stride_tricks.sliding_window_view(audio, window_length)[::hop_length]
+    return windows
@@ -0,0 +1,64 @@
+"""
+Unit tests for the pluggable audio backends.
+"""
+
+import pytest
+import numpy as np
+from src.audio_backend import get_backend
+from src.feature_extractor import RespiratoryFeatureExtractor
+
+
+def test_numpy_backend_matches_librosa():
+    """The librosa-free backend reproduces the librosa model input."""
+    audio = np.random.randn(48000).astype(np.float32)
+    
+    numpy_backend = get_backend('numpy')
+    librosa_backend = get_backend('librosa')
+    np.testing.assert_allclose(
+        numpy_backend.mel_filterbank(16000, 2048, 128, 20, 8000),
+        librosa_backend.mel_filterbank(16000, 2048, 128, 20, 8000),
+        atol=1e-7
+    )
+    
+    expected = RespiratoryFeatureExtractor(backend='librosa').prepare_model_input(audio)
+    actual = RespiratoryFeatureExtractor(backend='numpy').prepare_model_input(audio)
+    np.testing.assert_allclose(actual, expected, rtol=1e-4, atol=1e-3)
+
+
+def test_numpy_backend_resample():
+    """Polyphase resampling matches librosa for common upload rates."""
+    t = np.arange(44100 * 2) / 44100
+    tone = np.sin(2 * np.pi * 440 * t).astype(np.float32)
+    
+    expected = get_backend('librosa').resample(tone, 44100, 16000)
+    actual = get_backend('numpy').resample(tone, 44100, 16000)
+    
+    assert actual.shape == expected.shape
+    assert actual.dtype == np.float32
+    np.testing.assert_allclose(actual[100:-100], expected[100:-100], atol=5e-3)
+
+
+def test_backends_load_with_the_same_resampler(tmp_path):
+    """Both backends decode a 44.1 kHz file to the same 16 kHz waveform."""
+    import soundfile as sf
+    
+    path = tmp_path / 'clip.wav'
+    noise = np.random.default_rng(0).uniform(-0.5, 0.5, 44100 * 3).astype(np.float32)
+    sf.write(path, noise, 44100, subtype='FLOAT')
+    
+    expected, expected_sr = get_backend('numpy').load(str(path), sr=16000)
+    actual, actual_sr = get_backend('librosa').load(str(path), sr=16000)
+    
+    assert actual_sr == expected_sr == 16000
+    assert actual.dtype == np.float32 and actual.shape == expected.shape
+    np.testing.assert_allclose(actual, expected, atol=1e-6)
+
+
+def test_unknown_backend():
+    """Unknown backend names are rejected."""
+    with pytest.raises(ValueError):
+        get_backend('torchaudio')
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,57 @@
+"""
+Unit tests for on-the-fly batch augmentation.
+"""
+
+import pytest
+import numpy as np
+import soundfile as sf
+from src.augmentation import BatchAugmenter
+from src.data_loader import RespiratoryDataLoader
+from src.dataset import RespiratoryDataset
+
+
+def test_waveform_and_spectral_augmentation():
+    """Augmentations keep shapes and dtype, and are reproducible from a seed."""
+    audio = 0.1 * np.random.default_rng(0).standard_normal((4, 16000)).astype(np.float32)
+    augmenter = BatchAugmenter(probability=1.0, time_stretch=None, pitch_shift=None)
+    
+    augmented = augmenter.augment_waveforms(audio, np.random.default_rng(1))
+    assert augmented.shape == audio.shape and augmented.dtype == np.float32
+    assert not np.allclose(augmented, audio)
+    np.testing.assert_array_equal(augmented, augmenter.augment_waveforms(audio, np.random.default_rng(1)))
+    
+    features = np.random.default_rng(2).normal(size=(3, 301, 248, 1)).astype(np.float32)
+    masked = augmenter.augment_features(features, np.random.default_rng(3))
+    assert masked.shape == features.shape and masked.dtype == np.float32
+    changed = (masked != features)[..., 0]
+    assert changed.any()
+    # Frequency masks only touch the log-mel bands
+    time_masked = changed.all(axis=2)
+    assert not changed[~time_masked][:, :120].any()
+    
+    assert BatchAugmenter.from_config({'enabled': False}) is None
+    params = BatchAugmenter.from_config({'enabled': True, 'gain_db': [-3, 3]}).get_params()
+    assert BatchAugmenter.from_params(params).gain_db == (-3, 3)
+
+
+@pytest.mark.parametrize('num_workers', [1, 2])
+def test_dataset_with_augmenter(tmp_path, num_workers):
+    """Augmented streaming batches keep labels and shapes and differ per epoch."""
+    rng = np.random.default_rng(0)
+    (tmp_path / 'normal').mkdir()
+    for i in range(3):
+        sf.write(tmp_path / 'normal' / f'{i}.wav', 0.1 * rng.standard_normal(16000 * 3), 16000)
+    loader = RespiratoryDataLoader(data_dir=str(tmp_path))
+    augmenter = BatchAugmenter(probability=1.0, time_stretch=(0.9, 1.1), stretch_steps=3, pitch_shift=None)
+    
+    dataset = RespiratoryDataset.from_directory(
+        loader, batch_size=2, num_workers=num_workers, seed=0, augmenter=augmenter
+    )
+    first, second = list(dataset), list(dataset)
+    assert [x.shape for x, _ in first] == [(2,) + dataset.element_shape, (1,) + dataset.element_shape]
+    np.testing.assert_array_equal(np.concatenate([y for _, y in first]), [0, 0, 0])
+    assert not np.allclose(first[0][0], second[0][0])
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
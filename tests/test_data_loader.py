@@ -0,0 +1,90 @@
+"""
+Unit tests for the respiratory data loader.
+"""
+
+import pytest
+import numpy as np
+import soundfile as sf
+from src.data_loader import RespiratoryDataLoader
+from src.feature_extractor import RespiratoryFeatureExtractor
+
+
+@pytest.fixture
+def audio_files(tmp_path):
+    """A few short clips plus one undecodable file."""
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(5):
+        path = tmp_path / f'clip_{i}.wav'
+        sf.write(path, 0.1 * rng.standard_normal(16000 * 3).astype(np.float32), 16000)
+        paths.append(str(path))
+    
+    bad_path = tmp_path / 'bad.wav'
+    bad_path.write_bytes(b'not audio')
+    paths.insert(2, str(bad_path))
+    return paths
+
+
+def test_parallel_featurization_matches_serial(audio_files, tmp_path):
+    """Worker processes fill the memory-mapped output in input order."""
+    loader = RespiratoryDataLoader()
+    extractor = RespiratoryFeatureExtractor()
+    
+    serial, serial_kept = loader.load_features_from_files(audio_files, extractor)
+    output_path = tmp_path / 'X.npy'
+    parallel, parallel_kept = loader.load_features_from_files(
+        audio_files, extractor, batch_size=2, num_workers=2, output_path=str(output_path)
+    )
+    
+    assert isinstance(parallel, np.memmap)
+    np.testing.assert_array_equal(serial_kept, [0, 1, 3, 4, 5])
+    np.testing.assert_array_equal(parallel_kept, serial_kept)
+    np.testing.assert_array_equal(parallel, serial)
+    np.testing.assert_array_equal(np.load(output_path), serial)
+
+
+def test_parallel_decoding_keeps_order(audio_files, capsys):
+    """Pooled decoding matches serial decoding, in order, into a preallocated array."""
+    loader = RespiratoryDataLoader()
+    
+    serial, serial_kept = loader.load_audio_files(audio_files)
+    batch, kept = loader.load_audio_files(audio_files, num_workers=3, prefetch=1, as_array=True)
+    
+    assert "Error loading" in capsys.readouterr().out
+    assert batch.shape == (5, 48000) and batch.dtype == np.float32
+    np.testing.assert_array_equal(kept, serial_kept)
+    np.testing.assert_array_equal(batch, np.stack(serial))
+
+
+def test_sliding_windows_cover_long_recordings(tmp_path):
+    """Every window of a recording becomes a row with its file and offset."""
+    rng = np.random.default_rng(1)
+    paths = []
+    for i, seconds in enumerate((7.25, 2.0, 4.0)):
+        path = tmp_path / f'long_{i}.wav'
+        sf.write(path, 0.1 * rng.standard_normal(int(16000 * seconds)).astype(np.float32), 16000)
+        paths.append(str(path))
+    loader = RespiratoryDataLoader(window_increase=0.5)
+    extractor = RespiratoryFeatureExtractor()
+    
+    windows, offsets = loader.load_windows(paths[0])
+    assert windows.shape == (9, 48000) and not windows.flags.owndata
+    np.testing.assert_array_equal(offsets, np.arange(9) * 8000)
+    
+    blocks = list(loader.iter_window_features(paths, extractor, batch_size=4, files_per_block=2))
+    features, rows, offsets = (np.concatenate(parts) for parts in zip(*blocks))
+    np.testing.assert_array_equal(rows, [0] * 9 + [1] + [2, 2, 2])
+    np.testing.assert_array_equal(offsets[9:], [0, 0, 8000, 16000])
+    
+    # The first window of each file is the clip the default mode loads
+    clips = [RespiratoryDataLoader().load_audio_file(path) for path in paths]
+    expected = extractor.prepare_model_input_batch(np.stack(clips))
+    np.testing.assert_allclose(features[[0, 9, 10]], expected, atol=1e-3)
+    
+    parallel, parallel_rows = loader.load_features_from_files(paths, extractor, batch_size=4, num_workers=2)
+    np.testing.assert_array_equal(parallel_rows, rows)
+    np.testing.assert_allclose(parallel, features, atol=1e-5)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
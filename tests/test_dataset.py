@@ -0,0 +1,53 @@
+"""
+Unit tests for the streaming training dataset.
+"""
+
+import pytest
+import numpy as np
+import soundfile as sf
+from src.data_loader import RespiratoryDataLoader
+from src.dataset import RespiratoryDataset
+from src.feature_extractor import RespiratoryFeatureExtractor
+
+
+@pytest.fixture
+def dataset_dir(tmp_path):
+    """A tiny data/raw layout with two labels."""
+    rng = np.random.default_rng(0)
+    for label in ('normal', 'asthma'):
+        (tmp_path / label).mkdir()
+        for i in range(5):
+            audio = 0.1 * rng.standard_normal(16000 * 3).astype(np.float32)
+            sf.write(tmp_path / label / f'{label}_{i}.wav', audio, 16000)
+    return tmp_path
+
+
+def test_streaming_batches_match_eager_features(dataset_dir):
+    """Batches cover every file once, in order or shuffled, with matching labels."""
+    loader = RespiratoryDataLoader(data_dir=str(dataset_dir))
+    file_paths, labels = loader.list_dataset_files()
+    expected, _ = loader.load_features_from_files(file_paths, RespiratoryFeatureExtractor())
+    
+    ordered = RespiratoryDataset.from_directory(loader, batch_size=4, num_workers=2)
+    batches = list(ordered)
+    assert [len(y) for _, y in batches] == [4, 4, 2]
+    np.testing.assert_array_equal(np.concatenate([x for x, _ in batches]), expected)
+    np.testing.assert_array_equal(np.concatenate([y for _, y in batches]), labels)
+    
+    shuffled = RespiratoryDataset.from_directory(loader, batch_size=4, shuffle_buffer=6, seed=0)
+    batches = list(shuffled)
+    X = np.concatenate([x for x, _ in batches])
+    y = np.concatenate([y for _, y in batches])
+    order = [np.flatnonzero((expected == row).all(axis=(1, 2, 3)))[0] for row in X]
+    assert sorted(order) == list(range(len(file_paths)))
+    assert order != list(range(len(file_paths)))
+    np.testing.assert_array_equal(y, np.asarray(labels)[order])
+    
+    train_ds = ordered.to_tf_dataset(num_classes=7)
+    x_batch, y_batch = next(iter(train_ds))
+    assert x_batch.shape == (4,) + ordered.element_shape
+    assert y_batch.shape == (4, 7)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
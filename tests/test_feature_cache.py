@@ -0,0 +1,62 @@
+"""
+Unit tests for the on-disk feature cache.
+"""
+
+import os
+import pytest
+import numpy as np
+import soundfile as sf
+from src.data_loader import RespiratoryDataLoader
+from src.feature_cache import FeatureCache
+from src.feature_extractor import RespiratoryFeatureExtractor
+
+
+def test_lru_eviction(tmp_path):
+    """Least recently used entries are evicted once the size bound is hit."""
+    entry = np.zeros(1000, dtype=np.float32)
+    cache = FeatureCache(str(tmp_path), max_bytes=3 * 4200)
+    
+    keys = [FeatureCache.make_key(np.full(4, i, dtype=np.float32), {}) for i in range(4)]
+    for i, key in enumerate(keys[:3]):
+        cache.put(key, entry)
+        os.utime(cache._path(key), (i, i))
+    
+    # Touch the oldest entry, then overflow the cache
+    assert cache.get(keys[0]) is not None
+    cache.put(keys[3], entry)
+    
+    assert keys[0] in cache
+    assert keys[1] not in cache
+    assert cache.size_bytes <= cache.low_water * cache.max_bytes
+    
+    # Eviction freed headroom: the next write fits without another scan
+    evictions = []
+    cache._evict = lambda: evictions.append(1)
+    cache.put(FeatureCache.make_key(np.full(4, 9, dtype=np.float32), {}), entry)
+    assert not evictions and cache.size_bytes <= cache.max_bytes
+
+
+def test_extractor_and_loader_use_cache(tmp_path):
+    """prepare_model_input and the data loader are served from the cache."""
+    cache = FeatureCache(str(tmp_path / 'features'))
+    extractor = RespiratoryFeatureExtractor(cache=cache)
+    audio = np.random.randn(48000).astype(np.float32)
+    
+    first = extractor.prepare_model_input(audio)
+    second = extractor.prepare_model_input(audio)
+    assert cache.hits == 1
+    np.testing.assert_array_equal(first, second)
+    
+    audio_path = tmp_path / 'clip.wav'
+    sf.write(audio_path, audio * 0.5, 16000)
+    loader = RespiratoryDataLoader(feature_cache=cache)
+    features, kept = loader.load_features_from_files([str(audio_path)], RespiratoryFeatureExtractor())
+    
+    loader.load_audio_file = None  # a cache hit must not decode again
+    cached, _ = loader.load_features_from_files([str(audio_path)], RespiratoryFeatureExtractor())
+    np.testing.assert_array_equal(features, cached)
+    assert features.shape == (1, 301, 248, 1)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,124 @@
+"""
+Unit tests for feature extraction.
+"""
+
+import pytest
+import numpy as np
+import librosa
+from src.feature_extractor import (
+    RespiratoryFeatureExtractor,
+    StreamingFeatureExtractor,
+    preprocess_audio
+)
+
+
+def test_shared_spectrogram_matches_librosa():
+    """Features derived from one shared STFT match direct librosa calls."""
+    extractor = RespiratoryFeatureExtractor()
+    audio = np.random.randn(48000).astype(np.float32)
+    
+    features = extractor.extract_all_features(audio)
+    
+    mfcc = librosa.feature.mfcc(
+        y=audio, sr=16000, n_mfcc=40, n_fft=2048, hop_length=160, fmin=20, fmax=8000
+    )
+    np.testing.assert_allclose(features['mfcc'][:40], mfcc, rtol=1e-4, atol=1e-3)
+    
+    centroid = librosa.feature.spectral_centroid(y=audio, sr=16000, n_fft=2048, hop_length=160)[0]
+    np.testing.assert_allclose(features['spectral_centroid'], centroid, rtol=1e-4)
+
+
+def test_batch_matches_per_clip():
+    """Vectorized batch input matches the per-clip path."""
+    extractor = RespiratoryFeatureExtractor()
+    audio_batch = np.random.randn(3, 48000).astype(np.float32)
+    
+    batch = extractor.prepare_model_input_batch(audio_batch, chunk_size=2)
+    single = np.stack([extractor.prepare_model_input(audio) for audio in audio_batch])
+    
+    assert batch.shape == single.shape == (3, 301, 248, 1)
+    np.testing.assert_allclose(batch, single, rtol=1e-4, atol=1e-3)
+
+
+def test_feature_tables_are_shared():
+    """Filterbank/window/DCT tables are built once per configuration."""
+    first = RespiratoryFeatureExtractor()
+    second = RespiratoryFeatureExtractor()
+    
+    assert first.tables is second.tables
+    assert first.tables['mel_basis'].shape == (128, 1025)
+    assert first.tables['dct_basis'].shape == (40, 128)
+    assert not first.tables['window'].flags.writeable
+    
+    other = RespiratoryFeatureExtractor(n_mels=64)
+    assert other.tables is not first.tables
+
+
+def test_streaming_matches_full_window():
+    """Incremental streaming features match prepare_model_input on the same window."""
+    extractor = RespiratoryFeatureExtractor()
+    streamer = StreamingFeatureExtractor(extractor, window_samples=48000)
+    stream = np.random.randn(72000).astype(np.float32)
+    
+    position = 0
+    for step in [48000, 8000, 1000, 7000, 8000]:
+        streamer.push(stream[position:position + step])
+        position += step
+        assert streamer.ready
+        
+        window = stream[position - 48000:position]
+        expected = extractor.prepare_model_input(window / np.max(np.abs(window)))
+        np.testing.assert_allclose(streamer.get_model_input(), expected, rtol=1e-4, atol=1e-3)
+
+
+def test_window_inputs_share_one_stft():
+    """Windows sliced from the full-signal STFT match featurizing each window."""
+    from src.windowing import sliding_windows
+    
+    extractor = RespiratoryFeatureExtractor()
+    audio = 0.1 * np.random.randn(16000 * 9).astype(np.float32)
+    audio[60000:70000] *= 8  # windows get different peaks
+    
+    for hop in (8000, 8080):  # multiple of hop_length (shared STFT) or not (per-window)
+        blocks = list(extractor.iter_window_model_inputs(audio, 48000, hop, batch_size=5))
+        offsets, features = (np.concatenate(parts) for parts in zip(*blocks))
+        windows = sliding_windows(audio, 48000, hop)
+        expected = extractor.prepare_model_input_batch(windows / np.abs(windows).max(axis=1, keepdims=True))
+        
+        np.testing.assert_array_equal(offsets, np.arange(len(windows)) * hop)
+        np.testing.assert_allclose(features, expected, rtol=1e-4, atol=1e-3)
+
+
+def test_pipeline_stays_float32():
+    """float64 input is brought to float32 and never promoted again."""
+    extractor = RespiratoryFeatureExtractor()
+    audio = preprocess_audio(np.random.randn(40000), 22050)
+    
+    assert audio.dtype == np.float32
+    assert extractor.prepare_model_input(audio).dtype == np.float32
+    features = extractor.extract_all_features(audio)
+    assert features['mfcc'].dtype == np.float32
+    assert features['spectral_centroid'].dtype == np.float32
+
+
+def test_breathing_cadence_per_minute():
+    """Chunked multirate cadence recovers per-minute breathing rates."""
+    extractor = RespiratoryFeatureExtractor()
+    sample_rate = 16000
+    
+    def breathing(seconds, bpm):
+        t = np.arange(int(seconds * sample_rate)) / sample_rate
+        envelope = np.maximum(0, np.sin(2 * np.pi * bpm / 60 * t)) ** 2
+        return (np.random.randn(len(t)) * envelope * 0.5).astype(np.float32)
+    
+    recording = np.concatenate([breathing(60, 15), breathing(60, 24)])
+    chunks = (recording[i:i + 5 * sample_rate] for i in range(0, len(recording), 5 * sample_rate))
+    minutes = list(extractor.iter_breathing_cadence(chunks, segment_duration=60.0))
+    
+    assert [m['start_time'] for m in minutes] == [0.0, 60.0]
+    assert abs(minutes[0]['breathing_rate'] - 15) <= 1
+    assert abs(minutes[1]['breathing_rate'] - 24) <= 1
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
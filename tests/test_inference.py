@@ -4,6 +4,7 @@ Unit tests for inference engine.
 
 import pytest
 import numpy as np
+from src.anomaly_detector import RespiratoryAnomalyDetector
 from src.feature_extractor import RespiratoryFeatureExtractor, preprocess_audio
 
 
@@ -58,5 +59,200 @@ def test_model_input_preparation():
     assert model_input.shape[-1] == 1  # Single channel
 
 
+@pytest.fixture(scope='module')
+def tiny_models(tmp_path_factory):
+    """A small 3-class Keras model with matching TFLite and anomaly detector files."""
+    tf = pytest.importorskip('tensorflow')
+    tmp_path = tmp_path_factory.mktemp('models')
+    tf.keras.utils.set_random_seed(0)
+    model = tf.keras.Sequential([
+        tf.keras.Input(shape=(301, 248, 1)),
+        tf.keras.layers.AveragePooling2D(pool_size=(301, 8)),
+        tf.keras.layers.Flatten(),
+        tf.keras.layers.Dense(3, activation='softmax')
+    ])
+    # Shrink the logits of the dB features so the softmax does not saturate at 1.0
+    dense = model.layers[-1]
+    kernel, bias = dense.get_weights()
+    dense.set_weights([kernel * 0.01, bias])
+    model.save(tmp_path / 'model.keras')
+    (tmp_path / 'model.tflite').write_bytes(tf.lite.TFLiteConverter.from_keras_model(model).convert())
+    
+    detector = RespiratoryAnomalyDetector()
+    detector.fit(np.random.default_rng(0).normal(size=(20, 301, 248, 1)))
+    detector.save(str(tmp_path / 'anomaly.joblib'))
+    return tmp_path
+
+
+@pytest.mark.parametrize('use_tflite', [False, True])
+def test_predict_batch_matches_predict(tiny_models, use_tflite):
+    """Batched prediction equals per-clip prediction, for clips of any length."""
+    from src.inference_engine import RespiratoryInferenceEngine
+    
+    engine = RespiratoryInferenceEngine(
+        str(tiny_models / ('model.tflite' if use_tflite else 'model.keras')),
+        anomaly_detector_path=str(tiny_models / 'anomaly.joblib'),
+        use_tflite=use_tflite
+    )
+    rng = np.random.default_rng(1)
+    clips = [rng.standard_normal(n).astype(np.float32) for n in (48000, 30000, 60000, 48000, 20000)]
+    
+    batched = engine.predict_batch(clips, batch_size=3)
+    single = [engine.predict(clip) for clip in clips]
+    assert len(batched) == len(clips)
+    for b, s in zip(batched, single):
+        assert b['prediction'] == s['prediction'] and b['is_anomaly'] == s['is_anomaly']
+        assert b['confidence'] == pytest.approx(s['confidence'], abs=1e-5)
+        assert b['anomaly_score'] == pytest.approx(s['anomaly_score'], abs=1e-6)
+
+
+def test_interpreter_pool_serves_concurrent_calls(tiny_models):
+    """Threads sharing one engine get the same results as sequential calls."""
+    from concurrent.futures import ThreadPoolExecutor
+    from src.inference_engine import RespiratoryInferenceEngine
+    
+    engine = RespiratoryInferenceEngine.from_config(
+        str(tiny_models / 'model.tflite'),
+        {'inference': {'interpreter_pool_size': 3, 'interpreter_threads': 1}},
+        use_tflite=True
+    )
+    assert engine.interpreter_pool.size == 3 and engine.interpreter_pool.available == 3
+    
+    rng = np.random.default_rng(2)
+    clips = [rng.standard_normal(48000).astype(np.float32) for _ in range(12)]
+    expected = [engine.predict(clip)['probabilities'] for clip in clips]
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        # Mixed batch sizes run in different padded buckets while others run
+        results = list(pool.map(lambda i: engine.predict_batch(clips[i:i + 1 + i % 3]), range(12)))
+    for i, batch in enumerate(results):
+        for offset, result in enumerate(batch):
+            assert result['probabilities'] == pytest.approx(expected[i + offset], abs=1e-5)
+    assert engine.interpreter_pool.available == 3
+    # Batches of 1-3 only ever allocate the 1, 2 and 4 buckets, once each
+    features = np.stack([engine.prepare_input(clip) for clip in clips[:4]])
+    for interpreter in list(engine.interpreter_pool._idle.queue):
+        assert set(interpreter.buckets) <= {1, 2, 4}
+        interpreter.run(features[:3])
+        bucket_4 = interpreter.buckets[4]
+        interpreter.run(features)
+        assert interpreter.buckets[4] is bucket_4
+
+
+def test_micro_batcher_coalesces_concurrent_requests(tiny_models):
+    """Concurrent submissions share batched inference and get their own results."""
+    from concurrent.futures import ThreadPoolExecutor
+    from src.batching import MicroBatcher
+    from src.inference_engine import RespiratoryInferenceEngine
+    
+    engine = RespiratoryInferenceEngine(
+        str(tiny_models / 'model.tflite'),
+        anomaly_detector_path=str(tiny_models / 'anomaly.joblib'),
+        use_tflite=True
+    )
+    rng = np.random.default_rng(3)
+    clips = [rng.standard_normal(48000).astype(np.float32) for _ in range(16)]
+    expected = [engine.predict(clip) for clip in clips]
+    
+    batcher = MicroBatcher(engine, max_batch_size=4, max_wait_ms=50)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(batcher.predict, clips))
+    stats = batcher.stats()
+    batcher.close()
+    
+    for result, single in zip(results, expected):
+        assert result['probabilities'] == pytest.approx(single['probabilities'], abs=1e-5)
+        assert result['anomaly_score'] == pytest.approx(single['anomaly_score'], abs=1e-6)
+    batch_sizes = stats['batch_size']
+    assert batch_sizes['sum'] == 16 and batch_sizes['count'] < 16
+    assert batch_sizes['buckets']['4'] == batch_sizes['count']
+    assert stats['queue_depth']['count'] == 16 and stats['pending'] == 0
+
+
+def test_prediction_cache_serves_repeated_recordings(tiny_models):
+    """Re-submitted audio is answered from the cache; other audio is not."""
+    from src.inference_engine import RespiratoryInferenceEngine
+    
+    engine = RespiratoryInferenceEngine.from_config(
+        str(tiny_models / 'model.tflite'),
+        {'inference': {'prediction_cache': {'enabled': True, 'max_entries': 8}}},
+        use_tflite=True
+    )
+    rng = np.random.default_rng(4)
+    clip, other = (rng.standard_normal(48000).astype(np.float32) for _ in range(2))
+    
+    first = engine.predict(clip)
+    assert engine.predict(clip.copy()) == first
+    assert engine.predict(clip, sample_rate=8000) != first  # different rate, different key
+    engine.predict(other)
+    assert 'features' in engine.predict(clip, return_features=True)
+    assert engine.prediction_cache.stats()['hits'] == 1
+    assert engine.prediction_cache.stats()['misses'] == 3
+
+
+def test_predict_long_covers_whole_recording(tiny_models):
+    """Each window of a long recording is scored as predict would score it."""
+    from src.inference_engine import RespiratoryInferenceEngine
+    
+    engine = RespiratoryInferenceEngine.from_config(
+        str(tiny_models / 'model.tflite'),
+        {'audio': {'window_size': 3000, 'window_increase': 1000}},
+        anomaly_detector_path=str(tiny_models / 'anomaly.joblib'),
+        use_tflite=True
+    )
+    audio = 0.1 * np.random.default_rng(5).standard_normal(16000 * 8).astype(np.float32)
+    
+    result = engine.predict_long(audio, batch_size=4)
+    windows = result['windows']
+    assert [w['start_s'] for w in windows] == [0.0, 1.0, 2.0, 3.0, 4.0, 5.0]
+    for window in windows:
+        start = int(window['start_s'] * 16000)
+        single = engine.predict(audio[start:start + 48000])
+        assert window['probabilities'] == pytest.approx(single['probabilities'], abs=1e-4)
+        assert window['is_anomaly'] == single['is_anomaly']
+    assert sum(result['window_fractions'].values()) == pytest.approx(1.0)
+    assert result['duration_s'] == 8.0 and 0.0 <= result['anomalous_fraction'] <= 1.0
+
+
+def test_predict_windows_scores_the_tail(tiny_models):
+    """A recording off the hop grid gets a last window aligned to its end."""
+    from src.inference_engine import RespiratoryInferenceEngine
+    
+    engine = RespiratoryInferenceEngine(str(tiny_models / 'model.tflite'), use_tflite=True)
+    audio = 0.1 * np.random.default_rng(7).standard_normal(16000 * 5 + 4800).astype(np.float32)
+    
+    windows = engine.predict_windows(audio, window_seconds=3.0, hop_seconds=1.0, batch_size=2)
+    assert [w['start_s'] for w in windows] == [0.0, 1.0, 2.0, 2.3]
+    assert windows[-1]['end_s'] == pytest.approx(len(audio) / 16000)
+    single = engine.predict(audio[-48000:])
+    assert windows[-1]['probabilities'] == pytest.approx(single['probabilities'], abs=1e-4)
+
+
+def test_cascade_escalates_uncertain_clips(tiny_models):
+    """Only clips below the screening confidence threshold reach the main model."""
+    from src.inference_engine import RespiratoryInferenceEngine
+    
+    model_path = str(tiny_models / 'model.tflite')
+    main = RespiratoryInferenceEngine(model_path, use_tflite=True)
+    rng = np.random.default_rng(6)
+    clips = [rng.standard_normal(48000).astype(np.float32) for _ in range(6)]
+    confidences = sorted(result['confidence'] for result in main.predict_batch(clips))
+    threshold = (confidences[2] + confidences[3]) / 2
+    
+    # The same model screens, so escalated and screened clips score identically
+    cascade = RespiratoryInferenceEngine.from_config(
+        model_path,
+        {'inference': {'cascade': {
+            'enabled': True, 'screening_model': model_path, 'escalation_threshold': threshold
+        }}},
+        use_tflite=True
+    )
+    results = cascade.predict_batch(clips)
+    for result in results:
+        assert result['model'] == ('main' if result['confidence'] < threshold else 'screening')
+    assert cascade.cascade_stats() == {
+        'screened': 6, 'escalated': 3, 'escalation_rate': 0.5, 'escalation_threshold': threshold
+    }
+
+
 if __name__ == '__main__':
     pytest.main([__file__])
@@ -0,0 +1,65 @@
+"""
+Unit tests for the prediction result cache.
+"""
+
+import threading
+import time
+import pytest
+from src.prediction_cache import PredictionCache
+
+
+def test_lru_eviction_and_ttl(monkeypatch):
+    """Least recently used entries are evicted; expired ones are recomputed."""
+    cache = PredictionCache(max_entries=2, ttl_seconds=10)
+    cache.put('a', {'prediction': 'Normal'})
+    cache.put('b', {'prediction': 'Cough'})
+    assert cache.get('a') == {'prediction': 'Normal'}  # 'b' is now least recent
+    cache.put('c', {'prediction': 'Abnormal'})
+    assert cache.get('b') is None and len(cache) == 2 and cache.evictions == 1
+    
+    # Results are copies: callers may annotate them freely
+    cache.get_or_compute('a', lambda: pytest.fail("should hit"))['risk_level'] = 'Low'
+    assert cache.get('a') == {'prediction': 'Normal'}
+    
+    now = time.monotonic()
+    monkeypatch.setattr(time, 'monotonic', lambda: now + 11)
+    assert cache.get_or_compute('a', lambda: {'prediction': 'Cough'}) == {'prediction': 'Cough'}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_identical_inflight_requests_compute_once():
+    """Concurrent requests for one key share a single computation."""
+    cache = PredictionCache()
+    calls = []
+    started, release = threading.Event(), threading.Event()
+    
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {'prediction': 'Normal'}
+    
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute('k', compute)))
+               for _ in range(4)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    while cache.coalesced < 3:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+    
+    assert len(calls) == 1 and results == [{'prediction': 'Normal'}] * 4
+    assert cache.stats()['coalesced'] == 3 and cache.stats()['misses'] == 1
+    
+    # Failures reach every waiter and are not cached
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute('bad', lambda: (_ for _ in ()).throw(RuntimeError('boom')))
+    assert cache.get('bad') is None
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,42 @@
+"""
+Unit tests for cached polyphase resampling.
+"""
+
+import pytest
+import numpy as np
+import scipy.signal as signal
+from src.resampling import StreamingResampler, get_resample_filter, resample
+
+
+@pytest.mark.parametrize('orig_sr', [48000, 44100, 8000])
+def test_resample_matches_resample_poly(orig_sr):
+    """Cached filters reproduce resample_poly, also when cut to a clip length."""
+    audio = np.random.randn(orig_sr * 4).astype(np.float32)
+    up, down, _ = get_resample_filter(orig_sr, 16000)
+    expected = signal.resample_poly(audio, up, down)
+    
+    actual = resample(audio, orig_sr, 16000)
+    assert actual.dtype == np.float32
+    np.testing.assert_allclose(actual, expected, atol=1e-5)
+    
+    clip = resample(audio, orig_sr, 16000, num_samples=48000)
+    np.testing.assert_allclose(clip, expected[:48000], atol=1e-5)
+    assert get_resample_filter(orig_sr, 16000)[2] is get_resample_filter(orig_sr, 16000)[2]
+
+
+@pytest.mark.parametrize('orig_sr', [48000, 44100])
+def test_streaming_resampler_matches_whole_signal(orig_sr):
+    """Arbitrary chunking yields the same samples as resampling in one go."""
+    audio = np.random.randn(orig_sr * 2).astype(np.float32)
+    resampler = StreamingResampler(orig_sr, 16000)
+    
+    chunks = []
+    for chunk in np.array_split(audio, [1000, 1003, 20000, 51234]):
+        chunks.append(resampler.process(chunk))
+    chunks.append(resampler.flush())
+    
+    np.testing.assert_allclose(np.concatenate(chunks), resample(audio, orig_sr, 16000), atol=1e-5)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,131 @@
+"""
+Unit tests for the sharded processed-data format.
+"""
+
+import json
+import pytest
+import numpy as np
+from src.data_loader import RespiratoryDataLoader
+from src.feature_codec import CompactFeatureCodec
+from src.sharded_dataset import ShardWriter, ShardedDataset
+from src.source_manifest import SourceManifest, stable_split
+
+
+def test_sharded_round_trip(tmp_path):
+    """Shards are memory-mapped and indexed as one array, with a manifest."""
+    X = np.random.randn(23, 5, 4, 1).astype(np.float32)
+    y = np.arange(23) % 3
+    
+    with ShardWriter(tmp_path / 'train', shard_size=10, metadata={'n_mfcc': 40}) as writer:
+        writer.write_arrays(X, y)
+    
+    manifest = json.loads((tmp_path / 'train' / 'manifest.json').read_text())
+    assert [shard['num_examples'] for shard in manifest['shards']] == [10, 10, 3]
+    assert manifest['label_counts'] == {'0': 8, '1': 8, '2': 7}
+    
+    dataset = ShardedDataset.open(tmp_path, 'train')
+    assert dataset.shape == X.shape and dataset.metadata == {'n_mfcc': 40}
+    assert all(isinstance(shard, np.memmap) for shard in dataset.shards)
+    
+    indices = [22, 3, 15, 9, 10, -1]
+    np.testing.assert_array_equal(dataset[indices], X[indices])
+    np.testing.assert_array_equal(dataset[5:18:4], X[5:18:4])
+    np.testing.assert_array_equal(dataset[12], X[12])
+    
+    batches = list(dataset.iter_batches(batch_size=8, shuffle=True, seed=0))
+    labels = np.concatenate([labels for _, labels in batches])
+    features = np.concatenate([features for features, _ in batches])
+    order = [int(np.flatnonzero((X == row).all(axis=(1, 2, 3)))[0]) for row in features]
+    assert sorted(order) == list(range(23))
+    np.testing.assert_array_equal(labels, y[order])
+
+
+def test_processed_data_save_and_load(tmp_path):
+    """save_processed_data writes shards that load_processed_data maps back."""
+    loader = RespiratoryDataLoader()
+    arrays = []
+    for n in (6, 2, 2):
+        arrays += [np.random.randn(n, 3, 2, 1).astype(np.float32), np.zeros(n, dtype=int)]
+    loader.save_processed_data(*arrays, output_dir=str(tmp_path), shard_size=4)
+    
+    loaded = loader.load_processed_data(str(tmp_path))
+    for expected, actual in zip(arrays, loaded):
+        np.testing.assert_array_equal(np.asarray(actual), expected)
+    
+    # Splits saved by older versions as X_<split>.npy are still readable
+    np.save(tmp_path / 'X_legacy.npy', arrays[0])
+    np.save(tmp_path / 'y_legacy.npy', arrays[1])
+    np.testing.assert_array_equal(ShardedDataset.open(tmp_path, 'legacy')[:], arrays[0])
+
+
+def test_incremental_append_and_source_manifest(tmp_path):
+    """Appending keeps existing shards; rows of changed sources are dropped."""
+    X = np.random.randn(6, 3, 2, 1).astype(np.float32)
+    sources = [str(tmp_path / f'{i}.wav') for i in range(6)]
+    for path in sources:
+        (tmp_path / path).write_bytes(path.encode())
+    
+    with ShardWriter(tmp_path / 'train', shard_size=4) as writer:
+        writer.add_shard(X[:4], [0, 1, 0, 1], sources=sources[:4])
+    manifest = SourceManifest(str(tmp_path / 'sources.json'))
+    manifest.files = {
+        path: dict(manifest.fingerprint(path), label=0, split='train') for path in sources[:4]
+    }
+    manifest.save()
+    
+    (tmp_path / '1.wav').write_bytes(b're-recorded')
+    added, changed, removed, _ = SourceManifest(str(tmp_path / 'sources.json')).diff(sources[1:], [0] * 5)
+    assert (added, changed, removed) == ([3, 4], [0], [sources[0]])
+    
+    with ShardWriter(tmp_path / 'train', append=True) as writer:
+        assert writer.remove_sources([sources[0], sources[1]]) == 2
+        writer.add_shard(X[4:], [2, 2], sources=sources[4:])
+    
+    dataset = ShardedDataset.open(tmp_path, 'train')
+    np.testing.assert_array_equal(dataset[:], X[[2, 3, 4, 5]])
+    np.testing.assert_array_equal(dataset.labels, [0, 1, 2, 2])
+    assert dataset.manifest['label_counts'] == {'0': 1, '1': 1, '2': 2}
+    assert stable_split('data/raw/normal/a.wav') == stable_split('data/raw/normal/a.wav')
+    
+    # A changed file that then fails to decode keeps its split and is retried
+    manifest = SourceManifest(str(tmp_path / 'sources.json'))
+    manifest.files[sources[0]]['split'] = 'val'
+    assert manifest.mark_stale(sources[0]) == 'val'
+    manifest.save()
+    manifest = SourceManifest(str(tmp_path / 'sources.json'))
+    assert manifest.files[sources[0]]['split'] == 'val'
+    assert manifest.diff(sources[:1], [0])[1] == [0]
+
+
+@pytest.mark.parametrize('mel_dtype, mel_atol, min_ratio', [('uint8', 0.2, 2.5), ('uint16', 1e-3, 1.9)])
+def test_compact_codec_shards(tmp_path, mel_dtype, mel_atol, min_ratio):
+    """Compact shards decode per batch to within quantization error."""
+    rng = np.random.default_rng(0)
+    X = np.concatenate([
+        rng.normal(0, 20, (9, 301, 120, 1)),
+        rng.uniform(-80, 0, (9, 301, 128, 1))
+    ], axis=2).astype(np.float32)
+    codec = CompactFeatureCodec(120, mel_dtype=mel_dtype)
+    sources = [f'{i}.wav' for i in range(9)]
+    
+    with ShardWriter(tmp_path / 'train', shard_size=4, codec=codec) as writer:
+        writer.write_arrays(X[:8], np.zeros(8))
+    with ShardWriter(tmp_path / 'train', append=True, codec=codec) as writer:
+        writer.add_shard(X[8:], [1], sources=sources[8:])
+        assert writer.remove_sources(sources[8:]) == 1
+        writer.add_shard(X[8:], [1], sources=sources[8:])
+    
+    dataset = ShardedDataset.open(tmp_path, 'train')
+    stored = sum(path.stat().st_size for path in (tmp_path / 'train').glob('features-*'))
+    assert X.nbytes / stored > min_ratio
+    decoded = dataset[[8, 0, 5]]
+    assert decoded.dtype == np.float32 and decoded.shape == (3, 301, 248, 1)
+    np.testing.assert_allclose(decoded[..., :120, :], X[[8, 0, 5], :, :120], rtol=1e-3, atol=1e-2)
+    np.testing.assert_allclose(decoded[..., 120:, :], X[[8, 0, 5], :, 120:], atol=mel_atol)
+    
+    with pytest.raises(ValueError):
+        ShardWriter(tmp_path / 'train', append=True)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,50 @@
+"""
+Unit tests for index-based dataset splits.
+"""
+
+import pytest
+import numpy as np
+from src.splits import DatasetSplit, split_indices
+
+
+def test_split_indices_stratified_and_grouped():
+    """Splits partition the indices, keep class balance and never break groups."""
+    labels = np.repeat([0, 1, 2], 40)
+    parts = split_indices(labels)
+    assert sorted(np.concatenate(list(parts.values())).tolist()) == list(range(120))
+    for part in parts.values():
+        counts = np.bincount(labels[part], minlength=3)
+        assert counts.max() - counts.min() <= 1
+    
+    groups = np.arange(120) // 4
+    grouped = split_indices(labels, groups=groups)
+    owners = [set(groups[part]) for part in grouped.values()]
+    assert not (owners[0] & owners[1] or owners[0] & owners[2] or owners[1] & owners[2])
+    assert all(len(part) % 4 == 0 for part in grouped.values())
+
+
+def test_split_views_and_persistence(tmp_path):
+    """Views read rows lazily; saved keyed splits survive reordering and new keys."""
+    X = np.lib.format.open_memmap(tmp_path / 'X.npy', mode='w+', dtype=np.float32, shape=(60, 3))
+    X[:] = np.arange(180).reshape(60, 3)
+    keys = [f'file_{i}.wav' for i in range(60)]
+    split = DatasetSplit.create(np.arange(60) % 2, keys=keys)
+    
+    view = split.view(X, 'val')
+    assert view.shape == (len(split['val']), 3)
+    np.testing.assert_array_equal(view[1:3], X[split['val'][1:3]])
+    np.testing.assert_array_equal(np.concatenate(list(view.iter_batches(4))), X[split['val']])
+    
+    path = tmp_path / 'splits.json'
+    split.save(path)
+    new_keys = keys[::-1] + ['new.wav']
+    reloaded = DatasetSplit.load(path, keys=new_keys)
+    assignment = reloaded.assignment()
+    assert all(assignment[key] == split_name for key, split_name in split.assignment().items())
+    assert assignment['new.wav'] in ('train', 'val', 'test') and len(reloaded) == 61
+    
+    assert DatasetSplit.load_or_create(path, [], keys).assignment() == split.assignment()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
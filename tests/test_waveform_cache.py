@@ -0,0 +1,68 @@
+"""
+Unit tests for the decoded-waveform pack cache.
+"""
+
+import os
+import pytest
+import numpy as np
+import soundfile as sf
+from src.data_loader import RespiratoryDataLoader
+from src.waveform_cache import WaveformCache
+
+
+def test_waveform_cache_round_trip(tmp_path):
+    """Clips come back from the int16 pack within quantization error."""
+    cache = WaveformCache(str(tmp_path / 'cache'))
+    rng = np.random.default_rng(0)
+    clips = [0.3 * rng.standard_normal(n).astype(np.float32) for n in (1000, 16000, 0)]
+    for i, clip in enumerate(clips):
+        cache.put(f'clip-{i}', clip)
+    cache.put('clip-0', clips[1])  # existing keys are kept
+    
+    reopened = WaveformCache(str(tmp_path / 'cache'))
+    assert len(reopened) == 3 and cache.size_bytes == 2 * 17000
+    for i, clip in enumerate(clips):
+        restored = reopened.get(f'clip-{i}')
+        assert restored.dtype == np.float32 and restored.shape == clip.shape
+        np.testing.assert_allclose(restored, clip, atol=np.abs(clip).max(initial=0) / 32767)
+    assert reopened.get('missing') is None
+    assert (reopened.hits, reopened.misses) == (3, 1)
+    
+    # Entries appended by another instance (e.g. a worker process) are found
+    cache.put('late', clips[0])
+    assert reopened.get('late') is not None
+    
+    reopened.clear()
+    assert len(reopened) == 0 and reopened.size_bytes == 0
+    
+    # An empty pack (fresh, cleared, or only empty clips written) is never mapped
+    empty = WaveformCache(str(tmp_path / 'empty'))
+    empty.put('silence', clips[2])
+    assert empty.get('silence').shape == (0,) and empty.get('missing') is None
+    cache.put('stale', clips[0])
+    cache.pack_path.write_bytes(b'')  # index entries left without samples
+    assert WaveformCache(str(tmp_path / 'cache')).get('stale') is None
+
+
+def test_loader_uses_waveform_cache(tmp_path):
+    """load_audio_file decodes once, then reads the pack; edited files are decoded again."""
+    audio_path = tmp_path / 'clip.wav'
+    sf.write(audio_path, 0.5 * np.sin(np.linspace(0, 500, 22050 * 3)), 22050)
+    cache = WaveformCache(str(tmp_path / 'cache'))
+    loader = RespiratoryDataLoader(waveform_cache=cache, backend='numpy')
+    
+    first = loader.load_audio_file(str(audio_path))
+    second = loader.load_audio_file(str(audio_path))
+    assert (cache.hits, cache.misses) == (1, 1)
+    np.testing.assert_allclose(second, first, atol=1e-4)
+    uncached = RespiratoryDataLoader(backend='numpy').load_audio_file(str(audio_path))
+    np.testing.assert_allclose(second, uncached, atol=1e-4)
+    
+    sf.write(audio_path, np.zeros(22050 * 3), 22050)
+    os.utime(audio_path, ns=(0, 0))
+    assert np.abs(loader.load_audio_file(str(audio_path))).max() == 0
+    assert cache.misses == 2
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])